@@ -0,0 +1,423 @@
+"""HTTP API for style extraction, rewrite, export and saved outputs, next to the Streamlit UI.
+
+Usage: python -m app.api [--host 0.0.0.0] [--port 8001] [--workers 2]
+       python -m app.api --create-token USER_ID [--user-name NAME] [--admin]
+       python -m app.api --revoke-token TOKEN
+
+Endpoints (JSON unless noted):
+    GET  /health
+    GET  /v1/styles                          styles of the user (without examples)
+    POST /v1/styles/extract                  {"text", "name"?, "additional_instruction"?}, or a
+                                             multipart form with the same fields plus "files"
+    POST /v1/rewrite                         {"content", "style_id" | "style" + "example",
+                                             "guidelines"?, "max_words"?, "additional_instruction"?,
+                                             "save"?, "stream"?}; server-sent events by default
+    GET  /v1/outputs                         ?page_size=25&continuation=...
+    GET  /v1/outputs/{id}
+    GET  /v1/outputs/{id}/export             ?format=docx|pdf, the document bytes
+    POST /v1/export                          {"text", "title"?, "format"?}, the document bytes
+    GET  /v1/metrics                         admin tokens only
+
+Every request except /health must send "Authorization: Bearer <token>"
+with a token created by --create-token; the token decides the user, so
+callers cannot act as anyone else. Only SHA-256 hashes of the tokens are
+kept, in API_TOKENS_PATH, and the server refuses to start without any.
+Blocking work (model calls, storage, rendering) runs in a thread pool of
+API_THREADS threads, so one process serves many concurrent requests.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import app.core as core
+import app.export as export
+import app.extract as extract
+import app.metrics as metrics
+import app.persistence as persistence
+import app.refdata as refdata
+from app.config import STATE_DIR
+from app.render_service import RenderError
+from app.storage import get_storage, ConflictError, NotFoundError, StorageError
+
+# hashes of the per-user API tokens and the users they stand for
+API_TOKENS_PATH = os.getenv("API_TOKENS_PATH", os.path.join(STATE_DIR, "api_tokens.json"))
+# threads running blocking work (model streams, storage, rendering)
+API_THREADS = int(os.getenv("API_THREADS", "64"))
+API_PORT = int(os.getenv("API_PORT", "8001"))
+
+# bounds of the rewrite length, as on the Style Writer page
+MIN_WORDS, MAX_WORDS, DEFAULT_WORDS = 20, 75_000, 1_000
+
+
+def _error(status, message):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+_tokens = {}
+_tokens_mtime = None
+_tokens_lock = threading.Lock()
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# {token hash: {"user_id", "user_name", "admin"}}, reloaded when the file changes
+def load_tokens():
+    global _tokens, _tokens_mtime
+    try:
+        stat = os.stat(API_TOKENS_PATH)
+    except OSError:
+        return {}
+    mtime = (stat.st_mtime_ns, stat.st_size)
+    with _tokens_lock:
+        if mtime != _tokens_mtime:
+            with open(API_TOKENS_PATH, "r") as file:
+                _tokens = json.load(file)
+            _tokens_mtime = mtime
+        return _tokens
+
+
+def _save_tokens(tokens):
+    os.makedirs(os.path.dirname(os.path.abspath(API_TOKENS_PATH)), exist_ok=True)
+    tmp = f"{API_TOKENS_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w") as file:
+        json.dump(tokens, file, indent=2)
+    os.replace(tmp, API_TOKENS_PATH)
+
+
+# a new token for `user_id`; only its hash is stored, so it is shown once
+def create_token(user_id, user_name=None, admin=False):
+    token = secrets.token_urlsafe(32)
+    tokens = dict(load_tokens())
+    tokens[_token_hash(token)] = {
+        "user_id": user_id, "user_name": user_name or user_id, "admin": bool(admin),
+    }
+    _save_tokens(tokens)
+    return token
+
+
+def revoke_token(token):
+    tokens = dict(load_tokens())
+    if tokens.pop(_token_hash(token), None) is None:
+        return False
+    _save_tokens(tokens)
+    return True
+
+
+# the token's user, or None when the request has no known token
+def _authenticate(request):
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return load_tokens().get(_token_hash(token.strip()))
+
+
+def _user(request):
+    principal = request.state.principal
+    return principal["user_id"], principal["user_name"]
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "Request body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(400, "Request body must be a JSON object")
+    return body
+
+
+def _document(data, fmt, name):
+    return Response(
+        data,
+        media_type=export.MIME_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+
+def _format(value):
+    fmt = (value or "docx").lower()
+    if fmt not in export.MIME_TYPES:
+        raise HTTPException(400, f"Unknown format: {fmt}")
+    return fmt
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def list_styles(request):
+    user_id, _ = _user(request)
+    styles = await run_in_threadpool(get_storage().get_styles, user_id)
+    return JSONResponse([
+        {key: style.get(key) for key in ("id", "name", "updatedAt", "user_id")}
+        for style in styles
+    ])
+
+
+async def extract_style(request):
+    user_id, user_name = _user(request)
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        fields = {key: form.get(key) for key in ("text", "name", "additional_instruction")}
+        files = form.getlist("files")
+        if not all(isinstance(upload, UploadFile) for upload in files):
+            raise HTTPException(400, "files must be file uploads")
+        uploads = [(upload.filename, await upload.read()) for upload in files]
+    else:
+        fields, uploads = await _json_body(request), []
+
+    if uploads:
+        # Uploaded files replace the text, as on the Style Reader page
+        texts = [await run_in_threadpool(extract.extract_text, name, data) for name, data in uploads]
+        text = "".join(texts)
+    else:
+        text = fields.get("text") or ""
+    if not text.strip():
+        raise HTTPException(400, "No text to extract a style from")
+
+    name = (fields.get("name") or "").strip()
+    if name and await run_in_threadpool(get_storage().style_exists, user_id, name):
+        raise HTTPException(409, f"Style name '{name}' already exists")
+
+    messages = core.style_messages(text, fields.get("additional_instruction") or "")
+    style = await run_in_threadpool(core.complete_chat, messages)
+    result = {"style": style}
+    if name:
+        # Saved like a style extracted in the UI
+        doc = core.new_style(user_id, user_name, name, style, text)
+        await run_in_threadpool(get_storage().save_style, doc)
+        result["id"] = doc["id"]
+    return JSONResponse(result)
+
+
+# style, guidelines and example text of a rewrite request
+def _rewrite_inputs(user_id, body):
+    if body.get("style_id"):
+        chosen = core.find_style(user_id, str(body["style_id"]))
+        style, example = chosen.get("style") or "", chosen.get("example") or ""
+    else:
+        style, example = body.get("style") or "", body.get("example") or ""
+    if not style or not example:
+        raise HTTPException(400, "Give a style_id, or both style and example")
+
+    data = refdata.get()
+    sections = body.get("guidelines")
+    if sections is None:
+        sections = data.default_sections
+    elif isinstance(sections, str):
+        sections = [sections]
+    elif not isinstance(sections, list) or not all(isinstance(s, str) for s in sections):
+        raise HTTPException(400, "guidelines must be a section name or a list of section names")
+    unknown = [s for s in sections if s not in data.guidelines]
+    if unknown:
+        raise HTTPException(400, f"Unknown guideline sections: {', '.join(unknown)}")
+    return style, data.joined(sections), example
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def rewrite(request):
+    user_id, user_name = _user(request)
+    body = await _json_body(request)
+    content = body.get("content") or ""
+    if not content.strip():
+        raise HTTPException(400, "No content to rewrite")
+    try:
+        max_words = int(body.get("max_words", DEFAULT_WORDS))
+    except (TypeError, ValueError):
+        raise HTTPException(400, "max_words must be a number")
+    max_words = max(MIN_WORDS, min(MAX_WORDS, max_words))
+
+    style, guidelines, example = await run_in_threadpool(_rewrite_inputs, user_id, body)
+    messages = core.rewrite_messages(
+        content, style, guidelines, example, max_words, body.get("additional_instruction") or ""
+    )
+    style_id = body.get("style_id")
+
+    def finish(output):
+        result = {"chars": len(output)}
+        if body.get("save", True):
+            doc = core.new_output(user_id, user_name, content, style_id, output)
+            # Stored (or failed) before the id is returned, not write-behind
+            with persistence.direct_writes():
+                core.save_output(doc)
+            result["output_id"] = doc["id"]
+        return result
+
+    if not body.get("stream", True):
+        output = await run_in_threadpool(core.complete_chat, messages)
+        result = await run_in_threadpool(finish, output)
+        return JSONResponse({"output": output, **result})
+
+    # Iterated in the thread pool by StreamingResponse; a client that goes
+    # away closes the generator and with it the model stream
+    def events():
+        start = time.perf_counter()
+        parts = []
+        try:
+            for delta in core.stream_chat(messages):
+                if not parts:
+                    metrics.observe("api.rewrite.first_token", time.perf_counter() - start)
+                parts.append(delta)
+                yield _sse("delta", {"text": delta})
+            yield _sse("done", finish("".join(parts)))
+        except StorageError as e:
+            yield _sse("error", {"error": f"Output could not be saved: {e}"})
+        except Exception as e:
+            metrics.incr("api.errors")
+            yield _sse("error", {"error": str(e) or type(e).__name__})
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def list_outputs(request):
+    user_id, _ = _user(request)
+    try:
+        page_size = max(1, min(100, int(request.query_params.get("page_size", 25))))
+    except ValueError:
+        raise HTTPException(400, "page_size must be a number")
+    rows, continuation = await run_in_threadpool(
+        get_storage().list_outputs, user_id, page_size, request.query_params.get("continuation")
+    )
+    return JSONResponse({"outputs": rows, "continuation": continuation})
+
+
+async def get_output(request):
+    user_id, _ = _user(request)
+    doc = await run_in_threadpool(get_storage().get_output, user_id, request.path_params["output_id"])
+    return JSONResponse(doc)
+
+
+async def export_output(request):
+    user_id, _ = _user(request)
+    fmt = _format(request.query_params.get("format"))
+    doc = await run_in_threadpool(get_storage().get_output, user_id, request.path_params["output_id"])
+    data = await run_in_threadpool(
+        export.render, doc.get("output") or "", export.output_title(doc.get("styleId")), fmt
+    )
+    return _document(data, fmt, export.bundle_name(doc, fmt))
+
+
+async def export_text(request):
+    body = await _json_body(request)
+    fmt = _format(body.get("format"))
+    text = body.get("text") or ""
+    if not text.strip():
+        raise HTTPException(400, "No text to export")
+    data = await run_in_threadpool(export.render, text, body.get("title"), fmt)
+    return _document(data, fmt, f"export.{fmt}")
+
+
+async def show_metrics(request):
+    if not request.state.principal.get("admin"):
+        raise HTTPException(403, "Metrics need an admin token")
+    return JSONResponse(metrics.snapshot())
+
+
+ROUTES = [
+    Route("/health", health),
+    Route("/v1/styles", list_styles),
+    Route("/v1/styles/extract", extract_style, methods=["POST"]),
+    Route("/v1/rewrite", rewrite, methods=["POST"]),
+    Route("/v1/outputs", list_outputs),
+    Route("/v1/outputs/{output_id}", get_output),
+    Route("/v1/outputs/{output_id}/export", export_output),
+    Route("/v1/export", export_text, methods=["POST"]),
+    Route("/v1/metrics", show_metrics),
+]
+
+
+# authentication, error mapping and per-endpoint timings around every route
+def _wrap(route):
+    endpoint = route.endpoint
+    name = f"api.{endpoint.__name__}"
+
+    async def handler(request):
+        if endpoint is not health:
+            principal = _authenticate(request)
+            if principal is None:
+                return _error(401, "Missing or unknown API token")
+            request.state.principal = principal
+        metrics.incr(f"{name}.requests")
+        start = time.perf_counter()
+        try:
+            return await endpoint(request)
+        except HTTPException as e:
+            return _error(e.status_code, e.detail)
+        except NotFoundError as e:
+            return _error(404, str(e) or "Not found")
+        except ConflictError as e:
+            return _error(409, str(e) or "Conflict")
+        except StorageError as e:
+            metrics.incr("api.errors")
+            return _error(503, f"An error occurred while accessing storage: {e}")
+        except RenderError as e:
+            metrics.incr("api.errors")
+            return _error(500, f"An error occurred while rendering: {e}")
+        except Exception as e:
+            # Model and other upstream failures
+            metrics.incr("api.errors")
+            return _error(502, f"An error occurred: {e}")
+        finally:
+            # Streams are timed up to their first byte
+            metrics.observe(name, time.perf_counter() - start)
+
+    return Route(route.path, handler, methods=route.methods, name=endpoint.__name__)
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADS
+    yield
+
+
+app = Starlette(routes=[_wrap(route) for route in ROUTES], lifespan=_lifespan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="server processes")
+    parser.add_argument("--create-token", metavar="USER_ID", help="print a new token for the user and exit")
+    parser.add_argument("--user-name", help="display name of the --create-token user")
+    parser.add_argument("--admin", action="store_true", help="the new token may read /v1/metrics")
+    parser.add_argument("--revoke-token", metavar="TOKEN", help="remove a token and exit")
+    args = parser.parse_args()
+
+    if args.create_token:
+        print(create_token(args.create_token, args.user_name, args.admin))
+        return
+    if args.revoke_token:
+        sys.exit(0 if revoke_token(args.revoke_token) else "Unknown token")
+    if not load_tokens():
+        sys.exit(f"No API tokens in {API_TOKENS_PATH}; create one with python -m app.api --create-token USER_ID")
+
+    import uvicorn
+
+    uvicorn.run("app.api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
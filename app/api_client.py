@@ -0,0 +1,193 @@
+"""Python client of the HTTP API (app.api), plus an in-process server for tests and benchmarks.
+
+Usage: python -m app.api_client [--url http://localhost:8001] [--token TOKEN] outputs|styles|health
+
+The token (python -m app.api --create-token USER_ID) decides the user;
+API_TOKEN is used when none is passed.
+
+    with ApiClient.local() as client:       # app.api served on a free local port, with a token for the user
+        for delta in client.rewrite("Some draft.", style_id="..."):
+            print(delta, end="")
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+import requests
+
+import app.core as core
+
+
+class ApiError(Exception):
+    """An error response of the API."""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class ApiClient:
+    """Calls the API as the user of its token; safe to share between threads."""
+
+    def __init__(self, url=None, token=None, timeout=300):
+        self.url = (url or os.getenv("API_URL") or f"http://localhost:{os.getenv('API_PORT', '8001')}").rstrip("/")
+        self.timeout = timeout
+        self.headers = {}
+        token = token if token is not None else os.getenv("API_TOKEN", "")
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+        self._local = threading.local()
+        self._server = None
+        self._token = None
+
+    # one connection pool per thread (requests sessions are not thread-safe)
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(self.headers)
+        return session
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, self.url + path, timeout=self.timeout, **kwargs)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error")
+            except ValueError:
+                message = response.text
+            raise ApiError(response.status_code, message)
+        return response
+
+    def health(self):
+        return self._request("GET", "/health").json()
+
+    def styles(self):
+        return self._request("GET", "/v1/styles").json()
+
+    # extracted style text (and "id" when saved under `name`); `files` are (name, bytes) pairs
+    def extract_style(self, text="", name=None, additional_instruction="", files=()):
+        fields = {"text": text, "name": name or "", "additional_instruction": additional_instruction}
+        if files:
+            return self._request(
+                "POST", "/v1/styles/extract", data=fields, files=[("files", file) for file in files]
+            ).json()
+        return self._request("POST", "/v1/styles/extract", json=fields).json()
+
+    # text deltas of a streamed rewrite; `result` receives the final event (output_id, chars)
+    def rewrite(self, content, style_id=None, style=None, example=None, guidelines=None,
+                max_words=1000, additional_instruction="", save=True, result=None):
+        body = {
+            "content": content, "style_id": style_id, "style": style, "example": example,
+            "guidelines": guidelines, "max_words": max_words,
+            "additional_instruction": additional_instruction, "save": save,
+        }
+        response = self._request("POST", "/v1/rewrite", json=body, stream=True)
+        with response:
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    payload = json.loads(line[len("data: "):])
+                    if event == "delta":
+                        yield payload["text"]
+                    elif event == "done":
+                        if result is not None:
+                            result.update(payload)
+                    elif event == "error":
+                        raise ApiError(500, payload["error"])
+
+    # whole rewrite in one JSON response
+    def rewrite_text(self, content, **kwargs):
+        return self._request("POST", "/v1/rewrite", json={"content": content, "stream": False, **kwargs}).json()
+
+    # (rows, continuation) of the user's outputs, newest first
+    def outputs(self, page_size=25, continuation=None):
+        params = {"page_size": page_size}
+        if continuation:
+            params["continuation"] = continuation
+        page = self._request("GET", "/v1/outputs", params=params).json()
+        return page["outputs"], page["continuation"]
+
+    def output(self, output_id):
+        return self._request("GET", f"/v1/outputs/{output_id}").json()
+
+    def export_output(self, output_id, fmt="docx"):
+        return self._request("GET", f"/v1/outputs/{output_id}/export", params={"format": fmt}).content
+
+    def export(self, text, title=None, fmt="docx"):
+        return self._request("POST", "/v1/export", json={"text": text, "title": title, "format": fmt}).content
+
+    def metrics(self):
+        return self._request("GET", "/v1/metrics").json()
+
+    # a client of app.api served by uvicorn in a background thread of this process;
+    # without `token`, one is created for `user_id` (admin) and revoked on close
+    @classmethod
+    def local(cls, user_id=core.DEFAULT_USER_ID, token=None):
+        import uvicorn
+
+        import app.api as api
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config("app.api:app", host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        deadline = time.time() + 10
+        while not server.started:
+            if time.time() > deadline or not thread.is_alive():
+                raise RuntimeError("The local API server did not start")
+            time.sleep(0.05)
+
+        created = None
+        if token is None:
+            token = created = api.create_token(user_id, admin=True)
+        client = cls(f"http://127.0.0.1:{port}", token=token)
+        client._server = (server, thread)
+        client._token = created
+        return client
+
+    def close(self):
+        if self._server:
+            server, thread = self._server
+            server.should_exit = True
+            thread.join(timeout=10)
+            self._server = None
+        if self._token:
+            import app.api as api
+
+            api.revoke_token(self._token)
+            self._token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["health", "styles", "outputs"])
+    parser.add_argument("--url")
+    parser.add_argument("--token", help="API token (default: API_TOKEN)")
+    args = parser.parse_args()
+
+    client = ApiClient(args.url, token=args.token)
+    if args.command == "outputs":
+        result = client.outputs()[0]
+    else:
+        result = getattr(client, args.command)()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Batch re-export of saved outputs to DOCX/PDF files.
+
+Usage:
+    python -m app.batch_export OUT_DIR [--user-id ID ...] [--since 2025-01-01] [--until 2025-12-31]
+        [--formats docx pdf] [--workers 4]
+
+Outputs are streamed page by page from storage (every user unless --user-id
+is given, newest first, optionally limited to an updatedAt date range) and
+rendered in a process pool to OUT_DIR/<user_id>/<output_id>.<format>.
+Every finished output is appended to OUT_DIR/manifest.jsonl, so an
+interrupted run picks up where it stopped; an output edited since it was
+exported is rendered again.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import app.export as export
+import app.metrics as metrics
+import app.render_service as render_service
+from app.storage import get_storage, StorageError
+
+# worker processes rendering documents
+BATCH_EXPORT_WORKERS = int(os.getenv("BATCH_EXPORT_WORKERS", str(os.cpu_count() or 2)))
+
+MANIFEST_NAME = "manifest.jsonl"
+# summaries fetched per storage page
+PAGE_SIZE = 100
+
+
+# output summaries of a user in an updatedAt range (dates as YYYY-MM-DD, inclusive)
+def iter_outputs(storage, user_id, since=None, until=None):
+    continuation = None
+    while True:
+        rows, continuation = storage.list_outputs(user_id, page_size=PAGE_SIZE, continuation=continuation)
+        for row in rows:
+            day = (row.get("updatedAt") or "")[:10]
+            if until and day > until:
+                continue
+            if since and day < since:
+                # Newest first: everything after this is older still
+                return
+            yield row
+        if not continuation:
+            return
+
+
+def _manifest_key(user_id, output_id, updated_at):
+    return f"{user_id}/{output_id}@{updated_at}"
+
+
+# keys of outputs already exported by earlier runs
+def load_manifest(out_dir):
+    done = set()
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return done
+    with open(path, "r") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A run killed mid-write leaves a partial last line
+                continue
+            if not entry.get("error"):
+                done.add(_manifest_key(entry["user_id"], entry["id"], entry["updatedAt"]))
+    return done
+
+
+# runs in a worker: render every format of one output and write the files
+def _export_one(out_dir, user_id, output_id, text, title, formats):
+    from app.export import RENDERERS
+
+    start = time.perf_counter()
+    directory = os.path.join(out_dir, user_id)
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for fmt in formats:
+        path = os.path.join(directory, f"{output_id}.{fmt}")
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(RENDERERS[fmt](text, title=title))
+        # Never leave a half-written file under the final name
+        os.replace(tmp, path)
+        files.append(os.path.relpath(path, out_dir))
+    return files, time.perf_counter() - start
+
+
+def export_outputs(out_dir, user_ids=None, since=None, until=None, formats=("docx", "pdf"),
+                   workers=BATCH_EXPORT_WORKERS, storage=None, progress=None):
+    """Render saved outputs to files in `out_dir`, skipping ones already in its manifest.
+
+    `progress(summary)` is called after each finished output. Returns counts
+    plus timing: exported, skipped, failed, errors, seconds and
+    documents_per_second.
+    """
+    storage = storage or get_storage()
+    os.makedirs(out_dir, exist_ok=True)
+    done = load_manifest(out_dir)
+    user_ids = user_ids or storage.output_partitions()
+
+    summary = {"exported": 0, "skipped": 0, "failed": 0, "errors": []}
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(
+        max_workers=max(1, workers),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=render_service._init_worker,
+        initargs=(render_service.RENDER_MEMORY_MB,),
+    )
+    pending = {}
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), "a") as manifest:
+
+        def settle(futures):
+            for future in futures:
+                user_id, doc = pending.pop(future)
+                entry = {"user_id": user_id, "id": doc["id"], "updatedAt": doc.get("updatedAt")}
+                try:
+                    entry["files"], seconds = future.result()
+                    entry["seconds"] = round(seconds, 3)
+                    summary["exported"] += 1
+                    metrics.observe("batch_export.document", seconds)
+                except Exception as e:
+                    entry["error"] = str(e) or type(e).__name__
+                    summary["failed"] += 1
+                    summary["errors"].append(f"{user_id}/{doc['id']}: {entry['error']}")
+                manifest.write(json.dumps(entry) + "\n")
+                manifest.flush()
+                if progress:
+                    progress(summary)
+
+        try:
+            for user_id in user_ids:
+                for row in iter_outputs(storage, user_id, since, until):
+                    if _manifest_key(user_id, row["id"], row.get("updatedAt")) in done:
+                        summary["skipped"] += 1
+                        continue
+                    try:
+                        doc = storage.get_output(user_id, row["id"])
+                    except StorageError as e:
+                        summary["failed"] += 1
+                        summary["errors"].append(f"{user_id}/{row['id']}: {e}")
+                        continue
+                    future = pool.submit(
+                        _export_one, out_dir, user_id, doc["id"], doc.get("output") or "",
+                        export.output_title(doc.get("styleId")), tuple(formats),
+                    )
+                    pending[future] = (user_id, doc)
+                    # Keep only a couple of documents per worker in memory
+                    if len(pending) >= 2 * max(1, workers):
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        settle(finished)
+            settle(wait(pending)[0])
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    seconds = time.perf_counter() - start
+    metrics.incr("batch_export.documents", summary["exported"])
+    metrics.observe("batch_export.run", seconds)
+    summary["seconds"] = round(seconds, 3)
+    summary["documents_per_second"] = round(summary["exported"] / seconds, 2) if seconds else None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--user-id", action="append", dest="user_ids", help="repeat for several users")
+    parser.add_argument("--since", help="first updatedAt date, YYYY-MM-DD")
+    parser.add_argument("--until", help="last updatedAt date, YYYY-MM-DD")
+    parser.add_argument("--formats", nargs="+", choices=["docx", "pdf"], default=["docx", "pdf"])
+    parser.add_argument("--workers", type=int, default=BATCH_EXPORT_WORKERS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def report(summary):
+        elapsed = time.perf_counter() - start
+        print(
+            f"\r{summary['exported']} exported, {summary['skipped']} skipped, {summary['failed']} failed "
+            f"({summary['exported'] / elapsed:.2f} docs/s)",
+            end="",
+            flush=True,
+        )
+
+    result = export_outputs(
+        args.out_dir, args.user_ids, args.since, args.until, args.formats, args.workers, progress=report
+    )
+    print()
+    for error in result["errors"]:
+        print(f"Failed: {error}")
+    print(
+        f"Exported {result['exported']} outputs, skipped {result['skipped']}, failed {result['failed']} "
+        f"in {result['seconds']:.2f}s ({result['documents_per_second'] or 0} docs/s) to {args.out_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import app.metrics as metrics
+from app.config import STATE_DIR
+
+# "local" to keep large bodies in a content-addressed blob store; empty keeps them inline
+BLOB_STORE = os.getenv("BLOB_STORE", "").lower()
+# directory of the local blob store
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(STATE_DIR, "blobs"))
+# bodies longer than this (characters) are moved to the blob store
+BLOB_INLINE_MAX_CHARS = int(os.getenv("BLOB_INLINE_MAX_CHARS", "8192"))
+# unreferenced blobs younger than this are kept by sweep() (their record may still be on its way)
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "86400"))
+
+REF_PREFIX = "sha256:"
+
+
+class BlobStore:
+    """Immutable, content-addressed storage for large text bodies."""
+
+    # store text and return its reference ("sha256:<hex>")
+    def put(self, text):
+        raise NotImplementedError
+
+    # text for a reference; raises KeyError if unknown
+    def get(self, ref):
+        raise NotImplementedError
+
+    # {"blobs", "stored_bytes", "logical_bytes"} for the whole store
+    def usage(self):
+        raise NotImplementedError
+
+    # delete blobs not in `referenced` and older than `grace_seconds`; returns the number deleted
+    def sweep(self, referenced, grace_seconds=BLOB_GC_GRACE_SECONDS):
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """Gzip-compressed blobs on the local filesystem, one file per content hash."""
+
+    def __init__(self, root=BLOB_STORE_DIR, cache_size=64):
+        self.root = root
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + ".gz")
+
+    def put(self, text):
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        metrics.incr("blobstore.logical_bytes", len(data))
+
+        try:
+            # Identical body already stored (e.g. the same input rewritten again);
+            # touched as it is referenced anew, so sweep() keeps it for the grace period
+            os.utime(path)
+            metrics.incr("blobstore.dedup_hits")
+            metrics.incr("blobstore.dedup_bytes", len(data))
+            return REF_PREFIX + digest
+        except FileNotFoundError:
+            pass
+
+        compressed = gzip.compress(data, compresslevel=6, mtime=0)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see partial blobs
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(compressed)
+        os.replace(tmp_path, path)
+        metrics.incr("blobstore.stored_bytes", len(compressed))
+        return REF_PREFIX + digest
+
+    def get(self, ref):
+        with self._lock:
+            if ref in self._cache:
+                self._cache.move_to_end(ref)
+                return self._cache[ref]
+
+        digest = ref[len(REF_PREFIX):]
+        try:
+            with open(self._path(digest), "rb") as file:
+                text = gzip.decompress(file.read()).decode("utf-8")
+        except FileNotFoundError:
+            raise KeyError(ref)
+
+        with self._lock:
+            self._cache[ref] = text
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return text
+
+    def usage(self):
+        blobs = stored = logical = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".gz"):
+                    continue
+                path = os.path.join(dirpath, name)
+                blobs += 1
+                stored += os.path.getsize(path)
+                # gzip trailer holds the uncompressed size (mod 2**32)
+                with open(path, "rb") as file:
+                    file.seek(-4, os.SEEK_END)
+                    logical += struct.unpack("<I", file.read(4))[0]
+        return {"blobs": blobs, "stored_bytes": stored, "logical_bytes": logical}
+
+    def sweep(self, referenced, grace_seconds=BLOB_GC_GRACE_SECONDS):
+        cutoff = time.time() - grace_seconds
+        deleted = freed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".gz"):
+                    continue
+                ref = REF_PREFIX + name[:-len(".gz")]
+                path = os.path.join(dirpath, name)
+                try:
+                    if ref in referenced or os.path.getmtime(path) >= cutoff:
+                        continue
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                with self._lock:
+                    self._cache.pop(ref, None)
+                deleted += 1
+                freed += size
+        metrics.incr("blobstore.gc_deleted", deleted)
+        metrics.incr("blobstore.gc_freed_bytes", freed)
+        return deleted
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# process-wide blob store, or None when bodies stay inline
+def get_blob_store():
+    global _store
+    if not BLOB_STORE:
+        return None
+    with _store_lock:
+        if _store is None:
+            if BLOB_STORE == "local":
+                _store = LocalBlobStore()
+            else:
+                raise ValueError(f"Unknown BLOB_STORE: {BLOB_STORE}")
+        return _store
+
+
+# move large text fields of a document into the blob store ("<field>Ref")
+def offload(doc, fields, store=None):
+    store = store or get_blob_store()
+    if store is None:
+        return doc
+    doc = dict(doc)
+    for field in fields:
+        text = doc.get(field)
+        if isinstance(text, str) and len(text) > BLOB_INLINE_MAX_CHARS:
+            doc[field + "Ref"] = store.put(text)
+            del doc[field]
+    return doc
+
+
+# put offloaded text fields back into a document
+def rehydrate(doc, fields, store=None):
+    if doc is None or not any(field + "Ref" in doc for field in fields):
+        return doc
+    store = store or get_blob_store() or LocalBlobStore()
+    doc = dict(doc)
+    for field in fields:
+        ref = doc.pop(field + "Ref", None)
+        if ref:
+            doc[field] = store.get(ref)
+    return doc
+
+
+# savings of the blob store: compression on disk plus dedup in this process
+def savings_report(store=None):
+    store = store or get_blob_store() or LocalBlobStore()
+    report = store.usage()
+    counters = metrics.snapshot("blobstore.")["counters"]
+    report["compression_ratio"] = (
+        round(report["logical_bytes"] / report["stored_bytes"], 2) if report["stored_bytes"] else None
+    )
+    report["saved_bytes"] = report["logical_bytes"] - report["stored_bytes"]
+    report["dedup_hits"] = int(counters.get("blobstore.dedup_hits", 0))
+    report["dedup_bytes"] = int(counters.get("blobstore.dedup_bytes", 0))
+    return report
+
+
+if __name__ == "__main__":
+    # python -m app.blobstore [root]
+    root = sys.argv[1] if len(sys.argv) > 1 else BLOB_STORE_DIR
+    for key, value in savings_report(LocalBlobStore(root)).items():
+        print(f"{key}: {value}")
@@ -0,0 +1,385 @@
+"""Two-tier cache for work several processes would otherwise repeat.
+
+Every namespace ("extract", "styles", "export", ...) has a bounded
+in-process LRU (L1) in front of a backend shared by all Streamlit, API and
+job worker processes (L2):
+
+    CACHE_BACKEND=local   SQLite file under STATE_DIR, for the processes of one machine (default)
+    CACHE_BACKEND=redis   Redis at CACHE_URL, for processes on several machines
+    CACHE_BACKEND=        no shared tier, L1 only
+
+Values are bytes (get_json/set_json for JSON). A failing L2 counts as a
+miss and never fails the caller. Hits and misses are counted per
+namespace and tier (cache.<namespace>.l1_hits, .l2_hits, .misses).
+
+    python -m app.cache stats
+    python -m app.cache clear [NAMESPACE]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import app.metrics as metrics
+from app.config import STATE_DIR
+
+# "local", "redis" or empty for no shared tier
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local").lower()
+# Redis connection for CACHE_BACKEND=redis
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+# database file and size limit of the local backend
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(STATE_DIR, "cache.db"))
+CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "1024"))
+# how long a change made by another process to a mutable value (style lists) can go unseen
+CACHE_L1_MUTABLE_SECONDS = float(os.getenv("CACHE_L1_MUTABLE_SECONDS", "5"))
+
+# keys of this app in a shared Redis
+KEY_PREFIX = "stylewriter:"
+
+
+class CacheBackend:
+    """Shared key/value store of the L2 tier."""
+
+    name = "base"
+
+    # bytes of a key, or None if missing or expired
+    def get(self, key):
+        raise NotImplementedError
+
+    # store bytes; ttl in seconds, None for no expiry
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    # drop every key starting with `prefix`
+    def clear(self, prefix=""):
+        raise NotImplementedError
+
+    # {"keys", "bytes"} of the whole store
+    def usage(self):
+        raise NotImplementedError
+
+
+class LocalCache(CacheBackend):
+    """SQLite file shared by the processes of one machine; oldest entries go first over CACHE_MAX_MB."""
+
+    name = "local"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key     TEXT PRIMARY KEY,
+        value   BLOB NOT NULL,
+        size    INTEGER NOT NULL,
+        stored  REAL NOT NULL,
+        expires REAL
+    );
+    CREATE INDEX IF NOT EXISTS cache_stored ON cache (stored);
+    """
+
+    # sets between size checks
+    EVICT_EVERY = 200
+
+    def __init__(self, path=CACHE_DB_PATH, max_mb=CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._sets = 0
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, stored, expires) VALUES (?, ?, ?, ?, ?)",
+            (key, sqlite3.Binary(value), len(value), now, now + ttl if ttl else None),
+        )
+        self._sets += 1
+        if self._sets % self.EVICT_EVERY == 0 or len(value) > self.max_bytes // 100:
+            self.evict()
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self, prefix=""):
+        self._conn().execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    # drop expired entries, then the oldest ones beyond the size limit
+    def evict(self):
+        conn = self._conn()
+        expired = conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),)).rowcount
+        evicted = conn.execute(
+            """
+            DELETE FROM cache WHERE key IN (
+                SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY stored DESC) AS kept FROM cache)
+                WHERE kept > ?
+            )
+            """,
+            (self.max_bytes,),
+        ).rowcount
+        metrics.incr("cache.local.evictions", expired + evicted)
+
+    def usage(self):
+        keys, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"keys": keys, "bytes": size}
+
+
+class RedisCache(CacheBackend):
+    """Redis (or any server speaking its protocol) shared by processes on several machines."""
+
+    name = "redis"
+
+    def __init__(self, url=CACHE_URL):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+
+    def get(self, key):
+        return self.client.get(KEY_PREFIX + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(KEY_PREFIX + key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(KEY_PREFIX + key)
+
+    def clear(self, prefix=""):
+        batch = []
+        for key in self.client.scan_iter(match=f"{KEY_PREFIX}{prefix}*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
+
+    def usage(self):
+        keys = sum(1 for _ in self.client.scan_iter(match=f"{KEY_PREFIX}*", count=1000))
+        return {"keys": keys, "bytes": self.client.info("memory").get("used_memory")}
+
+
+_backend = None
+_backend_error = None
+_backend_lock = threading.Lock()
+
+
+# process-wide shared backend, or None when CACHE_BACKEND is empty (or it cannot be opened)
+def get_backend():
+    global _backend, _backend_error
+    if not CACHE_BACKEND:
+        return None
+    with _backend_lock:
+        if _backend is None and _backend_error is None:
+            try:
+                if CACHE_BACKEND == "local":
+                    _backend = LocalCache()
+                elif CACHE_BACKEND == "redis":
+                    _backend = RedisCache()
+                else:
+                    raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+            except ValueError:
+                raise
+            except Exception as e:
+                # Run on L1 alone rather than failing every page
+                _backend_error = e
+                print(f"Shared cache unavailable, using the in-process tier only: {e}")
+        return _backend
+
+
+class Cache:
+    """One namespace: an in-process LRU of at most `l1_mb` in front of the shared backend.
+
+    Values of a `mutable` namespace can be changed by other processes, so
+    they stay in L1 for at most CACHE_L1_MUTABLE_SECONDS.
+    """
+
+    def __init__(self, name, ttl=None, l1_mb=16, mutable=False):
+        self.name = name
+        self.ttl = ttl
+        self.l1_max_bytes = int(l1_mb * 1024 * 1024)
+        self.mutable = mutable
+        self._l1 = OrderedDict()
+        self._l1_bytes = 0
+        self._lock = threading.Lock()
+
+    def _metric(self, event, value=1):
+        metrics.incr(f"cache.{self.name}.{event}", value)
+
+    # lifetime of an L1 entry stored for `ttl` seconds
+    def _l1_ttl(self, ttl):
+        if self.mutable:
+            return min(ttl or CACHE_L1_MUTABLE_SECONDS, CACHE_L1_MUTABLE_SECONDS)
+        return ttl
+
+    def _l2_key(self, key):
+        return f"{self.name}:{key}"
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= time.time():
+                self._l1_drop(key)
+                return None
+            self._l1.move_to_end(key)
+            return value
+
+    def _l1_put(self, key, value, ttl):
+        if len(value) > self.l1_max_bytes:
+            return
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._l1_drop(key)
+            self._l1[key] = (expires, value)
+            self._l1_bytes += len(value)
+            while self._l1_bytes > self.l1_max_bytes:
+                _, (_, evicted) = self._l1.popitem(last=False)
+                self._l1_bytes -= len(evicted)
+                self._metric("l1_evictions")
+
+    def _l1_drop(self, key):
+        entry = self._l1.pop(key, None)
+        if entry is not None:
+            self._l1_bytes -= len(entry[1])
+
+    # run a backend call; a failing shared tier behaves like an empty one
+    def _l2(self, call, *args):
+        backend = get_backend()
+        if backend is None:
+            return None
+        try:
+            return getattr(backend, call)(*args)
+        except Exception as e:
+            self._metric("l2_errors")
+            print(f"Shared cache {call} failed for {self.name}: {e}")
+            return None
+
+    # cached bytes of `key`, or None
+    def get(self, key):
+        value = self._l1_get(key)
+        if value is not None:
+            self._metric("l1_hits")
+            return value
+        value = self._l2("get", self._l2_key(key))
+        if value is not None:
+            self._metric("l2_hits")
+            self._l1_put(key, value, self._l1_ttl(self.ttl))
+            return value
+        self._metric("misses")
+        return None
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        self._l1_put(key, value, self._l1_ttl(ttl))
+        self._l2("set", self._l2_key(key), value, ttl)
+
+    # whether `key` is cached, without counting a hit or miss
+    def contains(self, key):
+        return self._l1_get(key) is not None or self._l2("get", self._l2_key(key)) is not None
+
+    def delete(self, key):
+        with self._lock:
+            self._l1_drop(key)
+        self._l2("delete", self._l2_key(key))
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+            self._l1_bytes = 0
+        self._l2("clear", self._l2_key(""))
+
+    def get_json(self, key):
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def set_json(self, key, value, ttl=None):
+        self.set(key, json.dumps(value, ensure_ascii=False).encode("utf-8"), ttl)
+
+    def l1_usage(self):
+        with self._lock:
+            return {"entries": len(self._l1), "bytes": self._l1_bytes}
+
+
+_namespaces = {}
+_namespaces_lock = threading.Lock()
+
+
+# the cache of a namespace; settings apply when it is first created
+def namespace(name, ttl=None, l1_mb=16, mutable=False):
+    with _namespaces_lock:
+        cache = _namespaces.get(name)
+        if cache is None:
+            cache = _namespaces[name] = Cache(name, ttl, l1_mb, mutable)
+        return cache
+
+
+# hits, misses and hit rates per namespace and tier in this process
+def report():
+    counters = metrics.snapshot("cache.")["counters"]
+    rows = []
+    for name in sorted(_namespaces):
+        l1 = int(counters.get(f"cache.{name}.l1_hits", 0))
+        l2 = int(counters.get(f"cache.{name}.l2_hits", 0))
+        misses = int(counters.get(f"cache.{name}.misses", 0))
+        lookups = l1 + l2 + misses
+        rows.append({
+            "namespace": name,
+            "lookups": lookups,
+            "l1_hits": l1,
+            "l2_hits": l2,
+            "misses": misses,
+            "l1_hit_rate": round(l1 / lookups, 3) if lookups else None,
+            # of the lookups that reached the shared tier
+            "l2_hit_rate": round(l2 / (l2 + misses), 3) if l2 + misses else None,
+            "hit_rate": round((l1 + l2) / lookups, 3) if lookups else None,
+            "l1_entries": _namespaces[name].l1_usage()["entries"],
+            "l1_mb": round(_namespaces[name].l1_usage()["bytes"] / 1024 / 1024, 2),
+            "l2_errors": int(counters.get(f"cache.{name}.l2_errors", 0)),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="size of the shared tier")
+    clear_parser = commands.add_parser("clear", help="drop cached values from the shared tier")
+    clear_parser.add_argument("namespace", nargs="?", default="")
+    args = parser.parse_args()
+
+    backend = get_backend()
+    if backend is None:
+        print("No shared cache (CACHE_BACKEND is empty or unavailable)")
+        return
+    if args.command == "stats":
+        print(json.dumps({"backend": backend.name, **backend.usage()}, indent=2))
+    else:
+        backend.clear(f"{args.namespace}:" if args.namespace else "")
+        print(f"Cleared {args.namespace or 'all namespaces'} from the {backend.name} cache")
+
+
+if __name__ == "__main__":
+    main()
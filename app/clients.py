@@ -0,0 +1,53 @@
+import threading
+
+from app.config import config, COSMOS_ENDPOINT, COSMOS_KEY, COSMOS_DATABASE
+
+# Process-shared clients, created on first use instead of at import time
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _shared(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+# Azure OpenAI client
+def get_openai_client():
+    def factory():
+        from openai import AzureOpenAI
+
+        return AzureOpenAI(
+            azure_endpoint=config["endpoint"],
+            api_version=config["api_version"],
+            api_key=config["api_key"],
+        )
+
+    return _shared("openai", factory)
+
+
+# Cosmos database client
+def get_database():
+    def factory():
+        from azure.cosmos import CosmosClient
+
+        cosmos_client = CosmosClient(url=COSMOS_ENDPOINT, credential=COSMOS_KEY)
+        return cosmos_client.get_database_client(COSMOS_DATABASE)
+
+    return _shared("cosmos", factory)
+
+
+# Cosmos container client ("styles" or "outputs"); provisions once per deployment
+def get_container(name):
+    def factory():
+        import app.provision as provision
+
+        provision.ensure_provisioned(get_database())
+        return get_database().get_container_client(name)
+
+    return _shared(f"container:{name}", factory)
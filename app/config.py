@@ -0,0 +1,21 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Azure OpenAI connection
+config = {
+    "endpoint": os.getenv("AZURE_OPENAI_ENDPOINT"),
+    "api_key": os.getenv("AZURE_OPENAI_KEY"),
+    "api_version": os.getenv("AZURE_OPENAI_API_VERSION"),
+    "model": os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT"),
+}
+
+# Azure Cosmos DB connection
+COSMOS_ENDPOINT = os.getenv("AZURE_COSMOS_ENDPOINT")
+COSMOS_KEY = os.getenv("AZURE_COSMOS_KEY")
+COSMOS_DATABASE = os.getenv("AZURE_COSMOS_DATABASE")
+
+# Local state (markers, caches, local stores) kept outside the source tree
+STATE_DIR = os.getenv("APP_STATE_DIR", ".state")
@@ -0,0 +1,143 @@
+"""Streamlit-free core: prompts, model calls, and saving styles and outputs.
+
+The Streamlit pages (through app.prompts and app.utils) and the HTTP API
+(app.api) are both built on these functions. Nothing here reads session
+state or request headers: every input is an argument.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import app.metrics as metrics
+import app.refdata as refdata
+import app.search as search
+from app.clients import get_openai_client
+from app.config import config
+from app.storage import get_storage, NotFoundError
+
+# App Service authentication headers, and the values used when running locally
+USER_ID_HEADER = "X-MS-CLIENT-PRINCIPAL-ID"
+USER_NAME_HEADER = "X-MS-CLIENT-PRINCIPAL-NAME"
+DEFAULT_USER_ID = "12345"
+DEFAULT_USER_NAME = "r0bai"
+
+
+# (user id, user name) from request headers
+def user_from_headers(headers):
+    return headers.get(USER_ID_HEADER, DEFAULT_USER_ID), headers.get(USER_NAME_HEADER, DEFAULT_USER_NAME)
+
+
+_last_id = 0
+_id_lock = threading.Lock()
+
+
+# document id: epoch milliseconds, unique within the process even when
+# several documents are created in the same millisecond
+def new_id():
+    global _last_id
+    with _id_lock:
+        _last_id = max(_last_id + 1, int(time.time() * 1000))
+        return str(_last_id)
+
+
+# messages of the Style Reader prompt (few-shot example from the reference data)
+def style_messages(combined_text, additional_instruction=""):
+    additional_instruction = (additional_instruction or "").strip()
+    if additional_instruction:
+        combined_text = f"{combined_text}\n\n[Additional Instructions: {additional_instruction}]"
+
+    data = refdata.get()
+    return [
+        {"role": "system", "content": data.llm_instructions},
+        {"role": "user", "content": data.training_content},
+        {"role": "assistant", "content": data.training_output},
+        {"role": "user", "content": combined_text},
+    ]
+
+
+# messages of the Style Writer prompt
+def rewrite_messages(content_all, style, guidelines, example, max_output_length, additional_instruction=""):
+    system = [
+        "You are an expert writer assistant. Rewrite the user input based on the following writing style, writing guidelines and writing example.\n",
+        f"<writingStyle>{style}</writingStyle>\n",
+        f"<writingGuidelines>{guidelines}</writingGuidelines>\n",
+        f"<writingExample>{example}</writingExample>\n",
+        "Make sure to emulate the writing style, guidelines and example provided above.",
+        f"YOU CAN ONLY OUTPUT A MAXIMUM OF {max_output_length} WORDS"
+    ]
+
+    additional_instruction = (additional_instruction or "").strip()
+    if additional_instruction:
+        system.append(f"\n<additionalInstructions>{additional_instruction}</additionalInstructions>")
+
+    return [
+        {"role": "system", "content": "\n".join(system)},
+        {"role": "user", "content": content_all},
+    ]
+
+
+# text deltas of a streamed chat completion
+def stream_chat(messages, format="text"):
+    start = time.perf_counter()
+    chars = 0
+    for completion in get_openai_client().chat.completions.create(
+        model=config["model"],
+        messages=messages,
+        stream=True,
+        response_format={"type": format},
+    ):
+        if completion.choices and completion.choices[0].delta.content is not None:
+            delta = completion.choices[0].delta.content
+            chars += len(delta)
+            yield delta
+    metrics.observe("chat.completion", time.perf_counter() - start)
+    metrics.incr("chat.output_chars", chars)
+
+
+# whole text of a chat completion
+def complete_chat(messages, format="text"):
+    return "".join(stream_chat(messages, format))
+
+
+# a style of the user (or a shared one) by id
+def find_style(user_id, style_id):
+    for style in get_storage().get_styles(user_id):
+        if style.get("id") == style_id:
+            return style
+    raise NotFoundError(f"Style {style_id} not found")
+
+
+def new_style(user_id, user_name, name, style, example):
+    return {
+        "id": new_id(),
+        "updatedAt": datetime.now().isoformat(),
+        "name": name,
+        "style": style,
+        "example": example,
+        "user_id": user_id,
+        "user_name": user_name,
+    }
+
+
+def new_output(user_id, user_name, content, style_id, output):
+    return {
+        "id": new_id(),
+        "updatedAt": datetime.now().isoformat(),
+        "content": content,
+        "styleId": style_id,
+        "output": output,
+        "user_id": user_id,
+        "user_name": user_name,
+    }
+
+
+# save an output and add it to the local search index
+def save_output(doc):
+    get_storage().save_output(doc)
+
+    # Keep the local search index in step with saved outputs
+    try:
+        search.get_index().index_output(doc)
+    except Exception as e:
+        print(f"Error indexing output: {e}")
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import app.metrics as metrics
+
+# show the per-render Cosmos usage panel in the sidebar
+COSMOS_DEBUG_PANEL = os.getenv("COSMOS_DEBUG_PANEL", "").lower() in ("1", "true", "yes")
+
+# Usage of the script run executing on this thread (Streamlit runs each
+# script run on its own thread); background work has no run
+_run = threading.local()
+
+_lock = threading.Lock()
+_per_user = defaultdict(lambda: {"ru": 0.0, "calls": 0, "seconds": 0.0})
+
+
+def _request_charge(headers):
+    try:
+        return float((headers or {}).get("x-ms-request-charge", 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# time a Cosmos call and collect its request charge;
+# pass the yielded hook as response_hook= (queries call it once per page)
+@contextmanager
+def track(operation, user_id=None):
+    usage = {"ru": 0.0}
+
+    def hook(headers, *_):
+        usage["ru"] += _request_charge(headers)
+
+    start = time.perf_counter()
+    try:
+        yield hook
+    finally:
+        record(operation, usage["ru"], time.perf_counter() - start, user_id)
+
+
+# add one call to the metrics sink, the current run and the user's totals
+def record(operation, ru, seconds, user_id=None):
+    metrics.incr("cosmos.calls")
+    metrics.incr("cosmos.ru", ru)
+    metrics.incr(f"cosmos.ru.{operation}", ru)
+    metrics.observe(f"cosmos.latency.{operation}", seconds)
+
+    run = getattr(_run, "current", None)
+    if run is not None:
+        op = run["ops"].setdefault(operation, {"ru": 0.0, "calls": 0, "seconds": 0.0})
+        op["ru"] += ru
+        op["calls"] += 1
+        op["seconds"] += seconds
+        user_id = user_id or run["user_id"]
+
+    with _lock:
+        totals = _per_user[user_id or "background"]
+        totals["ru"] += ru
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+
+
+def _summary(run):
+    return {
+        "page": run["page"],
+        "ru": round(sum(op["ru"] for op in run["ops"].values()), 2),
+        "calls": sum(op["calls"] for op in run["ops"].values()),
+        "seconds": round(sum(op["seconds"] for op in run["ops"].values()), 4),
+        "ops": {
+            name: {"ru": round(op["ru"], 2), "calls": op["calls"], "ms": round(op["seconds"] * 1000, 1)}
+            for name, op in sorted(run["ops"].items(), key=lambda item: -item[1]["ru"])
+        },
+    }
+
+
+# start accounting the Cosmos calls made on this thread (one script run)
+def begin_run(user_id, page=""):
+    run = {"user_id": user_id, "page": page, "ops": {}}
+    _run.current = run
+    return run
+
+
+# close a run: record its page cost and return its summary (None if it made no calls)
+def finish_run(run):
+    if getattr(_run, "current", None) is run:
+        _run.current = None
+    if not run["ops"]:
+        return None
+    summary = _summary(run)
+    metrics.observe(f"cosmos.page_ru.{run['page'] or 'unknown'}", summary["ru"])
+    return summary
+
+
+# usage so far in the current run
+def current_run():
+    run = getattr(_run, "current", None)
+    return _summary(run) if run else None
+
+
+# cumulative usage per user since the process started
+def per_user():
+    with _lock:
+        return {
+            user: {"ru": round(t["ru"], 2), "calls": t["calls"], "seconds": round(t["seconds"], 3)}
+            for user, t in _per_user.items()
+        }
@@ -0,0 +1,117 @@
+"""Block model of rewritten output, shared by the DOCX and PDF exporters.
+
+parse() reads the text once, block by block (blocks are separated by a
+blank line), and classifies each block as one of:
+
+    {"kind": "heading", "level": 1 | 2, "text": str}
+    {"kind": "table", "rows": [[str, ...], ...]}        # first row is the header
+    {"kind": "list", "ordered": bool, "items": [str, ...],
+     "markers": [str, ...]}                             # "3." / "b)" as written, or "•"
+    {"kind": "paragraph", "lines": [(str, bold), ...]}  # ALL-CAPS lines are bold
+"""
+
+import re
+from functools import lru_cache
+
+# I. / II. / IV. ... section numbers
+ROMAN_HEADING_RE = re.compile(r'^(I{1,3}V?|IV|V|VI{0,3}|IX|X{1,3}|XL|L|LX{0,3}|XC|C{1,3})\.\s+')
+# "Assessment:", "Summary:" ... section labels
+LABEL_HEADING_RE = re.compile(r'^(Assessment|Directives|Overall|Summary|Scope|Conclusion):', re.IGNORECASE)
+# 1. / 2) numbered items
+NUMBERED_RE = re.compile(r'^(\d+[\.\)])\s+')
+BULLET_RE = re.compile(r'^[-•*▪]\s+')
+# column separators of plain-text tables
+MULTI_SPACE_RE = re.compile(r'\s{2,}')
+
+# a line shorter than this written in capitals is a header
+HEADER_MAX_CHARS = 100
+
+# cell values emphasised in assessment tables
+RATING_KEYWORDS = ('STRONG', 'MODERATE', 'LOW', 'ACCEPTABLE', 'WEAK', 'HIGH')
+
+
+def is_header_line(line):
+    return len(line) < HEADER_MAX_CHARS and line.isupper()
+
+
+def is_rating(cell_text):
+    upper = cell_text.upper()
+    return any(keyword in upper for keyword in RATING_KEYWORDS)
+
+
+# rows of a tab- or space-separated block, or None if it isn't a table
+def _table_rows(lines):
+    non_empty = [line for line in lines if line.strip()]
+    if len(non_empty) < 2:
+        return None
+    # At least 2 lines must have consistent column separators
+    has_tabs = sum(1 for line in non_empty if '\t' in line) >= 2
+    has_spaces = sum(1 for line in non_empty if len(MULTI_SPACE_RE.findall(line)) >= 2) >= 2
+    if not (has_tabs or has_spaces):
+        return None
+
+    rows = []
+    for line in non_empty:
+        if '\t' in line:
+            cells = [cell.strip() for cell in line.split('\t') if cell.strip()]
+        else:
+            cells = [cell.strip() for cell in MULTI_SPACE_RE.split(line) if cell.strip()]
+        if cells:
+            rows.append(cells)
+    if len(rows) < 2:
+        return None
+
+    columns = max(len(row) for row in rows)
+    if columns < 2:
+        return None
+    return [row + [''] * (columns - len(row)) for row in rows]
+
+
+# (ordered, items, markers) of a list block, or None; numbered items keep
+# their numbers as written, so a list continuing at "3." still reads 3, 4
+def _list_items(lines):
+    if len(lines) < 2:
+        return None
+    stripped = [line.strip() for line in lines if line.strip()]
+    if all(BULLET_RE.match(line) for line in stripped):
+        return False, [BULLET_RE.sub('', line, count=1) for line in stripped], ['•'] * len(stripped)
+    matches = [NUMBERED_RE.match(line) for line in stripped]
+    if all(matches):
+        return True, [line[m.end():] for line, m in zip(stripped, matches)], [m.group(1) for m in matches]
+    return None
+
+
+def _block(stripped_block):
+    lines = stripped_block.split('\n')
+
+    rows = _table_rows(lines)
+    if rows:
+        return {"kind": "table", "rows": rows}
+
+    # Major headers: Roman numerals or risk assessment titles
+    if ROMAN_HEADING_RE.match(stripped_block) or LABEL_HEADING_RE.match(stripped_block):
+        return {"kind": "heading", "level": 1, "text": stripped_block}
+
+    items = _list_items(lines)
+    if items:
+        ordered, texts, markers = items
+        return {"kind": "list", "ordered": ordered, "items": texts, "markers": markers}
+
+    # Minor headers: numbered items or an ALL-CAPS first line
+    if NUMBERED_RE.match(stripped_block) or is_header_line(lines[0]):
+        return {"kind": "heading", "level": 2, "text": stripped_block}
+
+    return {
+        "kind": "paragraph",
+        "lines": [(line.strip(), is_header_line(line.strip())) for line in lines if line.strip()],
+    }
+
+
+# blocks of a rewritten output; cached so both exporters share one parse
+@lru_cache(maxsize=16)
+def parse(text):
+    return tuple(
+        _block(block.strip())
+        for block in text.replace("\r\n", "\n").split("\n\n")
+        if block.strip()
+    )
@@ -0,0 +1,89 @@
+"""Bulk writer for assessment tables in DOCX exports.
+
+python-docx builds a table cell by cell: a proxy object, a run and a
+property element per cell, each found by walking the tree again. For
+rating tables with hundreds of rows it is much faster to emit the table
+XML in one pass from shared templates and parse it once.
+"""
+
+from xml.sax.saxutils import escape
+
+import app.docmodel as docmodel
+
+TABLE_STYLE = "Light Grid Accent 1"
+HEADER_FILL = "D9D9D9"
+# run properties: Calibri 10 pt
+FONT_NAME = "Calibri"
+FONT_HALF_POINTS = 20
+TWIPS_PER_INCH = 1440
+EMU_PER_TWIP = 635
+
+_NSDECLS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+# column widths (inches) of BSP assessment tables by column count
+def column_widths(columns):
+    if columns == 2:
+        return [4.0, 1.5]
+    if columns == 3:
+        return [2.5, 2.0, 1.5]
+    if columns == 4:
+        return [2.0, 2.0, 1.0, 1.5]
+    return [6.0 / columns] * columns
+
+
+def table_xml(rows, style_id, cell_width):
+    """<w:tbl> for parsed rows (first row is the header); cell_width in twips."""
+    columns = len(rows[0])
+    grid = "".join(
+        f'<w:gridCol w:w="{int(width * TWIPS_PER_INCH)}"/>' for width in column_widths(columns)
+    )
+
+    # Cell and run properties are the same for every cell of a kind
+    fonts = f'<w:rFonts w:ascii="{FONT_NAME}" w:hAnsi="{FONT_NAME}"/>'
+    size = f'<w:sz w:val="{FONT_HALF_POINTS}"/>'
+    header_open = (
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{cell_width}"/><w:vAlign w:val="center"/>'
+        f'<w:shd w:fill="{HEADER_FILL}"/></w:tcPr>'
+        f'<w:p><w:pPr><w:jc w:val="center"/></w:pPr><w:r><w:rPr>{fonts}<w:b/>{size}</w:rPr><w:t>'
+    )
+    body_open = (
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{cell_width}"/><w:vAlign w:val="center"/></w:tcPr>'
+        f'<w:p><w:pPr><w:jc w:val="left"/></w:pPr><w:r><w:rPr>{fonts}{size}</w:rPr><w:t>'
+    )
+    rating_open = body_open.replace(f"{fonts}{size}", f"{fonts}<w:b/>{size}")
+    cell_close = "</w:t></w:r></w:p></w:tc>"
+
+    parts = [
+        f'<w:tbl {_NSDECLS}><w:tblPr><w:tblStyle w:val="{style_id}"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:jc w:val="left"/><w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+        'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>',
+        f"<w:tblGrid>{grid}</w:tblGrid>",
+        "<w:tr>",
+    ]
+    for cell in rows[0]:
+        parts += (header_open, escape(cell), cell_close)
+    parts.append("</w:tr>")
+    for row in rows[1:]:
+        parts.append("<w:tr>")
+        for cell in row:
+            # Highlight ratings/assessment values
+            parts += (rating_open if docmodel.is_rating(cell) else body_open, escape(cell), cell_close)
+        parts.append("</w:tr>")
+    parts.append("</w:tbl>")
+    return "".join(parts)
+
+
+# append a formatted assessment table to the document body and return it
+def add_assessment_table(doc, rows):
+    from docx.oxml import parse_xml
+    from docx.table import Table
+
+    # Same cell width python-docx's add_table would use: text width / columns
+    section = doc.sections[-1]
+    block_width = section.page_width - section.left_margin - section.right_margin
+    cell_width = block_width // len(rows[0]) // EMU_PER_TWIP
+
+    tbl = parse_xml(table_xml(rows, doc.styles[TABLE_STYLE].style_id, cell_width))
+    doc.element.body._insert_tbl(tbl)
+    return Table(tbl, doc._body)
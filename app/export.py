@@ -0,0 +1,1053 @@
+"""DOCX/PDF exports of rewritten output (UKB 04 report format).
+
+Renders are cached per (output hash, title, format, date) in a bounded
+in-memory LRU backed by the shared cache (app.cache), so reruns, repeated
+downloads and other app processes don't rebuild documents. Builds run in
+the render service's worker processes.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from io import BytesIO
+
+import app.cache as cache
+import app.docmodel as docmodel
+import app.docx_table as docx_table
+import app.metrics as metrics
+import app.render_service as render_service
+
+# memory budget (MB) for cached export bytes
+EXPORT_CACHE_MAX_MB = float(os.getenv("EXPORT_CACHE_MAX_MB", "64"))
+# seconds rendered bytes stay in the shared cache (keys change daily anyway)
+EXPORT_CACHE_TTL_SECONDS = int(os.getenv("EXPORT_CACHE_TTL_SECONDS", "86400"))
+
+MIME_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+
+
+# report title of an output, as on the Style Writer page
+def output_title(style_id):
+    return f"Rewrite • {style_id or 'Selected Style'}"
+
+
+# Per-export values in the DOCX front matter; the rest of it never changes
+TITLE_PLACEHOLDER = "{{TITLE}}"
+DATE_PLACEHOLDER = "{{DATE}}"
+
+
+def _build_docx_front_matter():
+    """Cover page, confidentiality notice, TOC and list of acronyms (UKB 04), with placeholders."""
+    from docx import Document
+    from docx.shared import Pt, Inches
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    doc = Document()
+    
+    # Set default font and margins
+    sections = doc.sections
+    for section in sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1.25)
+        section.right_margin = Inches(1.25)
+    
+    # === COVER PAGE ===
+    # Add BSP Logo if available
+    logo_path = "img/bsp-logo.png"
+    if os.path.exists(logo_path):
+        p = doc.add_paragraph()
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = p.add_run()
+        run.add_picture(logo_path, width=Inches(1.5))
+    
+    doc.add_paragraph()
+    
+    # BANGKO SENTRAL NG PILIPINAS
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("BANGKO SENTRAL NG PILIPINAS")
+    run.font.size = Pt(16)
+    run.font.bold = True
+    
+    doc.add_paragraph()
+    
+    # FINANCIAL SUPERVISION SECTOR
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("FINANCIAL SUPERVISION SECTOR")
+    run.font.size = Pt(12)
+    run.font.bold = True
+    
+    # Add spacing
+    for _ in range(3):
+        doc.add_paragraph()
+    
+    # Main Title with box
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("REPORT OF EXAMINATION")
+    run.font.size = Pt(16)
+    run.font.bold = True
+    
+    # Add spacing
+    for _ in range(2):
+        doc.add_paragraph()
+    
+    # Style/Document Name (dropped when there is no title)
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run(TITLE_PLACEHOLDER)
+    run.font.size = Pt(14)
+    run.font.bold = True
+    
+    doc.add_paragraph()
+    
+    # Location
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("Philippines")
+    run.font.size = Pt(11)
+    
+    # Add spacing
+    for _ in range(2):
+        doc.add_paragraph()
+    
+    # Document Type
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("Style Rewrite")
+    run.font.size = Pt(11)
+    
+    # Add spacing
+    for _ in range(3):
+        doc.add_paragraph()
+    
+    # Date
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run(f"Date Generated: {DATE_PLACEHOLDER}")
+    run.font.size = Pt(11)
+    
+    # Page break
+    doc.add_page_break()
+    
+    # === CONFIDENTIALITY NOTICE PAGE ===
+    # Add logo and header
+    if os.path.exists(logo_path):
+        p = doc.add_paragraph()
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = p.add_run()
+        run.add_picture(logo_path, width=Inches(1.2))
+    
+    doc.add_paragraph()
+    
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("FINANCIAL SUPERVISION SECTOR")
+    run.font.size = Pt(10)
+    run.font.bold = True
+    
+    for _ in range(2):
+        doc.add_paragraph()
+    
+    # Report Title
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("REPORT OF EXAMINATION")
+    run.font.size = Pt(14)
+    run.font.bold = True
+    
+    doc.add_paragraph()
+    
+    # Confidentiality Notice
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run("THIS REPORT IS STRICTLY CONFIDENTIAL")
+    run.font.size = Pt(12)
+    run.font.bold = True
+    
+    doc.add_paragraph()
+    
+    notice = doc.add_paragraph()
+    notice.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+    notice_text = ("This report was generated by Bangko Sentral ng Pilipinas (BSP) Style Writer application. "
+                   "The content has been rewritten according to the selected editorial style guidelines. "
+                   "This document is provided for internal use and review purposes. "
+                   "Under no circumstance should this document or any portion thereof be disclosed or made public in any manner, "
+                   "except when allowed by law, regulations, or judicial orders. "
+                   "Please verify the content for accuracy and compliance before official distribution.")
+    run = notice.add_run(notice_text)
+    run.font.size = Pt(10)
+    
+    # Page break
+    doc.add_page_break()
+    
+    # === TABLE OF CONTENTS ===
+    doc.add_heading("TABLE OF CONTENTS", level=1)
+    doc.add_paragraph()
+    
+    # TOC entries
+    toc_items = [
+        ("List of Acronyms", "i"),
+        ("Content", "1"),
+    ]
+    
+    for item, page in toc_items:
+        p = doc.add_paragraph()
+        p.add_run(item).font.size = Pt(11)
+        p.add_run("\t").font.size = Pt(11)
+        p.add_run(page).font.size = Pt(11)
+    
+    # Page break
+    doc.add_page_break()
+    
+    # === LIST OF ACRONYMS ===
+    doc.add_heading("LIST OF ACRONYMS", level=1)
+    doc.add_paragraph()
+    
+    # Comprehensive list of BSP acronyms
+    acronyms = {
+        "AC": "Audit Committee",
+        "ALCO": "Asset and Liability Committee",
+        "ALM": "Asset-Liability Management",
+        "AML": "Anti-Money Laundering",
+        "AP": "Associated Person",
+        "ARA": "Actual Risk Assessment",
+        "B2C": "Business-to-Consumer",
+        "BAU": "Business-as-Usual",
+        "BBS": "Branch Banking Services",
+        "BOD": "Board of Directors",
+        "BSP": "Bangko Sentral ng Pilipinas",
+        "BT": "Bancassurance",
+        "CAMEL": "Capital, Assets, Management, Earnings, Liquidity",
+        "CASA": "Current and Savings Account",
+        "CBS": "Core Banking System",
+        "CDD": "Customer Due Diligence",
+        "CEO": "Chief Executive Officer",
+        "CET": "Common Equity Tier",
+        "CFO": "Chief Financial Officer",
+        "CIMFS": "Customer Incident Management and Feedback System",
+        "CLO": "Chief Lending Officer",
+        "CMDI": "Capital Market Development Initiatives",
+        "COPC": "Certified Unit Selling Personnel",
+        "CORACTS": "Guidelines on Transaction Reporting and Compliance",
+        "CRO": "Chief Risk Officer",
+        "CTF": "Counter-Terrorism Financing",
+        "DCF": "Discounted Cash Flow",
+        "DOT": "Declaration of Trust",
+        "DST": "Documentary Stamp Tax",
+        "EaR": "Earnings at Risk",
+        "ECAI": "External Credit Assessment Institution",
+        "ECL": "Expected Credit Loss",
+        "ECOMM": "E-Commerce",
+        "ERM": "Enterprise Risk Management",
+        "FMS": "Financial Markets Sector",
+        "FOE": "Foreign-Owned Entity",
+        "FSS": "Financial Supervision Sector",
+        "FVOCI": "Fair Value through Other Comprehensive Income",
+        "FVPL": "Fair Value through Profit or Loss",
+        "GCG": "Good Corporate Governance",
+        "HO": "Head Office",
+        "HRMG": "Human Resource Management Group",
+        "IAS": "International Accounting Standards",
+        "IAASB": "Internal Audit and Regulatory Assessment Process",
+        "ICAAP": "Internal Capital Adequacy Assessment Process",
+        "IFRS": "International Financial Reporting Standards",
+        "IMA": "Investment Management Account",
+        "IRRBB": "Interest Rate Risk in the Banking Book",
+        "KRI": "Key Risk Indicator",
+        "LCR": "Liquidity Coverage Ratio",
+        "LGD": "Loss Given Default",
+        "LTV": "Loan-to-Value",
+        "MIS": "Management Information System",
+        "MORB": "Manual of Regulations for Banks",
+        "MORNBFI": "Manual of Regulations for Non-Bank Financial Institutions",
+        "NII": "Net Interest Income",
+        "NIM": "Net Interest Margin",
+        "NPL": "Non-Performing Loan",
+        "NSFR": "Net Stable Funding Ratio",
+        "ORM": "Operational Risk Management",
+        "PD": "Probability of Default",
+        "PFRS": "Philippine Financial Reporting Standards",
+        "RA": "Risk Assessment",
+        "RCSA": "Risk and Control Self-Assessment",
+        "ROA": "Return on Assets",
+        "ROE": "Return on Equity",
+        "RP": "Risk Profile",
+        "RPT": "Related Party Transaction",
+        "RWA": "Risk-Weighted Assets",
+        "SME": "Small and Medium Enterprise",
+        "TBA": "Treasury Bills Auction",
+        "VaR": "Value at Risk",
+        "BSFI": "BSP-Supervised Financial Institution",
+    }
+    
+    # Create table for acronyms
+    table = doc.add_table(rows=len(acronyms) + 1, cols=2)
+    table.style = 'Light Grid Accent 1'
+    
+    # Header row
+    header_cells = table.rows[0].cells
+    header_cells[0].text = "Acronym"
+    header_cells[1].text = "Definition"
+    for cell in header_cells:
+        for paragraph in cell.paragraphs:
+            for run in paragraph.runs:
+                run.font.bold = True
+                run.font.size = Pt(11)
+    
+    # Data rows
+    for idx, (acronym, definition) in enumerate(acronyms.items(), 1):
+        row_cells = table.rows[idx].cells
+        row_cells[0].text = acronym
+        row_cells[1].text = definition
+        for cell in row_cells:
+            for paragraph in cell.paragraphs:
+                for run in paragraph.runs:
+                    run.font.size = Pt(10)
+    
+    # Page break
+    doc.add_page_break()
+    
+    # === MAIN CONTENT ===
+    doc.add_heading("CONTENT", level=1)
+    doc.add_paragraph()
+
+    bio = BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+
+_docx_template = None
+_docx_template_lock = threading.Lock()
+
+
+# front matter rendered once per process and cloned for every export
+def docx_template():
+    global _docx_template
+    with _docx_template_lock:
+        if _docx_template is None:
+            _docx_template = _build_docx_front_matter()
+        return _docx_template
+
+
+def _fill_front_matter(doc, title, date_str):
+    for p in doc.paragraphs:
+        text = p.text
+        if TITLE_PLACEHOLDER in text:
+            if title:
+                p.runs[0].text = title
+            else:
+                p._element.getparent().remove(p._element)
+        elif DATE_PLACEHOLDER in text:
+            p.runs[0].text = p.runs[0].text.replace(DATE_PLACEHOLDER, date_str)
+            # Nothing to fill after the date
+            break
+
+
+def _add_docx_content(doc, text):
+    """Append the rewritten text: headers, paragraphs, lists and assessment tables."""
+    from docx.shared import Cm, Pt
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    for block in docmodel.parse(text):
+        kind = block["kind"]
+        if kind == "table":
+            docx_table.add_assessment_table(doc, block["rows"])
+        elif kind == "heading" and block["level"] == 1:
+            # Major section header - larger, bold, with spacing
+            p = doc.add_paragraph()
+            p.space_before = Pt(12)
+            p.space_after = Pt(6)
+            run = p.add_run(block["text"])
+            run.font.size = Pt(12)
+            run.font.bold = True
+            run.font.name = 'Calibri'
+        elif kind == "heading":
+            # Minor section header - bold, normal size
+            p = doc.add_paragraph()
+            p.space_before = Pt(6)
+            p.space_after = Pt(3)
+            run = p.add_run(block["text"])
+            run.font.size = Pt(11)
+            run.font.bold = True
+            run.font.name = 'Calibri'
+        elif kind == "list":
+            for item, marker in zip(block["items"], block["markers"]):
+                if block["ordered"]:
+                    # The number as written (Word's List Number would count on across
+                    # separate lists); hanging indent like the bulleted style
+                    p = doc.add_paragraph(style='List Paragraph')
+                    p.paragraph_format.left_indent = Cm(0.63)
+                    p.paragraph_format.first_line_indent = Cm(-0.63)
+                    p.paragraph_format.tab_stops.add_tab_stop(Cm(0.63))
+                    item = f"{marker}\t{item}"
+                else:
+                    p = doc.add_paragraph(style='List Bullet')
+                run = p.add_run(item)
+                run.font.size = Pt(11)
+                run.font.name = 'Calibri'
+        else:
+            # Regular content paragraph
+            p = doc.add_paragraph()
+            p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+            
+            # Handle multi-line content; ALL-CAPS lines are bold
+            lines = block["lines"]
+            for i, (line, line_is_header) in enumerate(lines):
+                run = p.add_run(line)
+                run.font.size = Pt(11)
+                run.font.name = 'Calibri'
+                
+                if line_is_header:
+                    run.font.bold = True
+                
+                # Add line break if not last line
+                if i < len(lines) - 1:
+                    p.add_run('\n')
+
+
+def make_docx_bytes(text: str, title: str | None = None) -> bytes:
+    """Return a .docx file (bytes) following UKB 04 format structure."""
+    from docx import Document
+
+    doc = Document(BytesIO(docx_template()))
+    _fill_front_matter(doc, title, datetime.now().strftime("%d %B %Y"))
+    _add_docx_content(doc, text)
+
+    bio = BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+
+def _register_pdf_font_if_available():
+    """Optionally register DejaVuSans for better Unicode PDF rendering."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    try:
+        font_path = os.path.join("assets", "DejaVuSans.ttf")
+        if os.path.exists(font_path):
+            pdfmetrics.registerFont(TTFont("DejaVuSans", font_path))
+            return "DejaVuSans"
+    except Exception:
+        pass
+    # Fallback to built-in Helvetica (ASCII/Latin-1 safe)
+    return "Helvetica"
+
+
+# largest PDF logo is 3 cm wide; 300 px keeps it sharp (~250 dpi) and cheap to embed
+PDF_LOGO_MAX_PX = 300
+LOGO_PATH = "img/bsp-logo.png"
+
+
+def _build_pdf_styles(font_name):
+    """Paragraph styles of the UKB 04 PDF."""
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+
+    bsp_header = ParagraphStyle(
+        "BSPHeader",
+        fontName=font_name,
+        fontSize=16,
+        leading=20,
+        alignment=TA_CENTER,
+        spaceAfter=6,
+    )
+    
+    cover_title = ParagraphStyle(
+        "CoverTitle",
+        fontName=font_name,
+        fontSize=12,
+        leading=16,
+        alignment=TA_CENTER,
+        spaceAfter=18,
+        spaceBefore=12,
+    )
+    
+    cover_main = ParagraphStyle(
+        "CoverMain",
+        fontName=font_name,
+        fontSize=16,
+        leading=20,
+        alignment=TA_CENTER,
+        spaceAfter=18,
+        spaceBefore=24,
+    )
+    
+    cover_subtitle = ParagraphStyle(
+        "CoverSubtitle",
+        fontName=font_name,
+        fontSize=12,
+        leading=16,
+        alignment=TA_CENTER,
+        spaceAfter=12,
+    )
+    
+    cover_small = ParagraphStyle(
+        "CoverSmall",
+        fontName=font_name,
+        fontSize=11,
+        leading=14,
+        alignment=TA_CENTER,
+        spaceAfter=8,
+    )
+    
+    notice_title = ParagraphStyle(
+        "NoticeTitle",
+        fontName=font_name,
+        fontSize=12,
+        leading=16,
+        alignment=TA_CENTER,
+        spaceAfter=18,
+        spaceBefore=6,
+    )
+    
+    notice_body = ParagraphStyle(
+        "NoticeBody",
+        fontName=font_name,
+        fontSize=10,
+        leading=14,
+        alignment=TA_JUSTIFY,
+        spaceAfter=12,
+    )
+    
+    heading_style = ParagraphStyle(
+        "CustomHeading",
+        fontName=font_name,
+        fontSize=14,
+        leading=18,
+        alignment=TA_LEFT,
+        spaceAfter=16,
+        spaceBefore=12,
+    )
+    
+    body_style = ParagraphStyle(
+        "Body",
+        fontName=font_name,
+        fontSize=11,
+        leading=16,
+        alignment=TA_JUSTIFY,
+        spaceAfter=12,
+    )
+    
+    toc_style = ParagraphStyle(
+        "TOC",
+        fontName=font_name,
+        fontSize=11,
+        leading=16,
+        alignment=TA_LEFT,
+        spaceAfter=8,
+    )
+    
+    # Header detection style
+    header_style = ParagraphStyle(
+        "HeaderText",
+        fontName=font_name,
+        fontSize=11,
+        leading=16,
+        alignment=TA_JUSTIFY,
+        spaceAfter=12,
+        spaceBefore=6,
+    )
+    
+    # Bulleted / numbered list items
+    list_style = ParagraphStyle(
+        "ListItem",
+        fontName=font_name,
+        fontSize=11,
+        leading=16,
+        alignment=TA_LEFT,
+        leftIndent=18,
+        bulletIndent=4,
+        bulletFontName=font_name,
+        spaceAfter=4,
+    )
+    
+    # Assessment table cells
+    table_header = ParagraphStyle(
+        "TableHeader",
+        fontName=font_name,
+        fontSize=10,
+        leading=12,
+        alignment=TA_CENTER,
+    )
+    
+    table_cell = ParagraphStyle(
+        "TableCell",
+        fontName=font_name,
+        fontSize=10,
+        leading=12,
+        alignment=TA_LEFT,
+    )
+
+    return {
+        "bsp_header": bsp_header,
+        "cover_title": cover_title,
+        "cover_main": cover_main,
+        "cover_subtitle": cover_subtitle,
+        "cover_small": cover_small,
+        "notice_title": notice_title,
+        "notice_body": notice_body,
+        "heading_style": heading_style,
+        "body_style": body_style,
+        "toc_style": toc_style,
+        "header_style": header_style,
+        "list_style": list_style,
+        "table_header": table_header,
+        "table_cell": table_cell,
+    }
+
+
+def _load_pdf_logo():
+    """Downscaled logo as PNG bytes plus a decoded ImageReader, or (None, None)."""
+    if not os.path.exists(LOGO_PATH):
+        return None, None
+    from PIL import Image as PILImage
+    from reportlab.lib.utils import ImageReader
+
+    with PILImage.open(LOGO_PATH) as image:
+        image.thumbnail((PDF_LOGO_MAX_PX, PDF_LOGO_MAX_PX), PILImage.LANCZOS)
+        bio = BytesIO()
+        image.save(bio, "PNG")
+    png = bio.getvalue()
+    return png, ImageReader(BytesIO(png))
+
+
+_pdf_resources = None
+_pdf_resources_lock = threading.Lock()
+
+
+# fonts, paragraph styles and the logo, prepared once per process
+def pdf_resources():
+    global _pdf_resources
+    with _pdf_resources_lock:
+        if _pdf_resources is None:
+            font_name = _register_pdf_font_if_available()
+            logo_png, logo = _load_pdf_logo()
+            _pdf_resources = {
+                "font_name": font_name,
+                "styles": _build_pdf_styles(font_name),
+                "logo": logo,
+                "logo_png": logo_png,
+            }
+        return _pdf_resources
+
+
+def make_pdf_bytes(text: str, title: str | None = None) -> bytes:
+    """Return a PDF (bytes) following UKB 04 format structure using ReportLab."""
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import PageBreak, Table, TableStyle, Image
+    from reportlab.lib import colors
+    
+    resources = pdf_resources()
+    font_name = resources["font_name"]
+    logo = resources["logo"]
+
+    # Custom page template with header and logo
+    def add_page_header(canvas, doc):
+        """Add BSP logo and header to each page except cover"""
+        canvas.saveState()
+        if logo is not None and doc.page > 1:
+            # Add small logo at top (the shared image is embedded once per PDF)
+            canvas.drawImage(logo, 2.5*cm, A4[1] - 1.5*cm, width=1.5*cm, height=1.5*cm, preserveAspectRatio=True, mask='auto')
+            # Add text next to logo
+            canvas.setFont(font_name, 8)
+            canvas.drawString(4.5*cm, A4[1] - 1.2*cm, "BANGKO SENTRAL NG PILIPINAS")
+            canvas.drawString(4.5*cm, A4[1] - 1.5*cm, "Financial Supervision Sector")
+            # Add line
+            canvas.setStrokeColor(colors.grey)
+            canvas.setLineWidth(0.5)
+            canvas.line(2*cm, A4[1] - 2*cm, A4[0] - 2*cm, A4[1] - 2*cm)
+        canvas.restoreState()
+
+    buf = BytesIO()
+    doc = SimpleDocTemplate(
+        buf,
+        pagesize=A4,
+        leftMargin=3.2 * cm,
+        rightMargin=3.2 * cm,
+        topMargin=3 * cm,
+        bottomMargin=2.5 * cm,
+        title=title or "Rewritten Content",
+        author="BSP Style Writer",
+    )
+
+    # Custom styles matching UKB format (built once per process)
+    pdf_styles = resources["styles"]
+    bsp_header = pdf_styles["bsp_header"]
+    cover_title = pdf_styles["cover_title"]
+    cover_main = pdf_styles["cover_main"]
+    cover_subtitle = pdf_styles["cover_subtitle"]
+    cover_small = pdf_styles["cover_small"]
+    notice_title = pdf_styles["notice_title"]
+    notice_body = pdf_styles["notice_body"]
+    heading_style = pdf_styles["heading_style"]
+    body_style = pdf_styles["body_style"]
+    header_style = pdf_styles["header_style"]
+    list_style = pdf_styles["list_style"]
+    table_header = pdf_styles["table_header"]
+    table_cell = pdf_styles["table_cell"]
+
+    story = []
+    
+    # === COVER PAGE ===
+    # Add BSP Logo
+    if resources["logo_png"]:
+        # Same pixels and mask as the page header logo, so the PDF holds one image
+        img = Image(BytesIO(resources["logo_png"]), width=3*cm, height=3*cm)
+        img.hAlign = 'CENTER'
+        story.append(Spacer(1, 1.5 * cm))
+        story.append(img)
+        story.append(Spacer(1, 0.5 * cm))
+    else:
+        story.append(Spacer(1, 2 * cm))
+    
+    # BSP Header
+    story.append(Paragraph("<b>BANGKO SENTRAL NG PILIPINAS</b>", bsp_header))
+    story.append(Spacer(1, 0.3 * cm))
+    story.append(Paragraph("<b>FINANCIAL SUPERVISION SECTOR</b>", cover_title))
+    story.append(Spacer(1, 2.5 * cm))
+    
+    # Main Title with box effect
+    story.append(Paragraph("<b>REPORT OF EXAMINATION</b>", cover_main))
+    story.append(Spacer(1, 1.5 * cm))
+    
+    if title:
+        title_safe = title.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        story.append(Paragraph(f"<b>{title_safe}</b>", cover_subtitle))
+    
+    story.append(Spacer(1, 0.5 * cm))
+    story.append(Paragraph("Philippines", cover_small))
+    story.append(Spacer(1, 1 * cm))
+    story.append(Paragraph("Style Rewrite", cover_small))
+    story.append(Spacer(1, 2 * cm))
+    
+    date_str = datetime.now().strftime("%d %B %Y")
+    story.append(Paragraph(f"Date Generated: {date_str}", cover_small))
+    
+    # Page break
+    story.append(PageBreak())
+    
+    # === CONFIDENTIALITY NOTICE PAGE ===
+    story.append(Spacer(1, 2 * cm))
+    story.append(Paragraph("<b>REPORT OF EXAMINATION</b>", heading_style))
+    story.append(Spacer(1, 0.5 * cm))
+    story.append(Paragraph("<b>THIS REPORT IS STRICTLY CONFIDENTIAL</b>", notice_title))
+    story.append(Spacer(1, 0.8 * cm))
+    
+    notice_text = (
+        "This report was generated by Bangko Sentral ng Pilipinas (BSP) Style Writer application. "
+        "The content has been rewritten according to the selected editorial style guidelines. "
+        "This document is provided for internal use and review purposes. "
+        "Under no circumstance should this document or any portion thereof be disclosed or made public in any manner, "
+        "except when allowed by law, regulations, or judicial orders. "
+        "Please verify the content for accuracy and compliance before official distribution."
+    )
+    story.append(Paragraph(notice_text, notice_body))
+    
+    # Page break
+    story.append(PageBreak())
+    
+    # === TABLE OF CONTENTS ===
+    story.append(Paragraph("<b>TABLE OF CONTENTS</b>", heading_style))
+    story.append(Spacer(1, 0.8 * cm))
+    
+    toc_data = [
+        ["", "Page No."],
+        ["List of Acronyms", "i"],
+        ["Content", "1"],
+    ]
+    
+    toc_table = Table(toc_data, colWidths=[12*cm, 3*cm])
+    toc_table.setStyle(TableStyle([
+        ('FONT', (0, 0), (-1, -1), font_name, 11),
+        ('FONT', (0, 0), (-1, 0), font_name, 11),
+        ('FONTNAME', (0, 0), (-1, 0), font_name),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    story.append(toc_table)
+    
+    # Page break
+    story.append(PageBreak())
+    
+    # === LIST OF ACRONYMS ===
+    story.append(Paragraph("<b>LIST OF ACRONYMS</b>", heading_style))
+    story.append(Spacer(1, 0.8 * cm))
+    
+    # Comprehensive list of BSP acronyms
+    acronyms_data = [
+        ["Acronym", "Definition"],
+        ["AC", "Audit Committee"],
+        ["ALCO", "Asset and Liability Committee"],
+        ["ALM", "Asset-Liability Management"],
+        ["AML", "Anti-Money Laundering"],
+        ["AP", "Associated Person"],
+        ["ARA", "Actual Risk Assessment"],
+        ["B2C", "Business-to-Consumer"],
+        ["BAU", "Business-as-Usual"],
+        ["BBS", "Branch Banking Services"],
+        ["BOD", "Board of Directors"],
+        ["BSP", "Bangko Sentral ng Pilipinas"],
+        ["BT", "Bancassurance"],
+        ["CAMEL", "Capital, Assets, Management, Earnings, Liquidity"],
+        ["CASA", "Current and Savings Account"],
+        ["CBS", "Core Banking System"],
+        ["CDD", "Customer Due Diligence"],
+        ["CEO", "Chief Executive Officer"],
+        ["CET", "Common Equity Tier"],
+        ["CFO", "Chief Financial Officer"],
+        ["CIMFS", "Customer Incident Management and Feedback System"],
+        ["CLO", "Chief Lending Officer"],
+        ["CMDI", "Capital Market Development Initiatives"],
+        ["COPC", "Certified Unit Selling Personnel"],
+        ["CORACTS", "Guidelines on Transaction Reporting and Compliance"],
+        ["CRO", "Chief Risk Officer"],
+        ["CTF", "Counter-Terrorism Financing"],
+        ["DCF", "Discounted Cash Flow"],
+        ["DOT", "Declaration of Trust"],
+        ["DST", "Documentary Stamp Tax"],
+        ["EaR", "Earnings at Risk"],
+        ["ECAI", "External Credit Assessment Institution"],
+        ["ECL", "Expected Credit Loss"],
+        ["ECOMM", "E-Commerce"],
+        ["ERM", "Enterprise Risk Management"],
+        ["FMS", "Financial Markets Sector"],
+        ["FOE", "Foreign-Owned Entity"],
+        ["FSS", "Financial Supervision Sector"],
+        ["FVOCI", "Fair Value through Other Comprehensive Income"],
+        ["FVPL", "Fair Value through Profit or Loss"],
+        ["GCG", "Good Corporate Governance"],
+        ["HO", "Head Office"],
+        ["HRMG", "Human Resource Management Group"],
+        ["IAS", "International Accounting Standards"],
+        ["IAASB", "Internal Audit and Regulatory Assessment Process"],
+        ["ICAAP", "Internal Capital Adequacy Assessment Process"],
+        ["IFRS", "International Financial Reporting Standards"],
+        ["IMA", "Investment Management Account"],
+        ["IRRBB", "Interest Rate Risk in the Banking Book"],
+        ["KRI", "Key Risk Indicator"],
+        ["LCR", "Liquidity Coverage Ratio"],
+        ["LGD", "Loss Given Default"],
+        ["LTV", "Loan-to-Value"],
+        ["MIS", "Management Information System"],
+        ["MORB", "Manual of Regulations for Banks"],
+        ["MORNBFI", "Manual of Regulations for Non-Bank Financial Institutions"],
+        ["NII", "Net Interest Income"],
+        ["NIM", "Net Interest Margin"],
+        ["NPL", "Non-Performing Loan"],
+        ["NSFR", "Net Stable Funding Ratio"],
+        ["ORM", "Operational Risk Management"],
+        ["PD", "Probability of Default"],
+        ["PFRS", "Philippine Financial Reporting Standards"],
+        ["RA", "Risk Assessment"],
+        ["RCSA", "Risk and Control Self-Assessment"],
+        ["ROA", "Return on Assets"],
+        ["ROE", "Return on Equity"],
+        ["RP", "Risk Profile"],
+        ["RPT", "Related Party Transaction"],
+        ["RWA", "Risk-Weighted Assets"],
+        ["SME", "Small and Medium Enterprise"],
+        ["TBA", "Treasury Bills Auction"],
+        ["VaR", "Value at Risk"],
+        ["BSFI", "BSP-Supervised Financial Institution"],
+    ]
+    
+    acronyms_table = Table(acronyms_data, colWidths=[3*cm, 12*cm])
+    acronyms_table.setStyle(TableStyle([
+        ('FONT', (0, 0), (-1, -1), font_name, 9),
+        ('FONTNAME', (0, 0), (-1, 0), font_name),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    story.append(acronyms_table)
+    
+    # Page break
+    story.append(PageBreak())
+    
+    # === MAIN CONTENT ===
+    story.append(Paragraph("<b>CONTENT</b>", heading_style))
+    story.append(Spacer(1, 0.5 * cm))
+    
+    def esc(value):
+        # Escape HTML-sensitive characters but preserve structure
+        return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+    # Process content blocks (classified once by docmodel, same as the DOCX)
+    for block in docmodel.parse(text):
+        kind = block["kind"]
+        if kind == "heading":
+            lines = [line.strip() for line in block["text"].split("\n") if line.strip()]
+            story.append(Paragraph("<br/>".join(f"<b>{esc(line)}</b>" for line in lines), header_style))
+        elif kind == "paragraph":
+            formatted_lines = [f"<b>{esc(line)}</b>" if bold else esc(line) for line, bold in block["lines"]]
+            story.append(Paragraph("<br/>".join(formatted_lines), body_style))
+        elif kind == "list":
+            for item, marker in zip(block["items"], block["markers"]):
+                story.append(Paragraph(esc(item), list_style, bulletText=marker))
+            story.append(Spacer(1, 0.2 * cm))
+        elif kind == "table":
+            rows = block["rows"]
+            data = [[Paragraph(f"<b>{esc(cell)}</b>", table_header) for cell in rows[0]]]
+            for row in rows[1:]:
+                data.append([
+                    Paragraph(f"<b>{esc(cell)}</b>" if docmodel.is_rating(cell) else esc(cell), table_cell)
+                    for cell in row
+                ])
+            table = Table(data, colWidths=[doc.width / len(rows[0])] * len(rows[0]), repeatRows=1)
+            table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+                ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ]))
+            story.append(table)
+            story.append(Spacer(1, 0.4 * cm))
+
+    doc.build(story, onFirstPage=add_page_header, onLaterPages=add_page_header)
+    return buf.getvalue()
+
+
+RENDERERS = {
+    "docx": make_docx_bytes,
+    "pdf": make_pdf_bytes,
+}
+
+# Rendered bytes: this process's LRU in front of the shared cache, so other
+# Streamlit, API and job processes reuse a render too
+_cache = cache.namespace("export", ttl=EXPORT_CACHE_TTL_SECONDS, l1_mb=EXPORT_CACHE_MAX_MB)
+_inflight_lock = threading.Lock()
+# renders started by prerender(), by cache key
+_inflight = {}
+
+
+# bumped when the document layout changes, so renders of the old one are not served
+LAYOUT_VERSION = 2
+
+
+# the cover page carries the generation date, so it is part of the key
+def cache_key(text, title, fmt):
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    title_digest = hashlib.sha256((title or "").encode("utf-8")).hexdigest()[:16]
+    return f"v{LAYOUT_VERSION}:{digest}:{title_digest}:{fmt}:{datetime.now().strftime('%Y-%m-%d')}"
+
+
+# bytes of `text` exported as `fmt` ("docx" or "pdf"), rendered at most once per key
+def render(text, title=None, fmt="docx"):
+    key = cache_key(text, title, fmt)
+    data = _cache.get(key)
+    if data is not None:
+        return data
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+    if future is not None:
+        # Already being rendered by prerender()
+        data = render_service.result(future)[0]
+    else:
+        data = render_service.render(fmt, text, title)
+    _cache.set(key, data)
+    return data
+
+
+# start rendering all formats in the background so downloads are ready when clicked
+def prerender(text, title=None, formats=tuple(RENDERERS)):
+    if render_service.RENDER_WORKERS <= 0:
+        return
+    for fmt in formats:
+        key = cache_key(text, title, fmt)
+        if _cache.contains(key):
+            continue
+        with _inflight_lock:
+            if key in _inflight:
+                continue
+            future = _inflight[key] = render_service.submit(fmt, text, title)
+        future.add_done_callback(lambda done, key=key: _settle(key, done))
+
+
+def _settle(key, future):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+    if future.cancelled() or future.exception() is not None:
+        # render() reports the error if the download is requested
+        return
+    _cache.set(key, future.result()[0])
+
+
+# zero-argument callable for st.download_button, rendered only when clicked
+def deferred(text, title=None, fmt="docx"):
+    return lambda: render(text, title, fmt)
+
+
+def cache_stats():
+    return _cache.l1_usage()
+
+
+# name of a saved output's file inside a bundle: <date>_<style>_<id>.<fmt>
+def bundle_name(doc, fmt):
+    parts = ((doc.get("updatedAt") or "")[:10], doc.get("styleId") or "output", doc.get("id") or "")
+    return "_".join(re.sub(r"[^\w.-]+", "-", part) for part in parts if part) + f".{fmt}"
+
+
+def write_bundle(docs, fileobj, formats=tuple(RENDERERS), workers=None, progress=None):
+    """Render saved outputs and write them into a ZIP on `fileobj`.
+
+    Documents render concurrently through render() (so cached ones are
+    reused) and each file goes into the archive as soon as it is ready;
+    at most a few rendered files are held at a time. `progress(done, total)`
+    is called after each file. A document that fails to render is left out
+    and listed in errors. Returns files, errors, bytes and seconds.
+    """
+    workers = workers or max(2, render_service.RENDER_WORKERS)
+    jobs = [(doc, fmt) for doc in docs for fmt in formats]
+    start = time.perf_counter()
+    done, errors = 0, []
+
+    # DOCX is a ZIP already and PDF streams are compressed: store, don't deflate again
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_STORED) as bundle, ThreadPoolExecutor(workers) as pool:
+        pending = {}
+
+        def settle(futures):
+            nonlocal done
+            for future in futures:
+                name = pending.pop(future)
+                try:
+                    bundle.writestr(name, future.result())
+                except Exception as e:
+                    # Any failure of one document (render, timeout, worker) leaves only it out
+                    errors.append(f"{name}: {e}")
+                done += 1
+                if progress:
+                    progress(done, len(jobs))
+
+        for doc, fmt in jobs:
+            future = pool.submit(render, doc.get("output") or "", output_title(doc.get("styleId")), fmt)
+            pending[future] = bundle_name(doc, fmt)
+            if len(pending) >= 2 * workers:
+                settle(wait(pending, return_when=FIRST_COMPLETED)[0])
+        settle(wait(pending)[0])
+
+    seconds = time.perf_counter() - start
+    size = fileobj.tell()
+    metrics.incr("export.bundle_bytes", size)
+    metrics.observe("export.bundle", seconds)
+    return {"files": done - len(errors), "errors": errors, "bytes": size, "seconds": round(seconds, 3)}
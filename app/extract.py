@@ -0,0 +1,60 @@
+import hashlib
+from io import BytesIO
+
+import app.cache as cache
+from app.session_store import SESSION_IDLE_SECONDS
+
+# File formats accepted by the upload widgets
+SUPPORTED_TYPES = ["pdf", "docx", "pptx"]
+
+# Text of a file never changes: keyed by content hash, shared by all processes.
+# Uploads are confidential, so the text is kept no longer than a session's
+# spilled texts (app.session_store)
+_cache = cache.namespace("extract", ttl=SESSION_IDLE_SECONDS, l1_mb=32)
+
+
+# extract plain text from the bytes of an uploaded PDF, Word or PowerPoint file
+def extract_text(file_name, file_content):
+    file_type = file_name.split('.')[-1].lower()
+    key = f"{hashlib.sha256(file_content).hexdigest()}.{file_type}"
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached.decode("utf-8")
+
+    extracted_text = _extract(file_type, file_content)
+    _cache.set(key, extracted_text.encode("utf-8"))
+    return extracted_text
+
+
+def _extract(file_type, file_content):
+    extracted_text = ""
+
+    # Format libraries are imported on first use so pages that never
+    # extract text don't pay for them
+    if file_type == 'pdf':
+        from PyPDF2 import PdfReader
+
+        pdf_reader = PdfReader(BytesIO(file_content))
+        for page in pdf_reader.pages:
+            text = page.extract_text()
+            if text:
+                extracted_text += text + "\n"
+
+    elif file_type == 'docx':
+        from docx import Document
+
+        doc = Document(BytesIO(file_content))
+        for paragraph in doc.paragraphs:
+            if paragraph.text.strip():
+                extracted_text += paragraph.text + "\n"
+
+    elif file_type == 'pptx':
+        from pptx import Presentation
+
+        prs = Presentation(BytesIO(file_content))
+        for slide in prs.slides:
+            for shape in slide.shapes:
+                if hasattr(shape, "text") and shape.text.strip():
+                    extracted_text += shape.text + "\n"
+
+    return extracted_text
@@ -0,0 +1,521 @@
+"""Durable queue of long model jobs (style extraction, rewrite) run by worker processes.
+
+Jobs are rows of a local SQLite database (JOBS_DB_PATH), so they outlive
+the browser tab, the Streamlit session and the worker that runs them. The
+pages enqueue a job and poll it; workers stream the model output into the
+job row as it arrives. A worker that dies (or is stopped) gives its job
+back to the queue, and the job runs again from the start on another
+worker. Workers pick the next job fairly: users with the fewest running
+jobs first, then the user served least recently, then the oldest job.
+
+    python -m app.jobs work [--processes 2]     supervisor plus worker processes
+    python -m app.jobs stats                    queue depth, per-user backlog, workers
+
+The pages start the supervisor themselves when no worker is alive
+(ensure_workers); run.sh starts it next to Streamlit. With JOB_WORKERS=0
+the pages run model calls in the request, as before.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import app.core as core
+import app.metrics as metrics
+import app.persistence as persistence
+from app.config import STATE_DIR
+from app.storage import get_storage
+
+# queue database file (shared by the Streamlit processes and the workers of this machine)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(STATE_DIR, "jobs.db"))
+# worker processes; 0 runs model calls in the Streamlit request instead
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# jobs of one user running at the same time
+JOB_MAX_RUNNING_PER_USER = int(os.getenv("JOB_MAX_RUNNING_PER_USER", "2"))
+# a running job without a heartbeat for this long goes back to the queue
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# finished jobs are deleted after this many days
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# how often partial output is written, and heartbeats sent
+FLUSH_SECONDS = 0.5
+HEARTBEAT_SECONDS = 5
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id        TEXT PRIMARY KEY,
+    user_id   TEXT NOT NULL,
+    kind      TEXT NOT NULL,
+    status    TEXT NOT NULL,
+    params    TEXT NOT NULL,
+    partial   TEXT NOT NULL DEFAULT '',
+    result    TEXT,
+    error     TEXT,
+    attempts  INTEGER NOT NULL DEFAULT 0,
+    worker    TEXT,
+    created   REAL NOT NULL,
+    started   REAL,
+    heartbeat REAL,
+    finished  REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+CREATE INDEX IF NOT EXISTS jobs_user_started ON jobs (user_id, started);
+
+CREATE TABLE IF NOT EXISTS workers (
+    id        TEXT PRIMARY KEY,
+    pid       INTEGER,
+    host      TEXT,
+    started   REAL,
+    heartbeat REAL,
+    job_id    TEXT
+);
+"""
+
+
+class JobCancelled(Exception):
+    """The job was cancelled, or taken from this worker, while it ran."""
+
+
+class JobQueue:
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # enqueue a job; returns its id
+    def submit(self, kind, user_id, params):
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO jobs (id, user_id, kind, status, params, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, user_id, kind, QUEUED, json.dumps(params), time.time()),
+        )
+        metrics.incr("jobs.submitted")
+        return job_id
+
+    def get(self, job_id):
+        return self._job(self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def cancel(self, job_id):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+            (CANCELLED, time.time(), job_id, *ACTIVE),
+        )
+
+    # queued jobs that will be picked before this one (oldest-first approximation)
+    def position(self, job_id):
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND created < (SELECT created FROM jobs WHERE id = ?)",
+            (QUEUED, job_id),
+        ).fetchone()
+        return row[0]
+
+    # give jobs of dead workers back to the queue (or fail them after too many attempts)
+    def requeue_stale(self, conn=None):
+        conn = conn or self._conn()
+        cutoff = time.time() - JOB_STALE_SECONDS
+        failed = conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished = ? "
+            "WHERE status = ? AND heartbeat < ? AND attempts >= ?",
+            (FAILED, "The worker stopped responding", time.time(), RUNNING, cutoff, JOB_MAX_ATTEMPTS),
+        ).rowcount
+        requeued = conn.execute(
+            "UPDATE jobs SET status = ?, worker = NULL, partial = '' WHERE status = ? AND heartbeat < ?",
+            (QUEUED, RUNNING, cutoff),
+        ).rowcount
+        if requeued or failed:
+            metrics.incr("jobs.requeued", requeued)
+            metrics.incr("jobs.failed", failed)
+        return requeued
+
+    # take the next job for a worker: fewest running jobs of its user, then the
+    # user served least recently, then the oldest job
+    def claim(self, worker_id):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.requeue_stale(conn)
+            row = conn.execute(
+                """
+                SELECT q.id FROM jobs q
+                LEFT JOIN (SELECT user_id, COUNT(*) AS running FROM jobs WHERE status = ? GROUP BY user_id) r
+                    ON r.user_id = q.user_id
+                WHERE q.status = ? AND COALESCE(r.running, 0) < ?
+                ORDER BY COALESCE(r.running, 0),
+                         COALESCE((SELECT MAX(started) FROM jobs s WHERE s.user_id = q.user_id), 0),
+                         q.created
+                LIMIT 1
+                """,
+                (RUNNING, QUEUED, JOB_MAX_RUNNING_PER_USER),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, started = ?, heartbeat = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (RUNNING, worker_id, now, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        job = self.get(row["id"])
+        metrics.observe("jobs.wait", job["started"] - job["created"])
+        return job
+
+    # store partial output; raises JobCancelled when the job is no longer this worker's
+    def progress(self, job_id, worker_id, partial=None):
+        if partial is None:
+            updated = self._conn().execute(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time(), job_id, worker_id, RUNNING),
+            ).rowcount
+        else:
+            updated = self._conn().execute(
+                "UPDATE jobs SET partial = ?, heartbeat = ? WHERE id = ? AND worker = ? AND status = ?",
+                (partial, time.time(), job_id, worker_id, RUNNING),
+            ).rowcount
+        if not updated:
+            raise JobCancelled(job_id)
+
+    def finish(self, job_id, worker_id, result):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, finished = ? WHERE id = ? AND worker = ? AND status = ?",
+            (DONE, json.dumps(result), time.time(), job_id, worker_id, RUNNING),
+        )
+
+    def fail(self, job_id, worker_id, error):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ? AND worker = ? AND status = ?",
+            (FAILED, error, time.time(), job_id, worker_id, RUNNING),
+        )
+
+    # put a job this worker was running back in the queue (worker shutting down)
+    def release(self, job_id, worker_id):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, worker = NULL, partial = '', attempts = MAX(attempts - 1, 0) "
+            "WHERE id = ? AND worker = ? AND status = ?",
+            (QUEUED, job_id, worker_id, RUNNING),
+        )
+
+    def worker_heartbeat(self, worker_id, job_id=None):
+        self._conn().execute(
+            "INSERT INTO workers (id, pid, host, started, heartbeat, job_id) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET heartbeat = excluded.heartbeat, job_id = excluded.job_id",
+            (worker_id, os.getpid(), socket.gethostname(), time.time(), time.time(), job_id),
+        )
+        if job_id:
+            self._conn().execute(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time(), job_id, worker_id, RUNNING),
+            )
+
+    def remove_worker(self, worker_id):
+        self._conn().execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def live_workers(self):
+        rows = self._conn().execute(
+            "SELECT * FROM workers WHERE heartbeat >= ? ORDER BY started",
+            (time.time() - JOB_STALE_SECONDS,),
+        )
+        return [dict(row) for row in rows]
+
+    # delete finished jobs and dead workers older than the retention period
+    def purge(self, days=JOB_RETENTION_DAYS):
+        cutoff = time.time() - days * 86400
+        deleted = self._conn().execute(
+            "DELETE FROM jobs WHERE status NOT IN (?, ?) AND finished < ?", (*ACTIVE, cutoff)
+        ).rowcount
+        self._conn().execute("DELETE FROM workers WHERE heartbeat < ?", (time.time() - JOB_STALE_SECONDS,))
+        return deleted
+
+    # queue depth and throughput figures
+    def stats(self):
+        conn = self._conn()
+        now = time.time()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        for row in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        oldest = conn.execute("SELECT MIN(created) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        recent = conn.execute(
+            "SELECT COUNT(*), AVG(started - created), AVG(finished - started) FROM jobs "
+            "WHERE status = ? AND finished >= ?",
+            (DONE, now - 3600),
+        ).fetchone()
+        by_user = [
+            dict(row)
+            for row in conn.execute(
+                "SELECT user_id, SUM(status = ?) AS queued, SUM(status = ?) AS running FROM jobs "
+                "WHERE status IN (?, ?) GROUP BY user_id ORDER BY queued DESC",
+                (QUEUED, RUNNING, *ACTIVE),
+            )
+        ]
+        return {
+            "depth": counts[QUEUED],
+            "running": counts[RUNNING],
+            "counts": counts,
+            "oldest_wait_seconds": round(now - oldest, 1) if oldest else 0.0,
+            "done_last_hour": recent[0],
+            "avg_wait_seconds": round(recent[1] or 0.0, 2),
+            "avg_run_seconds": round(recent[2] or 0.0, 2),
+            "by_user": by_user,
+            "workers": len(self.live_workers()),
+        }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+# --- Job kinds: handler(params, emit) -> result; emit(text) reports partial output ---
+
+def _stream(messages, emit):
+    parts = []
+    last_flush = time.monotonic()
+    for delta in core.stream_chat(messages):
+        parts.append(delta)
+        if time.monotonic() - last_flush >= FLUSH_SECONDS:
+            emit("".join(parts))
+            last_flush = time.monotonic()
+    return "".join(parts)
+
+
+def _run_rewrite(user_id, params, emit):
+    messages = core.rewrite_messages(
+        params["content"], params["style"], params["guidelines"], params["example"],
+        params["max_words"], params.get("additional_instruction", ""),
+    )
+    output = _stream(messages, emit)
+    doc = core.new_output(user_id, params.get("user_name"), params["content"], params.get("style_id"), output)
+    # Saved by the worker (directly, not write-behind), so the output is kept
+    # even if no page is waiting for it
+    core.save_output(doc)
+    return {"output": output, "output_id": doc["id"]}
+
+
+def _run_extract_style(user_id, params, emit):
+    messages = core.style_messages(params["text"], params.get("additional_instruction", ""))
+    style = _stream(messages, emit)
+    doc = core.new_style(user_id, params.get("user_name"), params["name"], style, params["text"])
+    get_storage().save_style(doc)
+    return {"style": style, "style_id": doc["id"], "name": params["name"]}
+
+
+HANDLERS = {
+    "rewrite": _run_rewrite,
+    "extract_style": _run_extract_style,
+}
+
+
+# --- Workers ---
+
+def _run_job(queue, worker_id, job):
+    start = time.perf_counter()
+
+    def emit(partial):
+        queue.progress(job["id"], worker_id, partial)
+
+    try:
+        # Saved before the job is done: a failed write fails the job
+        with persistence.direct_writes():
+            result = HANDLERS[job["kind"]](job["user_id"], job["params"], emit)
+    except JobCancelled:
+        metrics.incr("jobs.cancelled")
+        return
+    except Exception as e:
+        queue.fail(job["id"], worker_id, str(e) or type(e).__name__)
+        metrics.incr("jobs.failed")
+        print(f"Job {job['id']} ({job['kind']}) failed: {e}")
+        return
+    queue.finish(job["id"], worker_id, result)
+    metrics.incr("jobs.done")
+    metrics.observe(f"jobs.run.{job['kind']}", time.perf_counter() - start)
+
+
+# one worker: claim and run jobs until `stop` is set
+def work(stop=None, poll_seconds=0.5):
+    queue = get_queue()
+    stop = stop or threading.Event()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    current = {"job": None}
+
+    # Heartbeats from a thread: the first model token can take longer than JOB_STALE_SECONDS
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                queue.worker_heartbeat(worker_id, current["job"])
+            except sqlite3.Error as e:
+                print(f"Job worker heartbeat failed: {e}")
+
+    queue.worker_heartbeat(worker_id)
+    threading.Thread(target=beat, daemon=True).start()
+    try:
+        while not stop.is_set():
+            job = queue.claim(worker_id)
+            if job is None:
+                stop.wait(poll_seconds)
+                continue
+            current["job"] = job["id"]
+            queue.worker_heartbeat(worker_id, job["id"])
+            _run_job(queue, worker_id, job)
+            current["job"] = None
+    finally:
+        if current["job"]:
+            # Stopped mid-job: let another worker start it over now
+            queue.release(current["job"], worker_id)
+        queue.remove_worker(worker_id)
+
+
+def _worker_main():
+    # Stop after giving the current job back, instead of leaving it to go stale
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, interrupt)
+    try:
+        work()
+    except KeyboardInterrupt:
+        pass
+
+
+# exclusive lock on an open file without waiting; raises OSError when it is held
+def _try_lock(file):
+    try:
+        import fcntl
+    except ImportError:
+        # Windows
+        import msvcrt
+
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+# worker processes of this machine, restarted when they die; one supervisor per queue file
+def supervise(processes=JOB_WORKERS):
+    lock_file = open(f"{JOBS_DB_PATH}.lock", "w")
+    try:
+        _try_lock(lock_file)
+    except OSError:
+        print("Job workers are already running for this queue")
+        return
+
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    queue = get_queue()
+    last_purge = last_emit = 0.0
+    print(f"Starting {processes} job workers on {JOBS_DB_PATH}")
+    try:
+        while not stopping.is_set():
+            workers = [w for w in workers if w.is_alive()]
+            while len(workers) < processes:
+                worker = context.Process(target=_worker_main, daemon=True)
+                worker.start()
+                workers.append(worker)
+                metrics.incr("jobs.worker_starts")
+            queue.requeue_stale()
+            now = time.time()
+            if now - last_purge > 3600:
+                queue.purge()
+                last_purge = now
+            if now - last_emit > 60:
+                # Queue depth as a log line for log-based collection
+                print(json.dumps({"jobs": queue.stats(), "ts": now}))
+                last_emit = now
+            stopping.wait(2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join(timeout=10)
+        lock_file.close()
+
+
+_supervisor_checked = 0.0
+_supervisor_lock = threading.Lock()
+
+
+# start the worker supervisor in the background if no worker is alive (checked at most every 30s)
+def ensure_workers():
+    global _supervisor_checked
+    if JOB_WORKERS <= 0:
+        return
+    with _supervisor_lock:
+        if time.time() - _supervisor_checked < 30:
+            return
+        _supervisor_checked = time.time()
+    if get_queue().live_workers():
+        return
+    # A separate session: workers keep running when a Streamlit process restarts;
+    # the child has its own copy of the log file, so ours is closed right away
+    with open(os.path.join(os.path.dirname(JOBS_DB_PATH) or ".", "jobs.log"), "a") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "app.jobs", "work", "--processes", str(JOB_WORKERS)],
+            stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    work_parser = commands.add_parser("work", help="run the supervisor and its worker processes")
+    work_parser.add_argument("--processes", type=int, default=max(1, JOB_WORKERS))
+    commands.add_parser("stats", help="print queue depth and workers as JSON")
+    args = parser.parse_args()
+
+    if args.command == "work":
+        supervise(args.processes)
+    else:
+        print(json.dumps(get_queue().stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
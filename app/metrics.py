@@ -0,0 +1,66 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Process-wide metrics sink: counters and timings shared by every session,
+# background worker and CLI running in this process.
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_timings = {}
+
+
+# add to a counter
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+# record one duration (seconds) for a timing
+def observe(name, seconds):
+    with _lock:
+        t = _timings.get(name)
+        if t is None:
+            t = _timings[name] = {"count": 0, "total": 0.0, "max": 0.0}
+        t["count"] += 1
+        t["total"] += seconds
+        t["max"] = max(t["max"], seconds)
+
+
+# time a block of code into a timing
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+# current values of all counters and timings
+def snapshot(prefix=""):
+    with _lock:
+        counters = {k: v for k, v in _counters.items() if k.startswith(prefix)}
+        timings = {
+            k: {
+                "count": t["count"],
+                "total": round(t["total"], 6),
+                "avg": round(t["total"] / t["count"], 6) if t["count"] else 0.0,
+                "max": round(t["max"], 6),
+            }
+            for k, t in _timings.items()
+            if k.startswith(prefix)
+        }
+    return {"counters": counters, "timings": timings}
+
+
+# write the current snapshot as one JSON line (for log-based collection)
+def emit(prefix=""):
+    print(json.dumps({"metrics": snapshot(prefix), "ts": time.time()}))
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -1,5 +1,11 @@
+import functools
 import streamlit as st
+import app.metrics as metrics
+import app.jobs as jobs
+import app.refdata as refdata
+import app.session_store as session_store
 import app.utils as utils
+import app.retention as retention
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -34,6 +40,9 @@ def show_home():
         link="https://www.bsp.gov.ph/SitePages/Default.aspx",
     )
 
+    # Full script runs of this session (see entered())
+    st.session_state.script_runs = st.session_state.get("script_runs", 0) + 1
+
     # --- Initial states ---
     if "content" not in st.session_state:
         st.session_state.content = ""
@@ -47,8 +56,23 @@ def show_home():
         st.session_state.example = ""
     if "exampleText" not in st.session_state:
         st.session_state.exampleText = ""
-    if "locals" not in st.session_state:
-        st.session_state.locals = utils.read_json("data/local_data.json")
+
+    # Guidelines and prompt examples are shared by all sessions (app.refdata)
+    data = refdata.get()
+    if data.error:
+        st.error(data.error)
+
+    # Memory accounting of this session; large texts spill to disk over budget
+    session_store.account(utils.get_user_id())
+
+    # Request-unit accounting for this page render
+    utils.start_cosmos_run()
+
+    # Background output retention (one pruner per process)
+    retention.start_pruner()
+
+    # Worker processes of the job queue (started once per machine)
+    jobs.ensure_workers()
 
     # --- CSS tweaks (optional) ---
     st.markdown(
@@ -63,6 +87,28 @@ def show_home():
     )
 
 
+# True on the first run of page `name` after another page (or a new session);
+# call it once per run, after show_home()
+def entered(name):
+    run = st.session_state.get("script_runs", 0)
+    last_runs = st.session_state.setdefault("page_last_run", {})
+    previous, last_runs[name] = last_runs.get(name), run
+    return previous != run - 1
+
+
+# st.fragment that records the duration of each of its runs as the metric `name`
+def fragment(name, **kwargs):
+    def decorate(func):
+        @functools.wraps(func)
+        def timed(*args, **kw):
+            with metrics.timer(name):
+                return func(*args, **kw)
+
+        return st.fragment(timed, **kwargs)
+
+    return decorate
+
+
 # display the sidebar
 def show_sidebar():
     with st.sidebar:
@@ -76,3 +122,6 @@ def show_sidebar():
         #     "https://sa.kapamilya.com/absnews/abscbnnews/media/2020/business/11/19/20170731-bsp-md-2.jpg",
         # )
         st.write("Powered by LikhAI.")
+
+    utils.show_persistence_status()
+    utils.show_cosmos_usage()
@@ -0,0 +1,212 @@
+import asyncio
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import app.cosmos_usage as cosmos_usage
+import app.metrics as metrics
+from azure.cosmos import exceptions
+from app.config import COSMOS_ENDPOINT, COSMOS_KEY, COSMOS_DATABASE
+
+# bounded queue; when it is full writers fall back to a synchronous write
+PERSIST_QUEUE_SIZE = int(os.getenv("PERSIST_QUEUE_SIZE", "1000"))
+# max writes flushed together, and how long to wait to fill a batch
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "25"))
+PERSIST_FLUSH_SECONDS = float(os.getenv("PERSIST_FLUSH_SECONDS", "0.2"))
+# attempts per write for throttling / transient errors
+PERSIST_MAX_ATTEMPTS = int(os.getenv("PERSIST_MAX_ATTEMPTS", "5"))
+# seconds allowed to drain pending writes on shutdown
+PERSIST_DRAIN_SECONDS = float(os.getenv("PERSIST_DRAIN_SECONDS", "30"))
+
+# status codes worth retrying: throttled, timeouts and server errors
+RETRYABLE_STATUS = {408, 429, 449, 500, 502, 503, 504}
+
+_STOP = object()
+
+_direct = threading.local()
+
+
+# writes of the calling thread skip the queue inside this block, so they are
+# stored (or raise) before the caller goes on, e.g. to report a job done
+@contextmanager
+def direct_writes():
+    previous = getattr(_direct, "enabled", False)
+    _direct.enabled = True
+    try:
+        yield
+    finally:
+        _direct.enabled = previous
+
+
+def writes_directly():
+    return getattr(_direct, "enabled", False)
+
+
+class WriteBehindQueue:
+    """Background writer that persists documents with the async Cosmos client."""
+
+    def __init__(self, endpoint, key, database_name):
+        self._endpoint = endpoint
+        self._key = key
+        self._database_name = database_name
+        self._queue = queue.Queue(maxsize=PERSIST_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._failures = defaultdict(lambda: deque(maxlen=20))
+        self._closed = False
+        self._thread = threading.Thread(target=self._thread_main, name="cosmos-write-behind", daemon=True)
+        self._thread.start()
+
+    # queue a document for writing; returns False if the queue is full or closed
+    def submit(self, container_name, body, label="item"):
+        if self._closed:
+            return False
+        user_id = body.get("user_id")
+        with self._lock:
+            self._pending[user_id] += 1
+        try:
+            self._queue.put((container_name, body, label), timeout=0.05)
+        except queue.Full:
+            with self._lock:
+                self._pending[user_id] -= 1
+            metrics.incr("persistence.queue_full")
+            return False
+        metrics.incr("persistence.enqueued")
+        return True
+
+    # number of writes not yet flushed for a user
+    def pending(self, user_id):
+        with self._lock:
+            return self._pending.get(user_id, 0)
+
+    # failed write messages for a user (cleared once read)
+    def pop_failures(self, user_id):
+        with self._lock:
+            failures = self._failures.pop(user_id, None)
+        return list(failures or [])
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": PERSIST_QUEUE_SIZE,
+            "pending_users": sum(1 for v in self._pending.values() if v),
+        }
+
+    # stop accepting writes and flush what is queued
+    def close(self, timeout=PERSIST_DRAIN_SECONDS):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _thread_main(self):
+        try:
+            asyncio.run(self._run())
+        except Exception as e:
+            # Writer is gone (e.g. client failed to start); fail what is queued
+            self._closed = True
+            print(f"Write-behind queue stopped: {e}")
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    self._record(item[1], item[2], e)
+
+    def _next_batch(self):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=1.0))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + PERSIST_FLUSH_SECONDS
+        while len(batch) < PERSIST_BATCH_SIZE and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    async def _run(self):
+        from azure.cosmos.aio import CosmosClient
+
+        async with CosmosClient(self._endpoint, credential=self._key) as client:
+            database = client.get_database_client(self._database_name)
+            containers = {}
+            while True:
+                batch = await asyncio.to_thread(self._next_batch)
+                stop = any(item is _STOP for item in batch)
+                writes = [item for item in batch if item is not _STOP]
+                if writes:
+                    start = time.perf_counter()
+                    await asyncio.gather(*(self._write(database, containers, *item) for item in writes))
+                    metrics.observe("persistence.batch", time.perf_counter() - start)
+                if stop:
+                    return
+
+    async def _write(self, database, containers, container_name, body, label):
+        container = containers.get(container_name)
+        if container is None:
+            container = containers[container_name] = database.get_container_client(container_name)
+
+        error = None
+        for attempt in range(PERSIST_MAX_ATTEMPTS):
+            try:
+                with cosmos_usage.track(f"{container_name}.create", body.get("user_id")) as hook:
+                    await container.create_item(body=body, response_hook=hook)
+                metrics.incr("persistence.written")
+                error = None
+                break
+            except exceptions.CosmosHttpResponseError as e:
+                error = e
+                if e.status_code not in RETRYABLE_STATUS:
+                    break
+            except Exception as e:
+                error = e
+            if attempt < PERSIST_MAX_ATTEMPTS - 1:
+                metrics.incr("persistence.retries")
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 5.0))
+
+        self._record(body, label, error)
+
+    # settle one write: drop it from pending and keep its failure for the UI
+    def _record(self, body, label, error):
+        user_id = body.get("user_id")
+        with self._lock:
+            self._pending[user_id] -= 1
+            if error is not None:
+                self._failures[user_id].append(f"An error occurred while saving {label}: {error}")
+        if error is not None:
+            metrics.incr("persistence.failed")
+            print(f"Write-behind failed for {label} {body.get('id')}: {error}")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+# process-wide write-behind queue
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehindQueue(COSMOS_ENDPOINT, COSMOS_KEY, COSMOS_DATABASE)
+            atexit.register(_writer.close)
+        return _writer
+
+
+# the write-behind queue if this process has started one
+def active_writer():
+    return _writer
@@ -1,19 +1,12 @@
 import streamlit as st
+import app.core as core
+import app.session_store as session_store
 import app.utils as utils
 
 
 def extract_style(combined_text, debug):
     # Append additional instruction if provided
-    additional_instruction = st.session_state.get("additional_instruction_reader", "").strip()
-    if additional_instruction:
-        combined_text = f"{combined_text}\n\n[Additional Instructions: {additional_instruction}]"
-    
-    messages = [
-        {"role": "system", "content": st.session_state.locals["llm_instructions"]},
-        {"role": "user", "content": st.session_state.locals["training_content"]},
-        {"role": "assistant", "content": st.session_state.locals["training_output"]},
-        {"role": "user", "content": combined_text},
-    ]
+    messages = core.style_messages(combined_text, st.session_state.get("additional_instruction_reader", ""))
 
     if debug:
         st.write(messages)
@@ -21,25 +14,38 @@ def extract_style(combined_text, debug):
 
 
 def rewrite_content(content_all, max_output_length, debug):
-    system = [
-        "You are an expert writer assistant. Rewrite the user input based on the following writing style, writing guidelines and writing example.\n",
-        f"<writingStyle>{st.session_state.style}</writingStyle>\n",
-        f"<writingGuidelines>{st.session_state.guidelines}</writingGuidelines>\n",
-        f"<writingExample>{st.session_state.example}</writingExample>\n",
-        "Make sure to emulate the writing style, guidelines and example provided above.",
-        f"YOU CAN ONLY OUTPUT A MAXIMUM OF {max_output_length} WORDS"
-    ]
-    
-    # Append additional instruction if provided
-    additional_instruction = st.session_state.get("additional_instruction", "").strip()
-    if additional_instruction:
-        system.append(f"\n<additionalInstructions>{additional_instruction}</additionalInstructions>")
-
-    messages = [
-        {"role": "system", "content": "\n".join(system)},
-        {"role": "user", "content": content_all},
-    ]
+    messages = core.rewrite_messages(
+        content_all,
+        session_store.get("style", ""),
+        st.session_state.guidelines,
+        session_store.get("example", ""),
+        max_output_length,
+        # Append additional instruction if provided
+        st.session_state.get("additional_instruction", ""),
+    )
 
     if debug:
         st.write(messages)
     return utils.chat(messages, 0.7)
+
+
+# inputs of a queued rewrite job (app.jobs), taken from the page state like rewrite_content
+def rewrite_job_params(content_all, max_output_length):
+    return {
+        "content": content_all,
+        "style": session_store.get("style", ""),
+        "guidelines": st.session_state.guidelines,
+        "example": session_store.get("example", ""),
+        "max_words": max_output_length,
+        "additional_instruction": st.session_state.get("additional_instruction", ""),
+        "style_id": st.session_state.get("styleId"),
+    }
+
+
+# inputs of a queued style extraction job (app.jobs)
+def extract_job_params(combined_text, style_name):
+    return {
+        "text": combined_text,
+        "name": style_name,
+        "additional_instruction": st.session_state.get("additional_instruction_reader", ""),
+    }
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import time
+
+from azure.cosmos import PartitionKey
+
+import app.cosmos_usage as cosmos_usage
+from app.config import STATE_DIR, COSMOS_ENDPOINT, COSMOS_DATABASE
+
+# Default time-to-live (seconds) for output documents; unset keeps them forever
+OUTPUTS_TTL_SECONDS = os.getenv("OUTPUTS_TTL_SECONDS")
+
+# Bump when the container configuration below changes
+PROVISION_VERSION = 2
+
+
+# Index only what queries filter and sort on; large text bodies
+# (content, output, example) are never indexed
+def indexing_policy(paths, composite_indexes=()):
+    policy = {
+        "indexingMode": "consistent",
+        "automatic": True,
+        "includedPaths": [{"path": path} for path in paths],
+        "excludedPaths": [{"path": "/*"}],
+    }
+    if composite_indexes:
+        policy["compositeIndexes"] = [list(index) for index in composite_indexes]
+    return policy
+
+
+def containers_config():
+    return [
+        {
+            "name": "styles",
+            "partition_key": PartitionKey(path="/user_id"),
+            "unique_keys": [{"paths": ["/name"]}],
+            "indexing_policy": indexing_policy(["/user_id/?", "/name/?"]),
+        },
+        {
+            "name": "outputs",
+            "partition_key": PartitionKey(path="/user_id"),
+            "default_ttl": int(OUTPUTS_TTL_SECONDS) if OUTPUTS_TTL_SECONDS else None,
+            # WHERE c.user_id = @user_id ORDER BY c.user_id, c.updatedAt DESC
+            "indexing_policy": indexing_policy(
+                ["/user_id/?", "/updatedAt/?"],
+                composite_indexes=[[
+                    {"path": "/user_id", "order": "ascending"},
+                    {"path": "/updatedAt", "order": "descending"},
+                ]],
+            ),
+        }
+    ]
+
+
+# comparable form of an indexing policy (the service adds defaults such as /_etag)
+def _policy_key(policy):
+    policy = policy or {}
+    included = sorted(p["path"] for p in policy.get("includedPaths", []))
+    excluded = sorted(p["path"] for p in policy.get("excludedPaths", []) if p["path"] != '/"_etag"/?')
+    composites = sorted(
+        json.dumps([[c["path"], c.get("order", "ascending")] for c in index])
+        for index in policy.get("compositeIndexes", [])
+    )
+    return included, excluded, composites
+
+
+def ensure_containers_exist(database):
+    for config in containers_config():
+        # Create the container if it doesn't exist yet
+        with cosmos_usage.track("provision.create_container") as hook:
+            container = database.create_container_if_not_exists(
+                id=config["name"],
+                partition_key=config["partition_key"],
+                unique_keys=config.get("unique_keys", []),
+                indexing_policy=config["indexing_policy"],
+                default_ttl=config.get("default_ttl"),
+                response_hook=hook,
+            )
+        migrate_container(database, container, config)
+
+
+# Bring an existing container to the configured indexing policy and TTL.
+# A replace resets every setting it omits, and DatabaseProxy.replace_container
+# cannot send some of them (the unique keys of "styles"), so the container's
+# current properties are sent back in full with only these two changed; the
+# service re-indexes existing documents in the background.
+def migrate_container(database, container, config, dry_run=False):
+    with cosmos_usage.track("container.read") as hook:
+        properties = container.read(response_hook=hook)
+
+    default_ttl = config.get("default_ttl")
+    if default_ttl is None:
+        default_ttl = properties.get("defaultTtl")
+    policy = config["indexing_policy"]
+
+    if (properties.get("defaultTtl") == default_ttl
+            and _policy_key(properties.get("indexingPolicy")) == _policy_key(policy)):
+        return False
+
+    body = replacement_body(properties, policy, default_ttl)
+    if dry_run:
+        print(f"Container {config['name']} would be replaced with:\n{json.dumps(body, indent=2)}")
+        return True
+    with cosmos_usage.track("provision.replace_container") as hook:
+        database.client_connection.ReplaceContainer(container.container_link, body, response_hook=hook)
+    print(f"Updated indexing policy / TTL of container {config['name']}")
+    return True
+
+
+# container properties as read, minus system fields, with a new indexing policy and TTL
+def replacement_body(properties, indexing_policy, default_ttl):
+    body = {key: value for key, value in properties.items() if not key.startswith("_")}
+    body["indexingPolicy"] = indexing_policy
+    if default_ttl is None:
+        body.pop("defaultTtl", None)
+    else:
+        body["defaultTtl"] = default_ttl
+    return body
+
+
+# marker file recording that this endpoint/database/config was provisioned
+def _marker_path():
+    key = json.dumps([COSMOS_ENDPOINT, COSMOS_DATABASE, PROVISION_VERSION, OUTPUTS_TTL_SECONDS])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(STATE_DIR, f"cosmos-provisioned-{digest}.json")
+
+
+# provision containers unless this deployment already did
+def ensure_provisioned(database, force=False):
+    marker = _marker_path()
+    if not force and os.path.exists(marker):
+        return False
+    try:
+        ensure_containers_exist(database)
+    except Exception as e:
+        # Don't block the app; the next process start will try again
+        print(f"Error ensuring containers exist: {e}")
+        return False
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(marker, "w") as file:
+        json.dump({"provisionedAt": time.time(), "version": PROVISION_VERSION}, file)
+    return True
+
+
+if __name__ == "__main__":
+    # Deploy-time step: python -m app.provision [--force]
+    # python -m app.provision --dry-run prints the replace bodies for the existing containers
+    import sys
+    from app.clients import get_database
+
+    if "--dry-run" in sys.argv:
+        database = get_database()
+        for config in containers_config():
+            container = database.get_container_client(config["name"])
+            if not migrate_container(database, container, config, dry_run=True):
+                print(f"Container {config['name']} is up to date.")
+        sys.exit(0)
+    done = ensure_provisioned(get_database(), force="--force" in sys.argv)
+    print("Containers provisioned." if done else "Containers already provisioned.")
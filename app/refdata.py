@@ -0,0 +1,110 @@
+"""Read-only reference data from data/local_data.json, shared by every session.
+
+The file is parsed once per process and parsed again only when its mtime
+(or size) changes. Derived views the pages need (guideline sections, the
+two checkbox columns, default selection, token estimates and joined
+guideline text) are computed at load time instead of on every rerun.
+"""
+
+import json
+import os
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+
+import app.metrics as metrics
+
+LOCAL_DATA_PATH = os.getenv("LOCAL_DATA_PATH", "data/local_data.json")
+
+# guideline sections checked when the Style Writer page opens
+DEFAULT_GUIDELINES = (
+    "ACRONYMS AND ABBREVIATIONS", "CAPITALIZATION", "NUMBERS", "PUNCTUATION", "SPECIAL CHARACTERS",
+    "COMMON GRAMMATICAL ERRORS", "LATIN ABBREVIATIONS", "DOCUMENT SPECIFICATIONS", "WRITING LETTERS",
+    "Common acronyms and abbreviations",
+)
+
+# rough characters per model token, for prompt size estimates
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class RefData:
+    """One immutable snapshot of the reference data and its derived views."""
+
+    def __init__(self, raw, mtime=None, error=None):
+        self.mtime = mtime
+        self.error = error
+        # Few-shot messages of the Style Reader prompt
+        self.llm_instructions = raw.get("llm_instructions", "")
+        self.training_content = raw.get("training_content", "")
+        self.training_output = raw.get("training_output", "")
+
+        self.guidelines = MappingProxyType(dict(raw.get("relevant_guidelines") or {}))
+        self.summaries = MappingProxyType(dict(raw.get("guideline_summaries") or {}))
+        self.sections = tuple(self.guidelines)
+        # Checkbox layout: first half left, second half right
+        mid_point = len(self.sections) // 2
+        self.columns = (self.sections[:mid_point], self.sections[mid_point:])
+        self.default_sections = tuple(s for s in self.sections if s in DEFAULT_GUIDELINES)
+        self.token_counts = MappingProxyType({s: estimate_tokens(c) for s, c in self.guidelines.items()})
+
+        # Joined text per selection, in section order; the common ones are built now
+        self._ordered = lru_cache(maxsize=64)(self._join)
+        self.joined(self.default_sections)
+        self.joined(self.sections)
+
+    def _join(self, sections):
+        return "\n".join(self.guidelines[s] for s in sections)
+
+    # selected guideline text joined with newlines, in section order
+    def joined(self, sections):
+        chosen = set(sections)
+        return self._ordered(tuple(s for s in self.sections if s in chosen))
+
+    # estimated prompt tokens of a guideline selection
+    def tokens(self, sections):
+        return sum(self.token_counts.get(s, 0) for s in set(sections))
+
+
+_data = None
+_data_key = None
+_data_lock = threading.Lock()
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# current reference data; reloaded when the file changes
+def get(path=LOCAL_DATA_PATH):
+    global _data, _data_key
+    try:
+        key = (path, *_file_key(path))
+    except OSError as e:
+        key, error = None, e
+    else:
+        error = None
+
+    with _data_lock:
+        if _data is not None and key == _data_key:
+            return _data
+        if key is None:
+            # Keep serving the last good copy if the file disappears
+            if _data is None:
+                _data = RefData({}, error=f"Reference data not found: {error}")
+            return _data
+        try:
+            with open(path, "r") as file:
+                raw = json.load(file)
+        except (OSError, ValueError) as e:
+            if _data is None or _data.error:
+                _data = RefData({}, error=f"Reference data could not be read: {e}")
+            # A half-written file: try again on the next call
+            return _data
+        _data, _data_key = RefData(raw, mtime=key[1]), key
+        metrics.incr("refdata.loads")
+        return _data
@@ -0,0 +1,228 @@
+"""Document rendering in a pool of worker processes.
+
+DOCX and PDF builds are CPU bound (ReportLab layout of a long report takes
+seconds), so they run in separate processes: formats render concurrently
+and the Streamlit script thread stays free. Text goes in, bytes come out.
+A render that runs past RENDER_TIMEOUT_SECONDS or crashes takes down only
+its own worker process, which is replaced for the next document.
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import app.metrics as metrics
+
+# worker processes; 0 renders in the calling thread
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+# seconds one document may take (from when a worker starts it) before the worker is killed
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "120"))
+# address-space limit per worker in MB (POSIX only); 0 disables
+RENDER_MEMORY_MB = int(os.getenv("RENDER_MEMORY_MB", "2048"))
+
+
+class RenderError(Exception):
+    """A document could not be rendered."""
+
+
+class RenderTimeout(RenderError):
+    """Rendering took longer than RENDER_TIMEOUT_SECONDS."""
+
+
+def _init_worker(memory_mb):
+    if not memory_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        # No rlimits on Windows
+        return
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+# runs in the worker: (bytes, seconds)
+def _render(fmt, text, title):
+    from app.export import RENDERERS
+
+    start = time.perf_counter()
+    data = RENDERERS[fmt](text, title=title)
+    return data, time.perf_counter() - start
+
+
+# worker process: render documents sent over `conn` one at a time
+def _worker_main(conn, memory_mb):
+    _init_worker(memory_mb)
+    import app.export  # noqa: F401  (loaded before the first timed render)
+
+    conn.send(("ready", None))
+    while True:
+        try:
+            fmt, text, title = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send(("ok", _render(fmt, text, title)))
+        except MemoryError:
+            conn.send(("memory", None))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    """A render process and the thread that feeds it, one document at a time.
+
+    The thread measures each render from the moment the document is handed
+    to the process, so time spent queued does not count, and on a timeout
+    or a crash only this process is killed and replaced; renders running
+    in the other workers carry on.
+    """
+
+    def __init__(self, tasks):
+        self._tasks = tasks
+        self._process = None
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name="render-worker", daemon=True)
+        self._thread.start()
+
+    def _start(self):
+        # spawn: forking the multi-threaded Streamlit server is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._conn, child = context.Pipe()
+        self._process = context.Process(target=_worker_main, args=(child, RENDER_MEMORY_MB), daemon=True)
+        self._process.start()
+        child.close()
+        # Starting up (imports) is not part of any render's time
+        if not self._conn.poll(RENDER_TIMEOUT_SECONDS) or self._conn.recv()[0] != "ready":
+            raise EOFError("worker did not start")
+
+    # kill the process from another thread (shutdown); the feeding thread cleans up
+    def terminate(self):
+        process = self._process
+        if process is not None:
+            process.terminate()
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(1)
+            self._conn.close()
+            self._process = self._conn = None
+
+    def _run(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                self.stop()
+                return
+            future, fmt, text, title, timeout = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if self._process is None:
+                    self._start()
+                self._conn.send((fmt, text, title))
+                if not self._conn.poll(timeout):
+                    self.stop()
+                    metrics.incr("render.timeouts")
+                    future.set_exception(RenderTimeout(f"Rendering {fmt} took longer than {timeout:g}s"))
+                    continue
+                status, payload = self._conn.recv()
+            except (EOFError, OSError):
+                self.stop()
+                metrics.incr("render.failures")
+                future.set_exception(RenderError(f"Render worker died while rendering {fmt} (out of memory?)"))
+                continue
+            if status == "ok":
+                future.set_result(payload)
+                continue
+            metrics.incr("render.failures")
+            if status == "memory":
+                future.set_exception(RenderError(f"Rendering {fmt} exceeded {RENDER_MEMORY_MB} MB"))
+            else:
+                future.set_exception(RenderError(f"Rendering {fmt} failed: {payload}"))
+
+
+_tasks = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def _ensure_workers():
+    with _workers_lock:
+        if not _workers:
+            _workers.extend(_Worker(_tasks) for _ in range(RENDER_WORKERS))
+
+
+def shutdown():
+    with _workers_lock:
+        workers = list(_workers)
+        _workers.clear()
+    for worker in workers:
+        _tasks.put(None)
+        worker.terminate()
+
+
+atexit.register(shutdown)
+
+
+def _observe(fmt, future):
+    if not future.cancelled() and future.exception() is None:
+        metrics.observe(f"render.{fmt}", future.result()[1])
+
+
+# queue a render for the next free worker; the future resolves to (bytes, seconds),
+# or fails with RenderTimeout when the render itself runs longer than `timeout`
+def submit(fmt, text, title=None, timeout=RENDER_TIMEOUT_SECONDS):
+    if RENDER_WORKERS <= 0:
+        raise RenderError("Render workers are disabled (RENDER_WORKERS=0)")
+    _ensure_workers()
+    future = Future()
+    future.add_done_callback(lambda done: _observe(fmt, done))
+    _tasks.put((future, fmt, text, title, timeout))
+    return future
+
+
+# wait for a submitted render; its worker enforces the timeout
+def result(future):
+    return future.result()
+
+
+# render one format; in the pool when workers are enabled
+def render(fmt, text, title=None, timeout=RENDER_TIMEOUT_SECONDS):
+    if RENDER_WORKERS <= 0:
+        data, seconds = _render(fmt, text, title)
+        metrics.observe(f"render.{fmt}", seconds)
+        return data
+    return result(submit(fmt, text, title, timeout))[0]
+
+
+# render several formats concurrently: ({fmt: bytes}, {fmt: seconds})
+def render_all(text, title=None, formats=("docx", "pdf"), timeout=RENDER_TIMEOUT_SECONDS):
+    if RENDER_WORKERS <= 0:
+        rendered = {fmt: _render(fmt, text, title) for fmt in formats}
+        for fmt, (_, seconds) in rendered.items():
+            metrics.observe(f"render.{fmt}", seconds)
+    else:
+        futures = {fmt: submit(fmt, text, title, timeout) for fmt in formats}
+        rendered = {fmt: result(future) for fmt, future in futures.items()}
+    return (
+        {fmt: data for fmt, (data, _) in rendered.items()},
+        {fmt: round(seconds, 3) for fmt, (_, seconds) in rendered.items()},
+    )
+
+
+if __name__ == "__main__":
+    # python -m app.render_service [text_file]
+    import sys
+
+    text = open(sys.argv[1]).read() if len(sys.argv) > 1 else "I. SAMPLE\n\n" + "Sample paragraph. " * 4000
+    start = time.perf_counter()
+    outputs, times = render_all(text, "Render service check")
+    for fmt, data in outputs.items():
+        print(f"{fmt}: {len(data) / 1024:.0f} KB in {times[fmt]:.2f}s")
+    print(f"wall: {time.perf_counter() - start:.2f}s")
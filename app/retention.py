@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+import time
+
+import app.metrics as metrics
+import app.search as search
+from app.storage import get_storage, StorageError
+
+# number of outputs kept per user; older ones are pruned in the background
+OUTPUTS_RETENTION_LIMIT = int(os.getenv("OUTPUTS_RETENTION_LIMIT", "500"))
+
+# seconds between pruner passes
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+
+_pruner = None
+_pruner_lock = threading.Lock()
+last_run = {}
+
+
+# run one pruning pass over every partition and record its throughput
+def prune_all(keep=OUTPUTS_RETENTION_LIMIT):
+    storage = get_storage()
+    start = time.perf_counter()
+    partitions = deleted = 0
+
+    for user_id in storage.output_partitions():
+        try:
+            deleted += storage.prune_outputs(user_id, keep)
+            search.get_index().prune(user_id, keep)
+            partitions += 1
+        except StorageError as e:
+            print(f"Error pruning outputs for {user_id}: {e}")
+
+    # Bodies of pruned (and deleted) documents leave the blob store too
+    blobs = 0
+    try:
+        blobs = storage.collect_blobs()
+    except StorageError as e:
+        print(f"Error collecting unreferenced blobs: {e}")
+
+    seconds = time.perf_counter() - start
+    metrics.incr("retention.deleted", deleted)
+    metrics.observe("retention.pass", seconds)
+
+    last_run.clear()
+    last_run.update({
+        "finishedAt": time.time(),
+        "partitions": partitions,
+        "deleted": deleted,
+        "blobs_deleted": blobs,
+        "seconds": round(seconds, 3),
+        "items_per_second": round(deleted / seconds, 1) if seconds else 0.0,
+    })
+    return dict(last_run)
+
+
+def _run_forever():
+    while True:
+        try:
+            prune_all()
+        except Exception as e:
+            print(f"Error in retention pruner: {e}")
+        time.sleep(RETENTION_INTERVAL_SECONDS)
+
+
+# start the background pruner once per process
+def start_pruner():
+    global _pruner
+    if RETENTION_INTERVAL_SECONDS <= 0:
+        return
+    with _pruner_lock:
+        if _pruner is None:
+            _pruner = threading.Thread(target=_run_forever, name="outputs-retention", daemon=True)
+            _pruner.start()
+
+
+if __name__ == "__main__":
+    # one-off pass, e.g. from a scheduled job: python -m app.retention [keep]
+    keep = int(sys.argv[1]) if len(sys.argv) > 1 else OUTPUTS_RETENTION_LIMIT
+    print(prune_all(keep))
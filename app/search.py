@@ -0,0 +1,191 @@
+"""Local full-text index over saved outputs (SQLite FTS5).
+
+The index is updated as outputs are saved and can be rebuilt from the
+storage backend:
+
+    python -m app.search rebuild [--user USER_ID]
+    python -m app.search query USER_ID "liquidity risk" credit
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import app.metrics as metrics
+from app.config import STATE_DIR
+
+# index database file
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(STATE_DIR, "search.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs_meta (
+    rowid     INTEGER PRIMARY KEY,
+    user_id   TEXT NOT NULL,
+    id        TEXT NOT NULL,
+    updatedAt TEXT,
+    styleId   TEXT,
+    UNIQUE (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS outputs_meta_user_updated ON outputs_meta (user_id, updatedAt DESC);
+CREATE VIRTUAL TABLE IF NOT EXISTS outputs_fts USING fts5(
+    content, output, tokenize = 'porter unicode61'
+);
+"""
+
+# column weights for ranking: matches in the rewritten output count double
+BM25_WEIGHTS = (1.0, 2.0)
+
+_TOKEN_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+
+# turn user input into an FTS5 query: quoted phrases stay phrases,
+# other words are ANDed; a trailing * keeps prefix search
+def build_match(query):
+    terms = []
+    for phrase, word in _TOKEN_RE.findall(query):
+        if phrase:
+            terms.append('"' + phrase.replace('"', "") + '"')
+        else:
+            prefix = word.endswith("*")
+            word = word.rstrip("*").replace('"', "")
+            if word:
+                terms.append('"' + word + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # add or replace one output document
+    def index_output(self, doc):
+        conn = self._conn()
+        with metrics.timer("search.index"):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT rowid FROM outputs_meta WHERE user_id = ? AND id = ?",
+                    (doc["user_id"], doc["id"]),
+                ).fetchone()
+                if row:
+                    conn.execute("DELETE FROM outputs_fts WHERE rowid = ?", row)
+                    conn.execute("DELETE FROM outputs_meta WHERE rowid = ?", row)
+                cursor = conn.execute(
+                    "INSERT INTO outputs_meta (user_id, id, updatedAt, styleId) VALUES (?, ?, ?, ?)",
+                    (doc["user_id"], doc["id"], doc.get("updatedAt"), doc.get("styleId")),
+                )
+                conn.execute(
+                    "INSERT INTO outputs_fts (rowid, content, output) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, doc.get("content") or "", doc.get("output") or ""),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ranked matches for a user: id, updatedAt, styleId, snippet, score
+    def search(self, user_id, query, limit=20):
+        match = build_match(query)
+        if not match:
+            return []
+        start = time.perf_counter()
+        rows = self._conn().execute(
+            f"""
+            SELECT m.id, m.updatedAt, m.styleId,
+                   snippet(outputs_fts, -1, '**', '**', '…', 16) AS snippet,
+                   bm25(outputs_fts, {BM25_WEIGHTS[0]}, {BM25_WEIGHTS[1]}) AS score
+            FROM outputs_fts
+            JOIN outputs_meta m ON m.rowid = outputs_fts.rowid
+            WHERE outputs_fts MATCH ? AND m.user_id = ?
+            ORDER BY score
+            LIMIT ?
+            """,
+            (match, user_id, limit),
+        ).fetchall()
+        metrics.observe("search.query", time.perf_counter() - start)
+        return [
+            {"id": r[0], "updatedAt": r[1], "styleId": r[2], "snippet": r[3], "score": round(-r[4], 3)}
+            for r in rows
+        ]
+
+    # drop all but the newest `keep` outputs of a user (mirrors retention)
+    def prune(self, user_id, keep):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rowids = conn.execute(
+                "SELECT rowid FROM outputs_meta WHERE user_id = ? ORDER BY updatedAt DESC LIMIT -1 OFFSET ?",
+                (user_id, keep),
+            ).fetchall()
+            conn.executemany("DELETE FROM outputs_fts WHERE rowid = ?", rowids)
+            conn.executemany("DELETE FROM outputs_meta WHERE rowid = ?", rowids)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rowids)
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM outputs_meta").fetchone()[0]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# process-wide search index
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
+
+
+# rebuild the index from the storage backend (all users or one)
+def rebuild(user_id=None, page_size=100):
+    from app.storage import get_storage
+
+    storage = get_storage()
+    index = get_index()
+    users = [user_id] if user_id else storage.output_partitions()
+    count = 0
+    for user in users:
+        continuation = None
+        while True:
+            rows, continuation = storage.list_outputs(user, page_size, continuation)
+            for row in rows:
+                index.index_output(storage.get_output(user, row["id"]))
+                count += 1
+            if not continuation:
+                break
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "rebuild":
+        user = sys.argv[3] if len(sys.argv) >= 4 and sys.argv[2] == "--user" else None
+        start = time.perf_counter()
+        total = rebuild(user)
+        print(f"Indexed {total} outputs in {time.perf_counter() - start:.2f}s")
+    elif len(sys.argv) >= 4 and sys.argv[1] == "query":
+        for hit in get_index().search(sys.argv[2], " ".join(sys.argv[3:])):
+            print(f"{hit['score']:8.3f}  {hit['updatedAt']}  {hit['id']}  {hit['snippet']}")
+    else:
+        print(__doc__)
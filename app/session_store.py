@@ -0,0 +1,446 @@
+"""Session-state memory accounting, budgets and spill to disk.
+
+Large text values (extracted uploads, the selected style's example corpus,
+the last output) are written with put() and read with get(). When a
+session goes over SESSION_BUDGET_MB, its largest texts, and when all
+sessions of the process go over SESSION_GLOBAL_BUDGET_MB, the largest texts
+of the largest sessions (not only the one running) are replaced by a
+Spilled handle pointing to a file in the owning session's spill directory;
+get() reads them back transparently. A spilled value is deleted when its
+key is replaced, and a session's directory (with any session_file()) when
+the session has been idle for SESSION_IDLE_SECONDS (its texts are
+confidential uploads, and are not kept any longer than the session). account() records the size of
+every key of every session so the admin view can show the largest
+sessions.
+"""
+
+import gzip
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import app.metrics as metrics
+from app.config import STATE_DIR
+
+# memory budget of one session's state
+SESSION_BUDGET_MB = float(os.getenv("SESSION_BUDGET_MB", "32"))
+# memory budget of all sessions in this process
+SESSION_GLOBAL_BUDGET_MB = float(os.getenv("SESSION_GLOBAL_BUDGET_MB", "512"))
+# text shorter than this (KB) is never spilled
+SESSION_SPILL_MIN_KB = int(os.getenv("SESSION_SPILL_MIN_KB", "64"))
+# directory of spilled values, one subdirectory per session
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", os.path.join(STATE_DIR, "session_spill"))
+# sessions not seen for this long drop out of the accounting, and their spills are deleted
+SESSION_IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", "3600"))
+
+# session_state keys used by this module
+ID_KEY = "_session_store_id"
+USER_KEY = "_session_store_user"
+SPILLABLE_KEY = "_session_store_keys"
+
+
+class Spilled:
+    """Handle of a session value that lives in the spill store."""
+
+    __slots__ = ("ref", "chars")
+
+    def __init__(self, ref, chars):
+        self.ref = ref
+        self.chars = chars
+
+    def __repr__(self):
+        return f"Spilled({self.ref[:19]}…, {self.chars} chars)"
+
+
+class SpillStore:
+    """Gzip-compressed spilled values, one file each under a directory per session.
+
+    Unlike the blob store, nothing is shared between sessions, so a value
+    or a whole session can be deleted without checking other users.
+    """
+
+    def __init__(self, root=SESSION_SPILL_DIR, cache_size=4):
+        self.root = root
+        # Few readbacks are hot at once; don't rebuild the memory we freed
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def _path(self, ref):
+        session_id, name = ref.split("/", 1)
+        return os.path.join(self.root, session_id, name + ".gz")
+
+    # store text for a session and return its reference ("<session>/<name>")
+    def put(self, session_id, text):
+        directory = os.path.join(self.root, session_id)
+        os.makedirs(directory, exist_ok=True)
+        ref = f"{session_id}/{uuid.uuid4().hex}"
+        # Write to a temp file and rename so readers never see partial values
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(gzip.compress(text.encode("utf-8"), compresslevel=1, mtime=0))
+        os.replace(tmp_path, self._path(ref))
+        return ref
+
+    # text for a reference; raises KeyError if it was deleted
+    def get(self, ref):
+        with self._lock:
+            if ref in self._cache:
+                self._cache.move_to_end(ref)
+                return self._cache[ref]
+        try:
+            with open(self._path(ref), "rb") as file:
+                text = gzip.decompress(file.read()).decode("utf-8")
+        except FileNotFoundError:
+            raise KeyError(ref)
+        with self._lock:
+            self._cache[ref] = text
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return text
+
+    def delete(self, ref):
+        with self._lock:
+            self._cache.pop(ref, None)
+        try:
+            os.remove(self._path(ref))
+        except FileNotFoundError:
+            pass
+
+    # mark a session's spills as in use (sweep() keeps them)
+    def touch(self, session_id):
+        try:
+            os.utime(os.path.join(self.root, session_id))
+        except FileNotFoundError:
+            pass
+
+    # path of a new file kept with a session's spills (deleted with them)
+    def session_file(self, session_id, prefix="", suffix=""):
+        directory = os.path.join(self.root, session_id)
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=suffix)
+        os.close(fd)
+        return path
+
+    # delete every spill of a session
+    def drop(self, session_id):
+        with self._lock:
+            for ref in [ref for ref in self._cache if ref.startswith(session_id + "/")]:
+                del self._cache[ref]
+        shutil.rmtree(os.path.join(self.root, session_id), ignore_errors=True)
+
+    # delete the spills of sessions untouched for `max_age` seconds (also those
+    # left behind by processes that stopped); returns the sessions dropped
+    def sweep(self, max_age):
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        dropped = 0
+        cutoff = time.time() - max_age
+        for name in names:
+            try:
+                stale = os.path.getmtime(os.path.join(self.root, name)) < cutoff
+            except FileNotFoundError:
+                continue
+            if stale:
+                self.drop(name)
+                dropped += 1
+        return dropped
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _spill_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SpillStore(SESSION_SPILL_DIR)
+            metrics.incr("session_store.sessions_dropped", _store.sweep(SESSION_IDLE_SECONDS))
+        return _store
+
+
+# approximate memory held by a session_state value, in bytes
+def value_size(value, depth=0):
+    if isinstance(value, Spilled):
+        return sys.getsizeof(value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, io.BytesIO):
+        # Uploaded files
+        return value.getbuffer().nbytes
+    size = sys.getsizeof(value)
+    if depth < 3:
+        if isinstance(value, dict):
+            size += sum(value_size(k, depth + 1) + value_size(v, depth + 1) for k, v in value.items())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            size += sum(value_size(item, depth + 1) for item in value)
+    return size
+
+
+def _state():
+    import streamlit as st
+
+    return st.session_state
+
+
+class _Handle:
+    """Access to a session's state from other sessions' threads.
+
+    st.session_state always resolves to the session of the calling thread,
+    so the global budget keeps this for each session to spill from it.
+    """
+
+    def __init__(self, safe_state):
+        self._state = safe_state
+
+    def keys(self):
+        return self._state.filtered_state.keys()
+
+    def get(self, key, default=None):
+        try:
+            return self._state[key]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key):
+        return self._state[key]
+
+    def __setitem__(self, key, value):
+        self._state[key] = value
+
+    def __contains__(self, key):
+        return key in self._state
+
+
+# the state of the running session in a form other threads can use
+def _shared(state):
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    if state is not st.session_state:
+        return state
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return state if ctx is None else _Handle(ctx.session_state)
+
+
+# delete the spill file of a value that is being replaced
+def _discard(value):
+    if isinstance(value, Spilled):
+        _spill_store().delete(value.ref)
+
+
+# serializes replacing a value with spilling it from another session's thread
+_swap_lock = threading.Lock()
+
+
+# store a (possibly large) text value in session state; only these keys are spilled
+def put(key, value, state=None):
+    state = _state() if state is None else state
+    with _swap_lock:
+        previous = state.get(key)
+        state[key] = value
+    _discard(previous)
+    state.setdefault(SPILLABLE_KEY, set()).add(key)
+    if isinstance(value, str) and len(value) >= SESSION_SPILL_MIN_KB * 1024:
+        # Big values arrive mid-run (often in a fragment): check the budget now
+        account(state=state)
+
+
+# value of a key, read back from disk if it was spilled; a spill deleted with
+# its idle session counts as gone (`default`)
+def get(key, default=None, state=None):
+    state = _state() if state is None else state
+    value = state.get(key, default)
+    if isinstance(value, Spilled):
+        metrics.incr("session_store.readbacks")
+        try:
+            return _spill_store().get(value.ref)
+        except KeyError:
+            metrics.incr("session_store.expired")
+            del state[key]
+            return default
+    return value
+
+
+def spill(key, state=None):
+    state = _state() if state is None else state
+    value = state.get(key)
+    if not isinstance(value, str):
+        return 0
+    handle = Spilled(_spill_store().put(_session_id(state), value), len(value))
+    with _swap_lock:
+        # The owning session may have put() a new value meanwhile
+        unchanged = state.get(key) is value
+        if unchanged:
+            state[key] = handle
+    if not unchanged:
+        _spill_store().delete(handle.ref)
+        return 0
+    freed = value_size(value)
+    metrics.incr("session_store.spills")
+    metrics.incr("session_store.spilled_bytes", freed)
+    return freed
+
+
+# path of a new file for large session data that isn't text (e.g. a built ZIP);
+# deleted when the session ends, like its spills
+def session_file(prefix="", suffix="", state=None):
+    state = _state() if state is None else state
+    return _spill_store().session_file(_session_id(state), prefix, suffix)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _session_id(state):
+    if ID_KEY not in state:
+        state[ID_KEY] = uuid.uuid4().hex
+    return state[ID_KEY]
+
+
+# {key: bytes} of a session's state, plus the total and spilled characters
+def measure(state):
+    sizes, spilled = {}, 0
+    for key in list(state.keys()):
+        value = state[key]
+        sizes[key] = value_size(value)
+        if isinstance(value, Spilled):
+            spilled += value.chars
+    return sizes, spilled
+
+
+def global_bytes():
+    now = time.time()
+    with _sessions_lock:
+        idle = [s for s, e in _sessions.items() if now - e["seen"] > SESSION_IDLE_SECONDS]
+        for session_id in idle:
+            del _sessions[session_id]
+        total = sum(entry["bytes"] for entry in _sessions.values())
+    # An idle session is taken as ended: its spills go with it
+    for session_id in idle:
+        _spill_store().drop(session_id)
+        metrics.incr("session_store.sessions_dropped")
+    return total
+
+
+def _record(state, user_id):
+    sizes, spilled = measure(state)
+    total = sum(sizes.values())
+    # Keeps the session's spills and files from being swept as left behind
+    _spill_store().touch(_session_id(state))
+    with _sessions_lock:
+        _sessions[_session_id(state)] = {
+            "user_id": user_id,
+            "state": _shared(state),
+            "bytes": total,
+            "spilled_chars": spilled,
+            "sizes": sizes,
+            "seen": time.time(),
+        }
+    return total, sizes
+
+
+# re-measure a session another session spilled from; not a sign of activity,
+# so "seen" is left alone
+def _remeasure(session_id, state):
+    sizes, spilled = measure(state)
+    with _sessions_lock:
+        entry = _sessions.get(session_id)
+        if entry is not None:
+            entry.update(bytes=sum(sizes.values()), spilled_chars=spilled, sizes=sizes)
+
+
+# spillable texts of a session, largest first
+def _candidates(state, sizes):
+    min_chars = SESSION_SPILL_MIN_KB * 1024
+    # list() first: the owning session may add keys while another thread looks
+    keys = list(state.get(SPILLABLE_KEY, ()))
+    return sorted(
+        (key for key in keys if isinstance(state.get(key), str) and len(state.get(key)) >= min_chars),
+        key=lambda key: sizes.get(key, 0),
+        reverse=True,
+    )
+
+
+# spill the largest texts of the largest sessions until the process is back
+# under the global budget
+def _relieve():
+    excess = global_bytes() - SESSION_GLOBAL_BUDGET_MB * 1024 * 1024
+    if excess <= 0:
+        return
+    with _sessions_lock:
+        entries = sorted(_sessions.items(), key=lambda item: item[1]["bytes"], reverse=True)
+        sessions = [(session_id, entry["state"], entry["sizes"]) for session_id, entry in entries]
+    for session_id, state, sizes in sessions:
+        freed = 0
+        for key in _candidates(state, sizes):
+            if freed >= excess:
+                break
+            freed += spill(key, state)
+        if freed:
+            metrics.incr("session_store.global_spills")
+            _remeasure(session_id, state)
+            excess -= freed
+        if excess <= 0:
+            break
+
+
+# account this session's state, spill its largest texts while it is over its
+# budget, and spill from the largest sessions while all are over the global
+# one; returns the session's bytes after spilling
+def account(user_id=None, state=None):
+    state = _state() if state is None else state
+    if user_id is not None:
+        state[USER_KEY] = user_id
+    total, sizes = _record(state, state.get(USER_KEY))
+
+    for key in _candidates(state, sizes):
+        if total <= SESSION_BUDGET_MB * 1024 * 1024:
+            break
+        spill(key, state)
+        total, sizes = _record(state, state.get(USER_KEY))
+
+    if global_bytes() > SESSION_GLOBAL_BUDGET_MB * 1024 * 1024:
+        _relieve()
+        total, sizes = _record(state, state.get(USER_KEY))
+    return total
+
+
+# sessions of this process, largest first
+def largest_sessions(limit=20, top_keys=5):
+    global_bytes()
+    with _sessions_lock:
+        entries = sorted(_sessions.items(), key=lambda item: item[1]["bytes"], reverse=True)[:limit]
+        return [
+            {
+                "session": session_id[:8],
+                "user_id": entry["user_id"],
+                "bytes": entry["bytes"],
+                "spilled_chars": entry["spilled_chars"],
+                "idle_seconds": round(time.time() - entry["seen"]),
+                "top_keys": sorted(entry["sizes"].items(), key=lambda kv: kv[1], reverse=True)[:top_keys],
+            }
+            for session_id, entry in entries
+        ]
+
+
+def stats():
+    total = global_bytes()
+    with _sessions_lock:
+        sessions = len(_sessions)
+    return {
+        "sessions": sessions,
+        "bytes": total,
+        "budget_bytes": int(SESSION_GLOBAL_BUDGET_MB * 1024 * 1024),
+        "spills": int(metrics.snapshot("session_store.")["counters"].get("session_store.spills", 0)),
+    }
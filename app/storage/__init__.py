@@ -0,0 +1,56 @@
+import os
+import threading
+
+from app.blobstore import get_blob_store
+from app.storage.caching import CachingStorage
+from app.storage.offload import OffloadingStorage
+from app.storage.base import (
+    Storage,
+    StorageError,
+    NotFoundError,
+    ConflictError,
+    OUTPUT_PREVIEW_CHARS,
+    SHARED_USER_ID,
+)
+
+# "cosmos" (default) or "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cosmos").lower()
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+# process-wide storage backend selected by STORAGE_BACKEND
+def get_storage():
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND == "sqlite":
+                from app.storage.sqlite import SQLiteStorage
+
+                _storage = SQLiteStorage()
+            elif STORAGE_BACKEND == "cosmos":
+                from app.storage.cosmos import CosmosStorage
+
+                _storage = CosmosStorage()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+            # Large bodies go to the blob store when one is configured; reads
+            # always rehydrate so records written with BLOB_STORE stay readable
+            _storage = OffloadingStorage(_storage, get_blob_store())
+            # Style lists (read on every page) come from the shared cache
+            _storage = CachingStorage(_storage)
+        return _storage
+
+
+__all__ = [
+    "Storage",
+    "StorageError",
+    "NotFoundError",
+    "ConflictError",
+    "OUTPUT_PREVIEW_CHARS",
+    "SHARED_USER_ID",
+    "STORAGE_BACKEND",
+    "get_storage",
+]
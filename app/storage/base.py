@@ -0,0 +1,109 @@
+# number of characters of the output shown in the history list
+OUTPUT_PREVIEW_CHARS = 200
+
+# user id whose styles are shared with everyone
+SHARED_USER_ID = "allbsp"
+
+# fields added by Cosmos that are not part of our documents
+SYSTEM_FIELDS = ("_rid", "_self", "_etag", "_attachments", "_ts", "_lsn")
+
+
+class StorageError(Exception):
+    """Any failure of the storage backend."""
+
+
+class NotFoundError(StorageError):
+    """The requested document does not exist."""
+
+
+class ConflictError(StorageError):
+    """A document with the same id (or unique style name) already exists."""
+
+
+def strip_system_fields(doc):
+    return {k: v for k, v in doc.items() if k not in SYSTEM_FIELDS}
+
+
+# lightweight list row for an output document (stored summary fields win)
+def output_summary(doc):
+    return {
+        "id": doc.get("id"),
+        "updatedAt": doc.get("updatedAt"),
+        "styleId": doc.get("styleId"),
+        "contentLength": doc.get("contentLength", len(doc.get("content") or "")),
+        "outputLength": doc.get("outputLength", len(doc.get("output") or "")),
+        "preview": doc.get("preview", (doc.get("output") or "")[:OUTPUT_PREVIEW_CHARS]),
+    }
+
+
+class Storage:
+    """Storage interface for the styles and outputs documents.
+
+    Documents keep the Cosmos shape (see data/db_styles.json and
+    data/db_outputs.json) whatever the backend.
+    """
+
+    name = "base"
+
+    # styles of a user plus the shared ones
+    def get_styles(self, user_id):
+        raise NotImplementedError
+
+    # whether the user already has a style with this name
+    def style_exists(self, user_id, name):
+        raise NotImplementedError
+
+    # create a style; raises ConflictError if the name is taken
+    def save_style(self, doc):
+        raise NotImplementedError
+
+    # create or replace a style (imports)
+    def upsert_style(self, doc):
+        raise NotImplementedError
+
+    # create or replace several styles (bulk imports); returns one error or None per document
+    def upsert_styles(self, docs):
+        errors = []
+        for doc in docs:
+            try:
+                self.upsert_style(doc)
+                errors.append(None)
+            except StorageError as e:
+                errors.append(e)
+        return errors
+
+    def delete_style(self, style_id):
+        raise NotImplementedError
+
+    # create an output
+    def save_output(self, doc):
+        raise NotImplementedError
+
+    # create or replace an output (imports)
+    def upsert_output(self, doc):
+        raise NotImplementedError
+
+    # one page of output summaries, newest first: (rows, continuation)
+    def list_outputs(self, user_id, page_size=25, continuation=None):
+        raise NotImplementedError
+
+    # full output document
+    def get_output(self, user_id, output_id):
+        raise NotImplementedError
+
+    # user ids that have outputs
+    def output_partitions(self):
+        raise NotImplementedError
+
+    # delete all but the newest `keep` outputs of a user; returns the number deleted
+    def prune_outputs(self, user_id, keep):
+        raise NotImplementedError
+
+    # "<field>Ref" blob references held by the stored styles and outputs
+    def body_refs(self, style_fields, output_fields):
+        raise NotImplementedError
+
+    # delete blob bodies no document refers to; returns the number deleted
+    def collect_blobs(self):
+        # Nothing is offloaded without a blob store
+        return 0
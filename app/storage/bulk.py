@@ -0,0 +1,202 @@
+"""Bulk import/export of styles in the data/db_styles.json shape.
+
+Usage:
+    python -m app.storage.bulk import data/db_styles.json [--user-id allbsp] [--on-conflict skip]
+    python -m app.storage.bulk export styles.json [--user-id allbsp]
+
+Styles are written in chunks with several chunks in flight. A style whose
+name is already taken by another style of the same user (the unique /name
+key) is skipped, replaced or renamed according to --on-conflict.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import app.metrics as metrics
+from app.core import new_id
+from app.storage import get_storage, SHARED_USER_ID
+from app.storage.base import strip_system_fields
+
+# styles per write chunk (Cosmos transactional batches take up to 100)
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "100"))
+# chunks written concurrently
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "4"))
+
+CONFLICT_POLICIES = ("skip", "replace", "rename")
+
+
+# first free "<name> (n)" among the taken names
+def _rename(name, taken):
+    n = 2
+    while f"{name} ({n})" in taken:
+        n += 1
+    return f"{name} ({n})"
+
+
+# ValueError naming the first problems when `docs` is not a list of style
+# objects with a name and a style (checked before anything is written)
+def validate_styles(docs):
+    if not isinstance(docs, list):
+        raise ValueError(f"Expected a list of styles, got {type(docs).__name__}")
+    problems = []
+    for i, doc in enumerate(docs, 1):
+        if not isinstance(doc, dict):
+            problems.append(f"style {i} is not an object")
+            continue
+        for field in ("name", "style"):
+            if not isinstance(doc.get(field), str) or not doc[field].strip():
+                problems.append(f"style {i} has no {field}")
+        for field in ("id", "user_id", "example"):
+            if doc.get(field) is not None and not isinstance(doc[field], str):
+                problems.append(f"style {i} has a non-text {field}")
+    if problems:
+        more = f" (and {len(problems) - 5} more)" if len(problems) > 5 else ""
+        raise ValueError("; ".join(problems[:5]) + more)
+
+
+# resolve unique-name conflicts before writing; returns (docs to write, skipped names)
+def _plan(docs, storage, on_conflict):
+    existing = {}
+    planned, skipped = [], []
+    for doc in docs:
+        user_id = doc["user_id"]
+        if user_id not in existing:
+            existing[user_id] = {
+                s["name"]: s["id"] for s in storage.get_styles(user_id) if s.get("user_id") == user_id
+            }
+        names = existing[user_id]
+
+        owner = names.get(doc["name"])
+        if owner is not None and owner != doc["id"]:
+            if on_conflict == "skip":
+                skipped.append(doc["name"])
+                continue
+            if on_conflict == "replace":
+                # Take over the existing document's id so the write replaces it
+                doc = dict(doc, id=owner)
+            else:
+                doc = dict(doc, name=_rename(doc["name"], names))
+        names[doc["name"]] = doc["id"]
+        planned.append(doc)
+    return planned, skipped
+
+
+def import_styles(docs, user_id=SHARED_USER_ID, on_conflict="skip", storage=None,
+                  batch_size=BULK_BATCH_SIZE, workers=BULK_WORKERS, progress=None, force_user_id=False):
+    """Write many styles at once.
+
+    `docs` are style documents (system fields are ignored); documents without
+    a user_id get `user_id`, and with `force_user_id` all of them do (imports
+    on behalf of a user must not write elsewhere). Documents without an id
+    get a new one. Raises ValueError when `docs` are malformed, before any
+    write. `progress(done, total)` is called after each chunk. Returns counts
+    plus timing: written, skipped, failed, errors, seconds and
+    styles_per_second.
+    """
+    if on_conflict not in CONFLICT_POLICIES:
+        raise ValueError(f"on_conflict must be one of {CONFLICT_POLICIES}")
+    validate_styles(docs)
+    storage = storage or get_storage()
+    start = time.perf_counter()
+
+    docs = [
+        dict(
+            strip_system_fields(doc),
+            id=doc.get("id") or new_id(),
+            user_id=user_id if force_user_id else doc.get("user_id") or user_id,
+        )
+        for doc in docs
+    ]
+    planned, skipped = _plan(docs, storage, on_conflict)
+
+    total = len(planned)
+    chunks = [planned[i:i + batch_size] for i in range(0, total, batch_size)]
+    written, errors, done = 0, [], 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(storage.upsert_styles, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [e] * len(chunk)
+            for doc, error in zip(chunk, results):
+                if error is None:
+                    written += 1
+                else:
+                    errors.append(f"{doc['name']}: {error}")
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+
+    seconds = time.perf_counter() - start
+    metrics.incr("bulk.styles_written", written)
+    metrics.observe("bulk.import_styles", seconds)
+    return {
+        "written": written,
+        "skipped": len(skipped),
+        "failed": len(errors),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "styles_per_second": round(written / seconds, 1) if seconds else None,
+    }
+
+
+def import_styles_file(path, **kwargs):
+    with open(path, "r") as file:
+        return import_styles(json.load(file), **kwargs)
+
+
+# styles owned by a user, without system fields or user_id, sorted by name;
+# pass `styles` when they are already loaded
+def export_styles(user_id=SHARED_USER_ID, storage=None, styles=None):
+    if styles is None:
+        styles = (storage or get_storage()).get_styles(user_id)
+    docs = [
+        {k: v for k, v in strip_system_fields(doc).items() if k != "user_id"}
+        for doc in styles
+        if doc.get("user_id") == user_id
+    ]
+    return sorted(docs, key=lambda doc: doc.get("name", ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--user-id", default=SHARED_USER_ID)
+    parser.add_argument("--on-conflict", choices=CONFLICT_POLICIES, default="skip")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS)
+    args = parser.parse_args()
+
+    if args.action == "import":
+        try:
+            result = import_styles_file(
+                args.path,
+                user_id=args.user_id,
+                on_conflict=args.on_conflict,
+                workers=args.workers,
+                progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True),
+            )
+        except ValueError as e:
+            sys.exit(f"Invalid styles file {args.path}: {e}")
+        print()
+        for error in result["errors"]:
+            print(f"Failed: {error}")
+        print(
+            f"Wrote {result['written']} styles, skipped {result['skipped']}, failed {result['failed']} "
+            f"in {result['seconds']:.2f}s ({result['styles_per_second'] or 0}/s)"
+        )
+    else:
+        docs = export_styles(args.user_id)
+        with open(args.path, "w") as file:
+            json.dump(docs, file, indent=2, ensure_ascii=False)
+        print(f"Exported {len(docs)} styles to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+
+import app.cache as cache
+from app.storage.base import Storage, SHARED_USER_ID
+
+# seconds a user's style list is served from the cache
+CACHE_STYLES_SECONDS = int(os.getenv("CACHE_STYLES_SECONDS", "300"))
+
+
+class CachingStorage(Storage):
+    """Wraps a backend so style lists come from the shared cache.
+
+    Every style write drops the cached lists it changes: the writer's own
+    list, or all of them when the style is shared (it is in every list) or
+    only its id is known (deletes). The drop follows the backend call, so
+    backends must have stored styles when their write returns (no
+    write-behind). Other calls go straight through.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.styles = cache.namespace("styles", ttl=CACHE_STYLES_SECONDS, l1_mb=32, mutable=True)
+
+    def _changed(self, user_ids):
+        if SHARED_USER_ID in user_ids or None in user_ids:
+            self.styles.clear()
+        else:
+            for user_id in user_ids:
+                self.styles.delete(user_id)
+
+    def get_styles(self, user_id):
+        styles = self.styles.get_json(user_id)
+        if styles is None:
+            styles = self.backend.get_styles(user_id)
+            self.styles.set_json(user_id, styles)
+        return styles
+
+    def style_exists(self, user_id, name):
+        # Checked right before a write: always ask the backend
+        return self.backend.style_exists(user_id, name)
+
+    def save_style(self, doc):
+        self.backend.save_style(doc)
+        self._changed({doc.get("user_id")})
+
+    def upsert_style(self, doc):
+        self.backend.upsert_style(doc)
+        self._changed({doc.get("user_id")})
+
+    def upsert_styles(self, docs):
+        try:
+            return self.backend.upsert_styles(docs)
+        finally:
+            # Some may have been written even if the batch failed
+            self._changed({doc.get("user_id") for doc in docs})
+
+    def delete_style(self, style_id):
+        self.backend.delete_style(style_id)
+        self._changed({None})
+
+    def save_output(self, doc):
+        self.backend.save_output(doc)
+
+    def upsert_output(self, doc):
+        self.backend.upsert_output(doc)
+
+    def list_outputs(self, user_id, page_size=25, continuation=None):
+        return self.backend.list_outputs(user_id, page_size, continuation)
+
+    def get_output(self, user_id, output_id):
+        return self.backend.get_output(user_id, output_id)
+
+    def output_partitions(self):
+        return self.backend.output_partitions()
+
+    def prune_outputs(self, user_id, keep):
+        return self.backend.prune_outputs(user_id, keep)
+
+    def body_refs(self, style_fields, output_fields):
+        return self.backend.body_refs(style_fields, output_fields)
+
+    def collect_blobs(self):
+        return self.backend.collect_blobs()
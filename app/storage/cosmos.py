@@ -0,0 +1,288 @@
+from contextlib import contextmanager
+
+import app.cosmos_usage as cosmos_usage
+import app.metrics as metrics
+import app.persistence as persistence
+from azure.cosmos import exceptions
+from app.clients import get_container
+from app.storage.base import (
+    Storage,
+    StorageError,
+    NotFoundError,
+    ConflictError,
+    OUTPUT_PREVIEW_CHARS,
+    SHARED_USER_ID,
+)
+
+# Cosmos transactional batches are limited to 100 operations
+BATCH_SIZE = 100
+
+
+# map Cosmos errors onto the storage errors
+@contextmanager
+def _translate():
+    try:
+        yield
+    except exceptions.CosmosResourceNotFoundError as e:
+        raise NotFoundError(str(e)) from e
+    except exceptions.CosmosResourceExistsError as e:
+        raise ConflictError(str(e)) from e
+    except exceptions.CosmosHttpResponseError as e:
+        raise StorageError(str(e)) from e
+
+
+def _pk_paths(container):
+    """Read PK paths from container settings, e.g. ['/tenantId'] or ['/tenantId','/styleKey']"""
+    with cosmos_usage.track("container.read") as hook:
+        props = container.read(response_hook=hook)
+    return props.get("partitionKey", {}).get("paths", [])
+
+
+def _path_to_sql(expr_path: str) -> str:
+    """
+    Convert a PK path like '/tenantId' or '/a/b' to Cosmos SQL field expr:
+    -> c["tenantId"] or c["a"]["b"]
+    """
+    parts = [p for p in expr_path.split("/") if p]  # drop empty segments
+    sql = "c"
+    for p in parts:
+        sql += f'["{p}"]'
+    return sql
+
+
+def _fetch_pk_values_for_id(container, item_id):
+    """Query the document once to get PK value(s) in the right order."""
+    pk_paths = _pk_paths(container)  # e.g. ['/styleKey'] or ['/tenantId','/styleKey']
+    if not pk_paths:
+        raise RuntimeError("Container has no partition key paths configured.")
+
+    # Build SELECT with aliases pk0, pk1, ...
+    pk_selects = [f"{_path_to_sql(p)} AS pk{i}" for i, p in enumerate(pk_paths)]
+    select_clause = ", ".join(["c.id"] + pk_selects)
+
+    query = f"SELECT TOP 1 {select_clause} FROM c WHERE c.id = @id"
+    with cosmos_usage.track("pk_lookup.query") as hook:
+        items = list(container.query_items(
+            query=query,
+            parameters=[{"name": "@id", "value": item_id}],
+            enable_cross_partition_query=True,
+            response_hook=hook,
+        ))
+    if not items:
+        raise exceptions.CosmosResourceNotFoundError(message="Item not found.")
+
+    row = items[0]
+    pk_values = [row[f"pk{i}"] for i in range(len(pk_paths))]
+    # If single-part PK, pass a scalar; if hierarchical, pass list
+    return pk_values[0] if len(pk_values) == 1 else pk_values
+
+
+class CosmosStorage(Storage):
+    """Azure Cosmos DB backend (containers "styles" and "outputs", partitioned by /user_id)."""
+
+    name = "cosmos"
+
+    @property
+    def styles(self):
+        return get_container("styles")
+
+    @property
+    def outputs(self):
+        return get_container("outputs")
+
+    def get_styles(self, user_id):
+        query = """
+        SELECT *
+        FROM c
+        WHERE c.user_id IN (@user_id, @shared_user_id)
+        """
+        parameters = [
+            {"name": "@user_id", "value": user_id},
+            {"name": "@shared_user_id", "value": SHARED_USER_ID},
+        ]
+        with _translate(), cosmos_usage.track("styles.query", user_id) as hook:
+            return list(self.styles.query_items(
+                query=query,
+                parameters=parameters,
+                enable_cross_partition_query=True,
+                response_hook=hook,
+            ))
+
+    def style_exists(self, user_id, name):
+        query = "SELECT VALUE COUNT(1) FROM c WHERE c.name = @style_name AND c.user_id = @user_id"
+        parameters = [
+            {"name": "@style_name", "value": name},
+            {"name": "@user_id", "value": user_id}
+        ]
+        with _translate(), cosmos_usage.track("styles.exists", user_id) as hook:
+            counts = list(self.styles.query_items(
+                query=query,
+                parameters=parameters,
+                partition_key=user_id,
+                response_hook=hook,
+            ))
+        return bool(counts and counts[0])
+
+    def save_style(self, doc):
+        # Written directly, not behind: style writes are rare, a taken name
+        # (409) must reach the caller, and cached style lists are dropped
+        # right after this returns, so the style has to be stored by then
+        with _translate(), cosmos_usage.track("styles.create", doc.get("user_id")) as hook:
+            self.styles.create_item(body=doc, response_hook=hook)
+
+    def upsert_style(self, doc):
+        with _translate(), cosmos_usage.track("styles.upsert", doc.get("user_id")) as hook:
+            self.styles.upsert_item(body=doc, response_hook=hook)
+
+    # transactional batches per partition; a failed batch is retried item by item
+    def upsert_styles(self, docs):
+        errors = [None] * len(docs)
+        by_user = {}
+        for i, doc in enumerate(docs):
+            by_user.setdefault(doc["user_id"], []).append(i)
+
+        for user_id, indexes in by_user.items():
+            for start in range(0, len(indexes), BATCH_SIZE):
+                chunk = indexes[start:start + BATCH_SIZE]
+                try:
+                    with _translate(), cosmos_usage.track("styles.batch_upsert", user_id) as hook:
+                        self.styles.execute_item_batch(
+                            batch_operations=[("upsert", (docs[i],)) for i in chunk],
+                            partition_key=user_id,
+                            response_hook=hook,
+                        )
+                    continue
+                except (exceptions.CosmosBatchOperationError, StorageError):
+                    pass
+                for i in chunk:
+                    try:
+                        self.upsert_style(docs[i])
+                    except StorageError as e:
+                        errors[i] = e
+        return errors
+
+    def delete_style(self, style_id):
+        with _translate():
+            # fetch actual PK value(s) from the stored document
+            pk_value = _fetch_pk_values_for_id(self.styles, style_id)
+
+            # Optional sanity check: ensure ≤ 2048 bytes if scalar
+            if isinstance(pk_value, str) and len(pk_value.encode("utf-8")) > 2048:
+                raise ValueError("Stored partition key exceeds 2048 bytes.")
+
+            # point delete with id + correct PK
+            with cosmos_usage.track("styles.delete") as hook:
+                self.styles.delete_item(item=style_id, partition_key=pk_value, response_hook=hook)
+
+    def save_output(self, doc):
+        # Write-behind; direct when asked for (job workers) or the queue is full
+        if persistence.writes_directly() or not persistence.get_writer().submit("outputs", doc, label="output"):
+            with _translate(), cosmos_usage.track("outputs.create", doc.get("user_id")) as hook:
+                self.outputs.create_item(body=doc, response_hook=hook)
+
+    def upsert_output(self, doc):
+        with _translate(), cosmos_usage.track("outputs.upsert", doc.get("user_id")) as hook:
+            self.outputs.upsert_item(body=doc, response_hook=hook)
+
+    def list_outputs(self, user_id, page_size=25, continuation=None):
+        # Project only what the list needs; full bodies are loaded by get_output
+        query = """
+        SELECT c.id, c.updatedAt, c.styleId,
+               c.contentLength ?? LENGTH(c.content) AS contentLength,
+               c.outputLength ?? LENGTH(c.output) AS outputLength,
+               c.preview ?? LEFT(c.output, @preview_chars) AS preview
+        FROM c
+        WHERE c.user_id = @user_id
+        ORDER BY c.user_id, c.updatedAt DESC
+        """
+        parameters = [
+            {"name": "@user_id", "value": user_id},
+            {"name": "@preview_chars", "value": OUTPUT_PREVIEW_CHARS},
+        ]
+        with _translate(), cosmos_usage.track("outputs.list", user_id) as hook:
+            pages = self.outputs.query_items(
+                query=query,
+                parameters=parameters,
+                partition_key=user_id,
+                max_item_count=page_size,
+                response_hook=hook,
+            ).by_page(continuation)
+            items = list(next(pages, []))
+        return items, pages.continuation_token
+
+    def get_output(self, user_id, output_id):
+        with _translate(), cosmos_usage.track("outputs.read", user_id) as hook:
+            return self.outputs.read_item(item=output_id, partition_key=user_id, response_hook=hook)
+
+    def output_partitions(self):
+        query = "SELECT DISTINCT VALUE c.user_id FROM c"
+        with _translate(), cosmos_usage.track("outputs.partitions") as hook:
+            return list(self.outputs.query_items(
+                query=query,
+                enable_cross_partition_query=True,
+                response_hook=hook,
+            ))
+
+    def body_refs(self, style_fields, output_fields):
+        refs = set()
+        for container, fields in ((self.styles, style_fields), (self.outputs, output_fields)):
+            for field in fields:
+                query = f"SELECT VALUE c.{field}Ref FROM c WHERE IS_DEFINED(c.{field}Ref)"
+                with _translate(), cosmos_usage.track(f"{container.id}.body_refs") as hook:
+                    refs.update(container.query_items(
+                        query=query,
+                        enable_cross_partition_query=True,
+                        response_hook=hook,
+                    ))
+        return refs
+
+    # delete one chunk of ids from a single partition
+    def _delete_batch(self, user_id, ids):
+        try:
+            with cosmos_usage.track("outputs.batch_delete", user_id) as hook:
+                self.outputs.execute_item_batch(
+                    batch_operations=[("delete", (item_id,)) for item_id in ids],
+                    partition_key=user_id,
+                    response_hook=hook,
+                )
+            metrics.incr("retention.batches")
+            return len(ids)
+        except exceptions.CosmosBatchOperationError:
+            # One item already gone fails the whole batch; fall back to point deletes
+            pass
+
+        deleted = 0
+        for item_id in ids:
+            try:
+                with cosmos_usage.track("outputs.delete", user_id) as hook:
+                    self.outputs.delete_item(item=item_id, partition_key=user_id, response_hook=hook)
+                deleted += 1
+            except exceptions.CosmosResourceNotFoundError:
+                pass
+        return deleted
+
+    def prune_outputs(self, user_id, keep):
+        query = """
+        SELECT VALUE c.id
+        FROM c
+        WHERE c.user_id = @user_id
+        ORDER BY c.user_id, c.updatedAt DESC
+        OFFSET @keep LIMIT 1000000
+        """
+        parameters = [
+            {"name": "@user_id", "value": user_id},
+            {"name": "@keep", "value": keep},
+        ]
+        with _translate():
+            with cosmos_usage.track("outputs.prune_query", user_id) as hook:
+                ids = list(self.outputs.query_items(
+                    query=query,
+                    parameters=parameters,
+                    partition_key=user_id,
+                    response_hook=hook,
+                ))
+
+            deleted = 0
+            for i in range(0, len(ids), BATCH_SIZE):
+                deleted += self._delete_batch(user_id, ids[i:i + BATCH_SIZE])
+        return deleted
@@ -0,0 +1,69 @@
+"""Load JSON dumps of the styles/outputs containers into the configured backend.
+
+Usage:
+    python -m app.storage.importer --styles data/db_styles.json --outputs data/db_outputs.json
+
+Documents without a user_id are assigned --styles-user-id (default: the
+shared "allbsp" user) or --outputs-user-id. Existing documents with the
+same id are replaced.
+"""
+
+import argparse
+import json
+import time
+
+import app.storage.bulk as bulk
+from app.storage import get_storage, SHARED_USER_ID
+from app.storage.base import strip_system_fields
+
+# user id the app falls back to when no authentication header is present
+DEFAULT_USER_ID = "12345"
+
+
+def _load(path, user_id):
+    with open(path, "r") as file:
+        docs = json.load(file)
+    for doc in docs:
+        doc = strip_system_fields(doc)
+        doc.setdefault("user_id", user_id)
+        yield doc
+
+
+def import_styles(path, user_id=SHARED_USER_ID, storage=None):
+    # Batched writes; a name clash replaces the existing style like an id match does
+    result = bulk.import_styles_file(path, user_id=user_id, on_conflict="replace", storage=storage)
+    for error in result["errors"]:
+        print(f"Failed: {error}")
+    return result["written"]
+
+
+def import_outputs(path, user_id=DEFAULT_USER_ID, storage=None):
+    storage = storage or get_storage()
+    count = 0
+    for doc in _load(path, user_id):
+        storage.upsert_output(doc)
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--styles", help="JSON dump of the styles container")
+    parser.add_argument("--outputs", help="JSON dump of the outputs container")
+    parser.add_argument("--styles-user-id", default=SHARED_USER_ID)
+    parser.add_argument("--outputs-user-id", default=DEFAULT_USER_ID)
+    args = parser.parse_args()
+
+    storage = get_storage()
+    if args.styles:
+        start = time.perf_counter()
+        count = import_styles(args.styles, args.styles_user_id, storage)
+        print(f"Imported {count} styles into {storage.name} in {time.perf_counter() - start:.2f}s")
+    if args.outputs:
+        start = time.perf_counter()
+        count = import_outputs(args.outputs, args.outputs_user_id, storage)
+        print(f"Imported {count} outputs into {storage.name} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import app.blobstore as blobstore
+from app.storage.base import Storage, StorageError, NotFoundError, output_summary
+
+# large text fields moved to the blob store, per document type
+STYLE_BODY_FIELDS = ("example",)
+OUTPUT_BODY_FIELDS = ("content", "output")
+
+
+class OffloadingStorage(Storage):
+    """Wraps a backend so large bodies live in the blob store.
+
+    Records written to the backend keep only metadata plus "<field>Ref"
+    references; reads put the bodies back, so callers always see full
+    documents. Without a store nothing is offloaded on write.
+    """
+
+    def __init__(self, backend, store=None):
+        self.backend = backend
+        self.store = store
+        self.name = f"{backend.name}+blobs" if store else backend.name
+
+    def _style(self, doc):
+        return blobstore.offload(doc, STYLE_BODY_FIELDS, self.store)
+
+    def _output(self, doc):
+        # Keep list fields on the record since the bodies may not be inline
+        summary = output_summary(doc)
+        doc = dict(doc, **{k: v for k, v in summary.items() if k != "id"})
+        return blobstore.offload(doc, OUTPUT_BODY_FIELDS, self.store)
+
+    # put the bodies back; a body missing from the store is a storage error
+    def _rehydrate(self, doc, fields):
+        try:
+            return blobstore.rehydrate(doc, fields, self.store)
+        except KeyError as e:
+            raise NotFoundError(f"Body {e.args[0]} of document {doc.get('id')} is missing from the blob store") from e
+        except OSError as e:
+            raise StorageError(f"An error occurred while reading the blob store: {e}") from e
+
+    def get_styles(self, user_id):
+        return [self._rehydrate(doc, STYLE_BODY_FIELDS) for doc in self.backend.get_styles(user_id)]
+
+    def style_exists(self, user_id, name):
+        return self.backend.style_exists(user_id, name)
+
+    def save_style(self, doc):
+        self.backend.save_style(self._style(doc))
+
+    def upsert_style(self, doc):
+        self.backend.upsert_style(self._style(doc))
+
+    def upsert_styles(self, docs):
+        return self.backend.upsert_styles([self._style(doc) for doc in docs])
+
+    def delete_style(self, style_id):
+        self.backend.delete_style(style_id)
+
+    def save_output(self, doc):
+        self.backend.save_output(self._output(doc))
+
+    def upsert_output(self, doc):
+        self.backend.upsert_output(self._output(doc))
+
+    def list_outputs(self, user_id, page_size=25, continuation=None):
+        return self.backend.list_outputs(user_id, page_size, continuation)
+
+    def get_output(self, user_id, output_id):
+        return self._rehydrate(self.backend.get_output(user_id, output_id), OUTPUT_BODY_FIELDS)
+
+    def output_partitions(self):
+        return self.backend.output_partitions()
+
+    def prune_outputs(self, user_id, keep):
+        # Blobs are shared by hash: collect_blobs() deletes them once unreferenced
+        return self.backend.prune_outputs(user_id, keep)
+
+    def body_refs(self, style_fields, output_fields):
+        return self.backend.body_refs(style_fields, output_fields)
+
+    # mark and sweep: blobs no stored style or output refers to (past the grace period)
+    def collect_blobs(self):
+        if self.store is None:
+            return 0
+        referenced = self.backend.body_refs(STYLE_BODY_FIELDS, OUTPUT_BODY_FIELDS)
+        try:
+            return self.store.sweep(referenced)
+        except OSError as e:
+            raise StorageError(f"An error occurred while sweeping the blob store: {e}") from e
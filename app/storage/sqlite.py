@@ -0,0 +1,214 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+
+from app.config import STATE_DIR
+from app.storage.base import (
+    Storage,
+    StorageError,
+    NotFoundError,
+    ConflictError,
+    SHARED_USER_ID,
+    output_summary,
+    strip_system_fields,
+)
+
+# database file for STORAGE_BACKEND=sqlite
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(STATE_DIR, "stylewriter.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS styles (
+    user_id   TEXT NOT NULL,
+    id        TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    updatedAt TEXT,
+    doc       TEXT NOT NULL,
+    PRIMARY KEY (user_id, id)
+);
+-- same rule as the Cosmos unique key on /name (unique within a partition)
+CREATE UNIQUE INDEX IF NOT EXISTS styles_user_name ON styles (user_id, name);
+
+CREATE TABLE IF NOT EXISTS outputs (
+    user_id       TEXT NOT NULL,
+    id            TEXT NOT NULL,
+    updatedAt     TEXT NOT NULL,
+    styleId       TEXT,
+    contentLength INTEGER,
+    outputLength  INTEGER,
+    preview       TEXT,
+    doc           TEXT NOT NULL,
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS outputs_user_updated ON outputs (user_id, updatedAt DESC, id DESC);
+"""
+
+
+# keyset pagination token: the last row's (updatedAt, id)
+def _encode_token(row):
+    raw = json.dumps([row["updatedAt"], row["id"]])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_token(token):
+    return json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+
+
+class SQLiteStorage(Storage):
+    """Local SQLite backend with the same document shapes as Cosmos."""
+
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    # one connection per thread (Streamlit runs each session on its own thread)
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, sql, parameters=()):
+        try:
+            return self._conn().execute(sql, parameters)
+        except sqlite3.IntegrityError as e:
+            raise ConflictError(str(e)) from e
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+
+    def get_styles(self, user_id):
+        rows = self._execute(
+            "SELECT doc FROM styles WHERE user_id IN (?, ?)",
+            (user_id, SHARED_USER_ID),
+        )
+        return [json.loads(row["doc"]) for row in rows]
+
+    def style_exists(self, user_id, name):
+        row = self._execute(
+            "SELECT 1 FROM styles WHERE user_id = ? AND name = ?",
+            (user_id, name),
+        ).fetchone()
+        return row is not None
+
+    def _write_style(self, doc, on_conflict=""):
+        doc = strip_system_fields(doc)
+        self._execute(
+            "INSERT INTO styles (user_id, id, name, updatedAt, doc) VALUES (?, ?, ?, ?, ?)" + on_conflict,
+            (doc["user_id"], doc["id"], doc["name"], doc.get("updatedAt"), json.dumps(doc)),
+        )
+
+    def save_style(self, doc):
+        self._write_style(doc)
+
+    # replaces by id only; not INSERT OR REPLACE, which would also resolve a
+    # name clash by deleting the other style instead of raising ConflictError
+    def upsert_style(self, doc):
+        self._write_style(
+            doc,
+            " ON CONFLICT (user_id, id) DO UPDATE SET"
+            " name = excluded.name, updatedAt = excluded.updatedAt, doc = excluded.doc",
+        )
+
+    # one transaction for the whole chunk; a failing document doesn't abort the rest
+    def upsert_styles(self, docs):
+        conn = self._conn()
+        errors = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for doc in docs:
+                try:
+                    self.upsert_style(doc)
+                    errors.append(None)
+                except StorageError as e:
+                    errors.append(e)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return errors
+
+    def delete_style(self, style_id):
+        cursor = self._execute("DELETE FROM styles WHERE id = ?", (style_id,))
+        if cursor.rowcount == 0:
+            raise NotFoundError("Item not found.")
+
+    def _write_output(self, verb, doc):
+        doc = strip_system_fields(doc)
+        summary = output_summary(doc)
+        self._execute(
+            f"{verb} INTO outputs (user_id, id, updatedAt, styleId, contentLength, outputLength, preview, doc)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                doc["user_id"], doc["id"], doc.get("updatedAt") or "", doc.get("styleId"),
+                summary["contentLength"], summary["outputLength"], summary["preview"],
+                json.dumps(doc),
+            ),
+        )
+
+    def save_output(self, doc):
+        self._write_output("INSERT", doc)
+
+    def upsert_output(self, doc):
+        self._write_output("INSERT OR REPLACE", doc)
+
+    def list_outputs(self, user_id, page_size=25, continuation=None):
+        sql = (
+            "SELECT id, updatedAt, styleId, contentLength, outputLength, preview"
+            " FROM outputs WHERE user_id = ?"
+        )
+        parameters = [user_id]
+        if continuation:
+            sql += " AND (updatedAt, id) < (?, ?)"
+            parameters += _decode_token(continuation)
+        sql += " ORDER BY updatedAt DESC, id DESC LIMIT ?"
+        parameters.append(page_size + 1)
+
+        rows = [dict(row) for row in self._execute(sql, parameters)]
+        next_token = _encode_token(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size], next_token
+
+    def get_output(self, user_id, output_id):
+        row = self._execute(
+            "SELECT doc FROM outputs WHERE user_id = ? AND id = ?",
+            (user_id, output_id),
+        ).fetchone()
+        if row is None:
+            raise NotFoundError("Item not found.")
+        return json.loads(row["doc"])
+
+    def output_partitions(self):
+        return [row[0] for row in self._execute("SELECT DISTINCT user_id FROM outputs")]
+
+    def body_refs(self, style_fields, output_fields):
+        refs = set()
+        for table, fields in (("styles", style_fields), ("outputs", output_fields)):
+            for field in fields:
+                path = f"$.{field}Ref"
+                rows = self._execute(
+                    f"SELECT json_extract(doc, ?) FROM {table} WHERE json_extract(doc, ?) IS NOT NULL",
+                    (path, path),
+                )
+                refs.update(row[0] for row in rows)
+        return refs
+
+    def prune_outputs(self, user_id, keep):
+        cursor = self._execute(
+            """
+            DELETE FROM outputs WHERE user_id = ? AND id IN (
+                SELECT id FROM outputs WHERE user_id = ?
+                ORDER BY updatedAt DESC, id DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (user_id, user_id, keep),
+        )
+        return cursor.rowcount
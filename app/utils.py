@@ -1,83 +1,24 @@
-import os
 import json
+import os
+import sqlite3
 import time
-import requests
-import pandas as pd
 import streamlit as st
 
-from datetime import datetime
-from openai import AzureOpenAI
-from azure.cosmos import CosmosClient, exceptions, PartitionKey
-from dotenv import load_dotenv
-import hashlib
+from urllib.parse import urlparse
+import app.core as core
+import app.cosmos_usage as cosmos_usage
+import app.export as export
+import app.jobs as jobs
+import app.persistence as persistence
+import app.search as search
+import app.session_store as session_store
+from app.storage import get_storage, StorageError, NotFoundError
+import app.storage.bulk as bulk
 # from azure.identity import DefaultAzureCredential
 
-load_dotenv()
-# create a config dictionary
-config = {
-    "endpoint": os.getenv("AZURE_OPENAI_ENDPOINT"),
-    "api_key": os.getenv("AZURE_OPENAI_KEY"),
-    "api_version": os.getenv("AZURE_OPENAI_API_VERSION"),
-    "model": os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT"),
-}
-
-# Initialize OpenAI client
-clientAOAI = AzureOpenAI(
-    azure_endpoint=config["endpoint"],
-    api_version=config["api_version"],
-    api_key=config["api_key"],
-)
-
 # Initialize Azure AD credential
 # credential = DefaultAzureCredential()
 
-
-def ensure_containers_exist():
-    try:
-        # Define container configurations
-        containers_config = [
-            {
-                "name": "styles",
-                "partition_key": PartitionKey(path="/user_id"),
-                "unique_keys": [{"paths": ["/name"]}]
-            },
-            {
-                "name": "outputs",
-                "partition_key": PartitionKey(path="/user_id")
-            }
-        ]
-        
-        for config in containers_config:
-            try:
-                # Try to read the container to check if it exists
-                database.get_container_client(config["name"])
-            except exceptions.CosmosResourceNotFoundError:
-                # Container doesn't exist, create it
-                database.create_container(
-                    id=config["name"],
-                    partition_key=config["partition_key"],
-                    unique_keys=config.get("unique_keys", [])
-                )
-    except Exception as e:
-        st.error(f"Error ensuring containers exist: {e}")
-
-# Initialize Cosmos DB client with token credentials
-cosmos_client = CosmosClient(
-    url=os.getenv("AZURE_COSMOS_ENDPOINT"),
-    credential=os.getenv("AZURE_COSMOS_KEY")
-    # credential=credential
-)
-
-# Get database and container references
-database = cosmos_client.get_database_client(os.getenv("AZURE_COSMOS_DATABASE"))
-
-# Ensure containers exist with proper configuration
-ensure_containers_exist()
-
-# Get container references after ensuring they exist
-styles_container = database.get_container_client("styles")
-outputs_container = database.get_container_client("outputs")
-
 # log tracing
 def trace(col2, label, message):
     with col2:
@@ -88,6 +29,8 @@ def trace(col2, label, message):
 
 # get request api
 def get_request(url):
+    import requests
+
     response = requests.get(url)
     return response.json()
 
@@ -103,16 +46,9 @@ def chat(
         full_response = ""
         message_placeholder = st.empty()
 
-        for completion in clientAOAI.chat.completions.create(
-            model=config["model"],
-            messages=messages,
-            stream=True,
-            response_format={"type": format},
-        ):
-
-            if completion.choices and completion.choices[0].delta.content is not None:
-                full_response += completion.choices[0].delta.content
-                message_placeholder.markdown(full_response + "▌")
+        for delta in core.stream_chat(messages, format):
+            full_response += delta
+            message_placeholder.markdown(full_response + "▌")
 
         message_placeholder.markdown(full_response)
         return full_response
@@ -133,31 +69,31 @@ def read_json(file_path):
         return None
 
 
+# current user id from the App Service authentication headers
+def get_user_id():
+    return core.user_from_headers(st.context.headers)[0]
+
+
+# users allowed to see the admin views (comma-separated ids); nobody when empty
+ADMIN_USER_IDS = {u.strip() for u in os.getenv("ADMIN_USER_IDS", "").split(",") if u.strip()}
+
+
+def is_admin():
+    return get_user_id() in ADMIN_USER_IDS
+
+
 # get styles from database
 def get_styles():
     try:
-        # Get current user info from Streamlit context
-        headers = st.context.headers
-        user_id = headers.get('X-MS-CLIENT-PRINCIPAL-ID', '12345')
+        user_id = get_user_id()
         
         if not user_id:
             st.warning("User not authenticated")
             return []
             
-        # Query items for the current user
-        query = """
-        SELECT * 
-        FROM c 
-        WHERE c.user_id IN (@user_id, 'allbsp')
-        """
-        parameters = [{"name": "@user_id", "value": user_id}]
-        items = list(styles_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        return items
-    except exceptions.CosmosHttpResponseError as e:
+        # Styles of the current user plus the shared ones
+        return get_storage().get_styles(user_id)
+    except StorageError as e:
         st.error(f"An error occurred while fetching styles: {e}")
         return []
 
@@ -165,25 +101,13 @@ def get_styles():
 # check if style name exists
 def check_style(style_name):
     try:
-        # Get current user info
-        headers = st.context.headers
-        user_id = headers.get('X-MS-CLIENT-PRINCIPAL-ID', '12345')
+        user_id = get_user_id()
         
         if not user_id:
             return False
             
-        query = "SELECT * FROM c WHERE c.name = @style_name AND c.user_id = @user_id"
-        parameters = [
-            {"name": "@style_name", "value": style_name},
-            {"name": "@user_id", "value": user_id}
-        ]
-        items = list(styles_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        return len(items) > 0
-    except exceptions.CosmosHttpResponseError as e:
+        return get_storage().style_exists(user_id, style_name)
+    except StorageError as e:
         st.error(f"An error occurred while checking style name: {e}")
         return False
 
@@ -192,113 +116,255 @@ def check_style(style_name):
 def save_style(style, combined_text):
     try:
         # Get current user info
-        headers = st.context.headers
-        user_id = headers.get('X-MS-CLIENT-PRINCIPAL-ID', '12345')
-        user_name = headers.get('X-MS-CLIENT-PRINCIPAL-NAME', 'r0bai')
-        
-        now = datetime.now()
-        st.session_state.styleId = str(int(time.time() * 1000))
-        new_style = {
-            "id": st.session_state.styleId,
-            "updatedAt": now.isoformat(),
-            "name": st.session_state.styleName,
-            "style": style,
-            "example": combined_text,
-            "user_id": user_id,
-            "user_name": user_name
-        }
+        user_id, user_name = core.user_from_headers(st.context.headers)
+
+        new_style = core.new_style(user_id, user_name, st.session_state.styleName, style, combined_text)
+        st.session_state.styleId = new_style["id"]
         print("Style:")
         print(style)
-        styles_container.create_item(body=new_style)
-    except exceptions.CosmosHttpResponseError as e:
+        get_storage().save_style(new_style)
+    except StorageError as e:
         st.error(f"An error occurred while saving style: {e}")
 
 
+# delete a style from database
+def delete_style(style_id):
+    get_storage().delete_style(style_id)
+
+
 # save output to database
 def save_output(output, content_all):
     try:
         # Get current user info
-        headers = st.context.headers
-        user_id = headers.get('X-MS-CLIENT-PRINCIPAL-ID', '12345')
-        user_name = headers.get('X-MS-CLIENT-PRINCIPAL-NAME', 'r0bai')
-        
-        now = datetime.now()
-        new_output = {
-            "id": str(int(time.time() * 1000)),
-            "updatedAt": now.isoformat(),
-            "content": content_all,
-            "styleId": st.session_state.styleId,
-            "output": output,
-            "user_id": user_id,
-            "user_name": user_name
-        }
-        outputs_container.create_item(body=new_output)
-    except exceptions.CosmosHttpResponseError as e:
+        user_id, user_name = core.user_from_headers(st.context.headers)
+
+        core.save_output(core.new_output(user_id, user_name, content_all, st.session_state.styleId, output))
+        forget_outputs()
+    except StorageError as e:
         st.error(f"An error occurred while saving output: {e}")
 
 
-# get outputs from database
-def get_outputs():
+# drop the pages cached by the Outputs page, so a new output shows up there
+def forget_outputs():
+    for key in ("outputs_cache", "outputs_tokens", "outputs_page"):
+        st.session_state.pop(key, None)
+
+
+# ranked full-text search over the current user's outputs
+def search_outputs(query, limit=20):
+    try:
+        return search.get_index().search(get_user_id(), query, limit)
+    except Exception as e:
+        st.error(f"An error occurred while searching outputs: {e}")
+        return []
+
+
+# get one page of outputs (lightweight fields only) from database
+def get_outputs(page_size=25, continuation=None):
     try:
-        # --- Basic guards ---
-        if 'outputs_container' not in globals() or outputs_container is None:
-            st.info("no data found")
-            return
-
-        # Get current user info (fall back to anon-ish id if header absent)
-        headers = getattr(st, "context", None).headers if hasattr(st, "context") else {}
-        user_id = (headers or {}).get('X-MS-CLIENT-PRINCIPAL-ID', '12345')
+        user_id = get_user_id()
         if not user_id:
             st.warning("User not authenticated")
-            return
-
-        # Query user-scoped items
-        query = "SELECT * FROM c WHERE c.user_id = @user_id ORDER BY c.updatedAt DESC"
-        parameters = [{"name": "@user_id", "value": user_id}]
-        items = list(outputs_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-
-        # --- Empty DB / no rows case ---
-        if not items:
-            st.info("no data found")
-            return
-
-        # Keep only the latest 500 items; delete the rest
-        latest_items = items[:500]
-        items_to_delete = items[500:]
-        for item in items_to_delete:
-            try:
-                outputs_container.delete_item(item=item['id'], partition_key=item.get('user_id'))
-            except exceptions.CosmosHttpResponseError:
-                # Non-fatal: continue deleting others
-                pass
-
-        # Build DF safely even if some fields are missing
-        # Use .get with defaults to avoid KeyError
-        safe_rows = []
-        for it in latest_items:
-            safe_rows.append({
-                'updatedAt': it.get('updatedAt'),
-                'styleId'  : it.get('styleId'),
-                'content'  : it.get('content'),
-                'output'   : it.get('output')
-            })
-
-        df = pd.DataFrame.from_records(safe_rows)
-
-        # If the resulting DF is empty or all-NaN columns, inform the user
-        if df.empty or df.dropna(how="all").empty:
-            st.info("no data found")
-            return
-
-        st.dataframe(df)
-
-    except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
-        # Container or query error
+            return [], None
+
+        return get_storage().list_outputs(user_id, page_size, continuation)
+    except StorageError as e:
         st.error(f"An error occurred while fetching outputs: {e}")
+        return [], None
+
+
+# get a single output (full content and output bodies) from database
+def get_output(output_id):
+    try:
+        return get_storage().get_output(get_user_id(), output_id)
+    except NotFoundError:
+        st.warning("Output not found or already deleted.")
+        return None
+    except StorageError as e:
+        st.error(f"An error occurred while fetching output: {e}")
+        return None
+
+
+# show failed background writes and wait for pending ones of the current user
+def show_persistence_status():
+    writer = persistence.active_writer()
+    if writer is None:
+        return
+    user_id = get_user_id()
+
+    for message in writer.pop_failures(user_id):
+        st.error(message)
+
+    if writer.pending(user_id):
+        _watch_pending_writes(user_id)
+
+
+@st.fragment(run_every="2s")
+def _watch_pending_writes(user_id):
+    if not persistence.get_writer().pending(user_id):
+        # Rerun the page so failures (if any) are shown
+        st.rerun()
+    st.caption("💾 Saving in the background...")
+
+
+# queue a model job for the current user; its id is kept in session state and
+# in the URL under `key`, so a reloaded tab finds the job again
+def submit_job(key, kind, params):
+    try:
+        user_id, user_name = core.user_from_headers(st.context.headers)
+        job_id = jobs.get_queue().submit(kind, user_id, {**params, "user_name": user_name})
+    except sqlite3.Error as e:
+        st.error(f"An error occurred while queuing the job: {e}")
+        return None
+    st.session_state[key] = job_id
+    st.query_params[key] = job_id
+    return job_id
+
+
+# the current user's job under `key` (see submit_job), or None
+def current_job(key):
+    job_id = st.session_state.get(key) or st.query_params.get(key)
+    if not job_id:
+        return None
+    try:
+        job = jobs.get_queue().get(job_id)
+    except sqlite3.Error as e:
+        st.error(f"An error occurred while reading the job: {e}")
+        return None
+    if job is None or job["user_id"] != get_user_id():
+        clear_job(key)
+        return None
+    st.session_state[key] = job_id
+    return job
+
+
+def clear_job(key):
+    st.session_state.pop(key, None)
+    if key in st.query_params:
+        del st.query_params[key]
+
+
+# status and partial output of a queued or running job; reruns the page when it ends
+@st.fragment(run_every="1s")
+def watch_job(job_id, label):
+    queue = jobs.get_queue()
+    job = queue.get(job_id)
+    if job is None or job["status"] not in jobs.ACTIVE:
+        st.rerun()
+
+    with st.container(border=True):
+        if job["status"] == jobs.QUEUED:
+            ahead = queue.position(job_id)
+            st.caption(f"⏳ {label}: queued" + (f", {ahead} job(s) ahead" if ahead else ""))
+        else:
+            st.caption(f"⚙️ {label}... {time.time() - job['started']:.0f}s")
+            if job["partial"]:
+                st.markdown(job["partial"] + "▌")
+        if st.button("Cancel", key=f"cancel_{job_id}"):
+            queue.cancel(job_id)
+            st.rerun()
+
+
+# import styles of the current user from a db_styles.json-shaped list; every
+# style is written as the user's own, whatever user_id the file names
+def import_styles(docs, on_conflict="skip", progress=None):
+    try:
+        return bulk.import_styles(
+            docs, user_id=get_user_id(), on_conflict=on_conflict, progress=progress, force_user_id=True
+        )
+    except ValueError as e:
+        st.error(f"The file is not a valid styles list: {e}")
+        return None
+    except StorageError as e:
+        st.error(f"An error occurred while importing styles: {e}")
+        return None
+
+
+# styles of the current user as JSON in the db_styles.json shape
+def export_styles(styles=None):
+    try:
+        return json.dumps(bulk.export_styles(get_user_id(), styles=styles), indent=2, ensure_ascii=False)
+    except StorageError as e:
+        st.error(f"An error occurred while exporting styles: {e}")
+        return None
+
+
+# remove the session's built bundle, if any
+def discard_output_bundle():
+    bundle = st.session_state.pop("outputs_bundle", None)
+    if bundle and os.path.exists(bundle["path"]):
+        os.remove(bundle["path"])
+
+
+# render the current user's outputs into a ZIP file kept with the session
+# (deleted with it, or when replaced or discarded); returns the bundle summary
+# with its path
+def build_output_bundle(output_ids, formats=("docx", "pdf"), progress=None):
+    discard_output_bundle()
+
+    docs = [doc for doc in (get_output(output_id) for output_id in output_ids) if doc]
+    if not docs:
+        return None
+    path = session_store.session_file(prefix="outputs-", suffix=".zip")
+    try:
+        with open(path, "wb") as file:
+            summary = export.write_bundle(docs, file, formats, progress=progress)
     except Exception as e:
-        # Catch-all so the UI doesn't explode
-        st.error(f"Unexpected error: {e}")
+        os.remove(path)
+        st.error(f"An error occurred while building the bundle: {e}")
+        return None
+    summary.update(path=path, ids=list(output_ids), formats=list(formats))
+    st.session_state.outputs_bundle = summary
+    return summary
+
+
+# the session's bundle if it was built for these outputs and formats; any other
+# is removed (also when its file went with an idle session)
+def current_output_bundle(output_ids, formats):
+    bundle = st.session_state.get("outputs_bundle")
+    if (bundle and bundle["ids"] == list(output_ids) and bundle["formats"] == list(formats)
+            and os.path.exists(bundle["path"])):
+        return bundle
+    discard_output_bundle()
+    return None
+
+
+# zero-argument callable reading a built bundle, for st.download_button
+def bundle_reader(path):
+    def read():
+        with open(path, "rb") as file:
+            return file.read()
+
+    return read
+
+
+# start Cosmos usage accounting for this script run, keeping the previous run's summary
+def start_cosmos_run():
+    previous = st.session_state.get("cosmos_run")
+    if previous is not None:
+        st.session_state.cosmos_last_run = cosmos_usage.finish_run(previous)
+    try:
+        page = urlparse(st.context.url or "").path.strip("/") or "home"
+    except Exception:
+        page = "home"
+    st.session_state.cosmos_run = cosmos_usage.begin_run(get_user_id(), page)
+
+
+# request units and latency of the last page render (COSMOS_DEBUG_PANEL=1 or ?debug=1)
+def show_cosmos_usage():
+    if not (cosmos_usage.COSMOS_DEBUG_PANEL or st.query_params.get("debug") == "1"):
+        return
+    last_run = st.session_state.get("cosmos_last_run")
+    with st.sidebar.expander("Cosmos usage"):
+        if last_run:
+            st.metric("Last render", f"{last_run['ru']:.2f} RU",
+                      f"{last_run['calls']} calls, {last_run['seconds'] * 1000:.0f} ms", delta_color="off")
+            st.dataframe(
+                [{"operation": name, **op} for name, op in last_run["ops"].items()],
+                hide_index=True,
+            )
+        else:
+            st.caption("No Cosmos calls in the last render.")
+        totals = cosmos_usage.per_user().get(get_user_id())
+        if totals:
+            st.caption(f"Your total: {totals['ru']:.2f} RU over {totals['calls']} calls")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""HTTP API throughput benchmark: requests/s and latency per endpoint at rising concurrency.
+
+Starts app.api in this process (or uses --url) and runs each scenario
+with 1..N concurrent clients for --seconds each: listing outputs, reading
+one output, exporting it as DOCX (served from the export cache after the
+first render) and a streamed rewrite. With --echo-model the model is
+replaced by a stream that echoes the content back at --token-ms per
+token, so the rewrite numbers show what the server sustains while many
+long streams are open, without calling (or paying for) Azure OpenAI.
+Needs the same environment (.env) as the app itself, and at least one
+style for --user-id (the in-process server gets a temporary token for
+it; with --url, pass a token of the user with --token or API_TOKEN).
+
+Usage: python benchmarks/bench_api.py [--concurrency 1 8 32 64] [--seconds 5]
+           [--scenarios outputs output export rewrite] [--echo-model] [--token-ms 20] [--url URL --token TOKEN]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app.core as core  # noqa: E402
+from app.api_client import ApiClient  # noqa: E402
+from bench_exports import sample_output  # noqa: E402
+
+
+# model stand-in: the user message back, one word per token
+def _echo_model(token_ms):
+    def stream_chat(messages, format="text"):
+        for word in messages[-1]["content"].split():
+            time.sleep(token_ms / 1000)
+            yield word + " "
+
+    return stream_chat
+
+
+def _setup(client):
+    styles = client.styles()
+    if not styles:
+        sys.exit("No styles for this user; import some with python -m app.storage.bulk import ...")
+    # One saved output to read and export (not timed)
+    result = {}
+    for _ in client.rewrite(sample_output(5000, seed=1)[:2000], style_id=styles[0]["id"], result=result):
+        pass
+    return styles[0]["id"], result["output_id"]
+
+
+def _scenarios(client, style_id, output_id, content):
+    first_token = []
+
+    def rewrite():
+        start = time.perf_counter()
+        for i, _ in enumerate(client.rewrite(content, style_id=style_id, save=False)):
+            if i == 0:
+                first_token.append(time.perf_counter() - start)
+
+    return {
+        "outputs": lambda: client.outputs(page_size=25),
+        "output": lambda: client.output(output_id),
+        "export": lambda: client.export_output(output_id, "docx"),
+        "rewrite": rewrite,
+    }, first_token
+
+
+# (requests, errors, latencies) of `call` run by `clients` threads for `seconds`
+def run(call, clients, seconds):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def loop():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                call()
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=loop) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), errors, latencies
+
+
+def _ms(samples, q):
+    if not samples:
+        return f"{'-':>9}"
+    return f"{statistics.quantiles(samples, n=100)[q - 1] * 1000 if len(samples) > 1 else samples[0] * 1000:7.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--scenarios", nargs="+", choices=["outputs", "output", "export", "rewrite"],
+                        default=["outputs", "output", "export", "rewrite"])
+    parser.add_argument("--echo-model", action="store_true", help="replace the model by an echo stream")
+    parser.add_argument("--token-ms", type=float, default=20, help="echo model delay per token")
+    parser.add_argument("--rewrite-words", type=int, default=100, help="words of rewrite content")
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process one")
+    parser.add_argument("--token", help="API token of the --url server (default: API_TOKEN)")
+    parser.add_argument("--user-id", default=core.DEFAULT_USER_ID, help="user of the in-process server")
+    args = parser.parse_args()
+
+    if args.echo_model:
+        if args.url:
+            sys.exit("--echo-model only applies to the in-process server")
+        core.stream_chat = _echo_model(args.token_ms)
+    client = ApiClient(args.url, token=args.token) if args.url else ApiClient.local(args.user_id)
+
+    with client:
+        style_id, output_id = _setup(client)
+        content = " ".join(sample_output(args.rewrite_words * 12, seed=2).split()[:args.rewrite_words])
+        calls, first_token = _scenarios(client, style_id, output_id, content)
+
+        print(f"{args.seconds:g}s per run" + (f", echo model at {args.token_ms:g} ms/token" if args.echo_model else ""))
+        print(f"  {'scenario':<9} {'clients':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'errors':>6}")
+        for name in args.scenarios:
+            for clients in args.concurrency:
+                first_token.clear()
+                done, errors, latencies = run(calls[name], clients, args.seconds)
+                line = (f"  {name:<9} {clients:>7} {done / args.seconds:8.1f} "
+                        f"{_ms(latencies, 50)} {_ms(latencies, 95)} {len(errors):>6}")
+                if name == "rewrite":
+                    line += f"   first token p50 {_ms(first_token, 50)}"
+                print(line)
+                if errors:
+                    print(f"    first error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
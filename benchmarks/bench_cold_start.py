@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Cold-start benchmark: import time of the app modules and first render of each page.
+
+Every sample runs in a fresh interpreter so nothing is warm. First-render
+timings execute the page script with Streamlit's AppTest harness and need
+the same environment (.env) as the app itself.
+
+Usage: python benchmarks/bench_cold_start.py [--repeat 5] [--imports-only]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TARGETS = ["app.utils", "app.pages", "app.prompts", "app.extract"]
+PAGE_TARGETS = ["app.py", "pages/reader.py", "pages/outputs.py", "pages/settings.py"]
+
+# heavy libraries that should only load when a page actually needs them
+HEAVY_MODULES = ["PyPDF2", "docx", "pptx", "reportlab", "openai", "azure.cosmos.aio"]
+
+IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, ",".join(loaded), sep="|")
+"""
+
+RENDER_SNIPPET = """
+import time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file({page!r}, default_timeout=120).run()
+elapsed = time.perf_counter() - start
+print(elapsed, len(at.exception), sep="|")
+"""
+
+
+def _run(snippet):
+    result = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip().splitlines()[-1].split("|", 1)
+
+
+def _summary(samples):
+    return f"median {statistics.median(samples) * 1000:8.1f} ms   min {min(samples) * 1000:8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--imports-only", action="store_true")
+    args = parser.parse_args()
+
+    print("Import time (fresh interpreter)")
+    for module in IMPORT_TARGETS:
+        samples, loaded = [], ""
+        for _ in range(args.repeat):
+            elapsed, loaded = _run(IMPORT_SNIPPET.format(module=module, heavy=HEAVY_MODULES))
+            samples.append(float(elapsed))
+        print(f"  {module:<20} {_summary(samples)}   heavy: {loaded or '-'}")
+
+    if args.imports_only:
+        return
+
+    print("First render (fresh interpreter, AppTest)")
+    for page in PAGE_TARGETS:
+        samples, errors = [], "0"
+        for _ in range(args.repeat):
+            elapsed, errors = _run(RENDER_SNIPPET.format(page=page))
+            samples.append(float(elapsed))
+        print(f"  {page:<20} {_summary(samples)}   exceptions: {errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""DOCX table benchmark: bulk XML emitter vs python-docx cell by cell.
+
+Usage: python benchmarks/bench_docx_tables.py [--repeat 5] [--rows 10 100 500 2000]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app.docmodel as docmodel  # noqa: E402
+import app.docx_table as docx_table  # noqa: E402
+
+AREAS = ("Credit risk", "Liquidity risk", "Market risk", "Operational risk", "IT risk", "Compliance")
+RATINGS = ("STRONG", "ACCEPTABLE", "MODERATE", "WEAK", "Needs improvement")
+TRENDS = ("Stable", "Improving", "Deteriorating")
+
+
+def _rows(count):
+    rows = [["Risk Area", "Inherent Risk", "Quality of Risk Management", "Trend"]]
+    for i in range(count):
+        rows.append([
+            f"{AREAS[i % len(AREAS)]} & controls #{i}",
+            RATINGS[i % len(RATINGS)],
+            RATINGS[(i + 2) % len(RATINGS)],
+            TRENDS[i % len(TRENDS)],
+        ])
+    return rows
+
+
+# The exporter's table code before the bulk emitter, kept for comparison
+def cell_by_cell(doc, table_data):
+    from docx.enum.table import WD_ALIGN_VERTICAL, WD_TABLE_ALIGNMENT
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    from docx.shared import Inches, Pt
+
+    table = doc.add_table(rows=len(table_data), cols=len(table_data[0]))
+    table.style = docx_table.TABLE_STYLE
+    table.alignment = WD_TABLE_ALIGNMENT.LEFT
+    for col_idx, width in enumerate(docx_table.column_widths(len(table_data[0]))):
+        table.columns[col_idx].width = Inches(width)
+
+    for i, row_data in enumerate(table_data):
+        row_cells = table.rows[i].cells
+        for j, cell_text in enumerate(row_data):
+            cell = row_cells[j]
+            cell.text = ''
+            p = cell.paragraphs[0]
+            run = p.add_run(cell_text)
+            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+            run.font.size = Pt(10)
+            run.font.name = 'Calibri'
+            if i == 0:
+                p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                run.font.bold = True
+                shading = OxmlElement('w:shd')
+                shading.set(qn('w:fill'), docx_table.HEADER_FILL)
+                cell._element.get_or_add_tcPr().append(shading)
+            else:
+                p.alignment = WD_ALIGN_PARAGRAPH.LEFT
+                if docmodel.is_rating(cell_text):
+                    run.font.bold = True
+    return table
+
+
+# cell text and bold flag of every cell, to check both paths agree
+def _snapshot(table):
+    return [
+        [(cell.text, any(run.bold for run in cell.paragraphs[0].runs)) for cell in row.cells]
+        for row in table.rows
+    ]
+
+
+# median time of fn(doc) on a fresh document (document creation is not timed)
+def _median_ms(fn, repeat):
+    from docx import Document
+
+    samples = []
+    for _ in range(repeat):
+        doc = Document()
+        start = time.perf_counter()
+        fn(doc)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 500, 2000])
+    args = parser.parse_args()
+
+    from docx import Document
+
+    print(f"{'rows':>6} {'cell by cell':>14} {'bulk':>10} {'speedup':>8}")
+    for count in args.rows:
+        rows = _rows(count)
+        old_table = cell_by_cell(Document(), rows)
+        new_table = docx_table.add_assessment_table(Document(), rows)
+        if _snapshot(old_table) != _snapshot(new_table):
+            sys.exit(f"{count} rows: bulk table differs from the cell-by-cell table")
+
+        old = _median_ms(lambda doc: cell_by_cell(doc, rows), args.repeat)
+        new = _median_ms(lambda doc: docx_table.add_assessment_table(doc, rows), args.repeat)
+        print(f"{count:>6} {old:>11.1f} ms {new:>7.1f} ms {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""DOCX export benchmark: front matter cloned from the template vs rebuilt per export.
+
+Usage: python benchmarks/bench_docx_template.py [--repeat 20] [--paragraphs 50]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # the logo is looked up relative to the repo
+
+import app.export as export  # noqa: E402
+
+PARAGRAPH = (
+    "The Bank's liquidity position remained adequate, supported by a stable deposit base "
+    "and sufficient high-quality liquid assets. Management should strengthen the monitoring "
+    "of concentration limits and document the escalation process for breaches."
+)
+
+
+def _text(paragraphs):
+    blocks = ["I. ASSESSMENT OF RISK MANAGEMENT"]
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            blocks.append(f"{i // 10 + 1}. Finding")
+        blocks.append(PARAGRAPH)
+    blocks.append("Area  Rating  Trend\nCredit  STRONG  Stable\nLiquidity  MODERATE  Improving")
+    return "\n\n".join(blocks)
+
+
+def _median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=50)
+    args = parser.parse_args()
+
+    from docx import Document
+
+    text = _text(args.paragraphs)
+    template = export.docx_template()
+
+    def uncached():
+        # What every export paid before: build the front matter from scratch
+        export._docx_template = None
+        export.make_docx_bytes(text, "Benchmark")
+
+    build = _median_ms(export._build_docx_front_matter, args.repeat)
+    clone = _median_ms(lambda: Document(BytesIO(template)), args.repeat)
+    rebuilt = _median_ms(uncached, args.repeat)
+    export._docx_template = template
+    cloned = _median_ms(lambda: export.make_docx_bytes(text, "Benchmark"), args.repeat)
+
+    print(f"Content: {len(text):,} characters, template {len(template) / 1024:.0f} KB")
+    print(f"  build front matter   median {build:8.2f} ms")
+    print(f"  clone template       median {clone:8.2f} ms")
+    print(f"  export (rebuilt)     median {rebuilt:8.2f} ms")
+    print(f"  export (cloned)      median {cloned:8.2f} ms   saved {rebuilt - cloned:.2f} ms "
+          f"({(rebuilt - cloned) / rebuilt:.0%}) per export")
+
+
+if __name__ == "__main__":
+    main()
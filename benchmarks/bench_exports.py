@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Export benchmark: make_docx_bytes / make_pdf_bytes on realistic outputs of 1k-75k characters.
+
+Each size is a generated rewritten output with Roman-numeral sections,
+assessment labels, numbered findings, lists and tab- or space-separated
+rating tables. Both exporters are timed (median of --repeat runs, parse
+cache cleared each time), then run once more under tracemalloc for peak
+Python memory. Results go to a JSON file; pass an earlier file with
+--compare to see the change per size and format.
+
+Usage: python benchmarks/bench_exports.py [--sizes 1000 5000 20000 50000 75000]
+           [--repeat 3] [--formats docx pdf] [--out FILE] [--compare FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # the logo is looked up relative to the repo
+
+import app.docmodel as docmodel  # noqa: E402
+import app.export as export  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+ROMAN = ("I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X")
+AREAS = ("Credit risk", "Liquidity risk", "Market risk", "Operational risk", "IT risk",
+         "Compliance risk", "Reputational risk", "Strategic risk")
+RATINGS = ("STRONG", "ACCEPTABLE", "MODERATE", "WEAK", "LOW", "HIGH")
+TRENDS = ("Stable", "Improving", "Deteriorating")
+SENTENCES = (
+    "The Bank's liquidity position remained adequate, supported by a stable deposit base.",
+    "Management should strengthen the monitoring of concentration limits.",
+    "The board approved the revised risk appetite statement during the review period.",
+    "Internal audit coverage of IT general controls was limited to the core banking system.",
+    "Loan loss provisions were found to be consistent with the expected credit loss model.",
+    "Escalation of limit breaches to senior management was not consistently documented.",
+    "Stress testing scenarios did not reflect the Bank's current funding structure.",
+    "The compliance function lacks sufficient staff to cover the branch network.",
+)
+
+
+def _paragraph(rng, sentences=4):
+    return " ".join(rng.choice(SENTENCES) for _ in range(sentences))
+
+
+def _table(rng, rows):
+    # Alternate tab- and space-separated tables, as the model writes both
+    sep = "\t" if rng.random() < 0.5 else "   "
+    lines = [sep.join(("Risk Area", "Inherent Risk", "Risk Management", "Trend"))]
+    for _ in range(rows):
+        lines.append(sep.join((rng.choice(AREAS), rng.choice(RATINGS), rng.choice(RATINGS), rng.choice(TRENDS))))
+    return "\n".join(lines)
+
+
+# a rewritten output of about `chars` characters; same seed, same text
+def sample_output(chars, seed=0):
+    rng = random.Random(seed)
+    blocks = []
+    section = 0
+    while sum(len(block) + 2 for block in blocks) < chars:
+        blocks.append(f"{ROMAN[section % len(ROMAN)]}. {rng.choice(AREAS).upper()} MANAGEMENT")
+        section += 1
+        blocks.append(f"Assessment: {rng.choice(RATINGS).title()}")
+        blocks.append(_paragraph(rng))
+        for finding in range(1, rng.randint(2, 4) + 1):
+            blocks.append(f"{finding}. {rng.choice(SENTENCES)}")
+            blocks.append(_paragraph(rng, rng.randint(2, 6)))
+        blocks.append("KEY OBSERVATIONS\n" + _paragraph(rng, 3))
+        blocks.append("\n".join(f"- {rng.choice(SENTENCES)}" for _ in range(rng.randint(2, 5))))
+        blocks.append(_table(rng, rng.randint(3, 12)))
+    return "\n\n".join(blocks)[:chars].rstrip()
+
+
+def _run(fmt, text):
+    # Parsing is part of the export cost, don't let the cache hide it
+    docmodel.parse.cache_clear()
+    return export.RENDERERS[fmt](text, title="Benchmark")
+
+
+def measure(fmt, text, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = _run(fmt, text)
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    _run(fmt, text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "peak_kb": peak // 1024,
+        "output_kb": len(data) // 1024,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results, previous):
+    before = {(row["chars"], row["format"]): row for row in previous["results"]}
+    print(f"\nChange vs {previous['commit'] or '?'} ({previous['date']})")
+    for row in results:
+        old = before.get((row["chars"], row["format"]))
+        if old is None:
+            continue
+        time_change = (row["median_ms"] - old["median_ms"]) / old["median_ms"]
+        peak_change = (row["peak_kb"] - old["peak_kb"]) / max(old["peak_kb"], 1)
+        print(f"  {row['chars']:>7,} {row['format']:<5} time {time_change:+7.1%}   peak memory {peak_change:+7.1%}   "
+              f"size {row['output_kb'] - old['output_kb']:+d} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000, 75000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--formats", nargs="+", choices=sorted(export.RENDERERS), default=["docx", "pdf"])
+    parser.add_argument("--out", help="results file (default: benchmarks/results/exports-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    # Shared template, fonts and logo are built once per process; keep that out of the numbers
+    for fmt in args.formats:
+        _run(fmt, sample_output(1000))
+
+    results = []
+    print(f"{'chars':>7} {'format':<6} {'median':>10} {'min':>10} {'peak mem':>10} {'output':>9}")
+    for chars in args.sizes:
+        text = sample_output(chars)
+        for fmt in args.formats:
+            row = {"chars": len(text), "format": fmt, **measure(fmt, text, args.repeat)}
+            results.append(row)
+            print(f"{row['chars']:>7,} {fmt:<6} {row['median_ms']:>7.1f} ms {row['min_ms']:>7.1f} ms "
+                  f"{row['peak_kb']:>7,} KB {row['output_kb']:>6,} KB")
+
+    now = datetime.now()
+    report = {
+        "date": now.isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"exports-{now:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            _compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Search benchmark: index N synthetic outputs and time ranked queries.
+
+Usage: python benchmarks/bench_search.py [--docs 20000] [--index /tmp/bench_search.db]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.search import SearchIndex  # noqa: E402
+
+WORDS = (
+    "bank credit liquidity capital earnings governance risk management board directors "
+    "assessment rating strong moderate low acceptable weak high exposure loan portfolio "
+    "provisioning compliance regulation circular memorandum examination finding directive "
+    "treasury interest rate market operational information technology audit committee"
+).split()
+
+QUERIES = ["liquidity", "credit risk", '"risk management"', "board governance", "treas*", "weak audit finding"]
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--index", default="/tmp/bench_search.db")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.index + suffix):
+            os.remove(args.index + suffix)
+
+    rng = random.Random(42)
+    index = SearchIndex(args.index)
+    start = time.perf_counter()
+    for i in range(args.docs):
+        index.index_output({
+            "id": str(i),
+            "user_id": f"user{i % args.users}",
+            "updatedAt": f"2025-01-01T00:00:{i:08d}",
+            "styleId": "bench",
+            "content": _text(rng, 400),
+            "output": _text(rng, 250),
+        })
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {args.docs} outputs in {elapsed:.1f}s ({args.docs / elapsed:.0f} docs/s)")
+
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            hits = index.search("user0", query, limit=20)
+            samples.append(time.perf_counter() - start)
+        print(f"  {query:<22} median {statistics.median(samples) * 1000:7.2f} ms   "
+              f"p95 {sorted(samples)[int(len(samples) * 0.95) - 1] * 1000:7.2f} ms   hits {len(hits)}")
+
+
+if __name__ == "__main__":
+    main()
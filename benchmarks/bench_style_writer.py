@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Style Writer rerun benchmark: script time per interaction, whole script vs fragment.
+
+A file is uploaded first (not timed), then each interaction (length slider,
+length input, guideline checkbox, style select, content edit) is repeated
+with Streamlit's AppTest. AppTest always runs the whole script, which is
+what every interaction cost before the page was split into fragments; the
+fragment column is the run time of the fragment that owns the widget (the
+page.style_writer.* timings), which is what Streamlit reruns now. With
+--rev the whole-script time of the app.py page at that git revision is
+measured too.
+Needs the same environment (.env) as the app itself.
+
+Usage: python benchmarks/bench_style_writer.py [--repeat 5] [--rev HEAD~1] [--upload-chars 50000]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.chdir(ROOT)
+
+import app.metrics as metrics  # noqa: E402
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _style_box(at):
+    return next(box for box in at.selectbox if "Style" in box.label)
+
+
+def _toggle(widget):
+    return widget.uncheck() if widget.value else widget.check()
+
+
+# (name, fragment timing, action(at, i))
+INTERACTIONS = [
+    ("length slider", "page.style_writer.length",
+     lambda at, i: at.slider(key="max_len_slider").set_value(2000 + 100 * i)),
+    ("length input", "page.style_writer.length",
+     lambda at, i: at.number_input(key="max_len_input").set_value(3000 + 100 * i)),
+    ("guideline checkbox", "page.style_writer.guidelines",
+     lambda at, i: _toggle(at.checkbox[i % len(at.checkbox)])),
+    ("style select", "page.style_writer.style",
+     lambda at, i: _style_box(at).set_value(_style_box(at).options[i % len(_style_box(at).options)])),
+    ("content edit", "page.style_writer.content",
+     lambda at, i: at.text_area(key="content_input").input(f"Draft paragraph {i}.")),
+]
+
+
+def _app_test(page):
+    from streamlit.testing.v1 import AppTest
+
+    return AppTest.from_file(page, default_timeout=300)
+
+
+def _upload(chars):
+    import app.export as export
+    from bench_exports import sample_output
+
+    return "report.docx", export.make_docx_bytes(sample_output(chars), "Upload"), DOCX_MIME
+
+
+# {interaction: (whole-script samples, fragment samples)}
+def measure(page, repeat, upload):
+    at = _app_test(page)
+    at.run()
+    at.file_uploader[0].set_value(upload)
+    at.run()
+
+    results = {}
+    for name, timing, action in INTERACTIONS:
+        if name == "style select" and not _style_box(at).options:
+            continue
+        whole, fragment = [], []
+        for i in range(repeat):
+            before = metrics.snapshot("page.style_writer.").get("timings", {}).get(timing, {}).get("total", 0.0)
+            action(at, i)
+            start = time.perf_counter()
+            at.run()
+            whole.append(time.perf_counter() - start)
+            after = metrics.snapshot("page.style_writer.").get("timings", {}).get(timing, {}).get("total", 0.0)
+            if after > before:
+                fragment.append(after - before)
+            if at.exception:
+                sys.exit(f"{name}: {at.exception[0].message}")
+        results[name] = (whole, fragment)
+    return results
+
+
+def _ms(samples):
+    return f"{statistics.median(samples) * 1000:9.1f} ms" if samples else f"{'-':>12}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rev", help="also time the whole script of app.py at this git revision")
+    parser.add_argument("--upload-chars", type=int, default=50000, help="size of the uploaded DOCX")
+    args = parser.parse_args()
+
+    upload = _upload(args.upload_chars)
+    current = measure(os.path.join(ROOT, "app.py"), args.repeat, upload)
+
+    previous = {}
+    if args.rev:
+        # The page script at that revision, in a worktree so its sidebar page
+        # links resolve; the app package is the one loaded from this checkout
+        worktree = tempfile.mkdtemp(prefix="bench_style_writer_")
+        subprocess.run(["git", "worktree", "add", "--detach", worktree, args.rev],
+                       cwd=ROOT, capture_output=True, check=True)
+        try:
+            previous = measure(os.path.join(worktree, "app.py"), args.repeat, upload)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=ROOT, capture_output=True)
+
+    print(f"Uploaded DOCX of {args.upload_chars:,} characters; median of {args.repeat} runs")
+    header = f"  {'interaction':<20} {'whole script':>12} {'fragment':>12}"
+    if args.rev:
+        header += f" {'whole @ ' + args.rev:>16}"
+    print(header)
+    for name, (whole, fragment) in current.items():
+        line = f"  {name:<20} {_ms(whole)} {_ms(fragment)}"
+        if args.rev:
+            line += f" {_ms(previous.get(name, ([], []))[0]):>16}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
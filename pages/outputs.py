@@ -1,13 +1,158 @@
 import streamlit as st
+from datetime import datetime
 import app.pages as pages
 import app.utils as utils
 
+PAGE_SIZE = 25
+
 # App title
 pages.show_home()
 pages.show_sidebar()
 
 st.header("📰Generated Outputs")
 
-# Display the generated outputs
-with st.spinner("Processing..."):
-    utils.get_outputs()
+# Continuation token for each visited page (index 0 is the first page)
+st.session_state.setdefault("outputs_tokens", [None])
+st.session_state.setdefault("outputs_page", 0)
+st.session_state.setdefault("outputs_cache", {})
+
+
+def _reset_pages():
+    st.session_state.outputs_tokens = [None]
+    st.session_state.outputs_page = 0
+    st.session_state.outputs_cache = {}
+
+
+# Coming from another page (where outputs may have been saved): fetch again
+if pages.entered("outputs"):
+    _reset_pages()
+
+
+query = st.text_input(
+    ":blue[**Search Outputs:**]",
+    placeholder='Keywords or "an exact phrase"',
+    key="outputs_query",
+).strip()
+
+if query:
+    # Search view: ranked matches with snippets from the local index
+    rows = utils.search_outputs(query)
+    if not rows:
+        st.info("No matching outputs found.")
+        st.stop()
+    st.caption(f"{len(rows)} result(s)")
+    table = [
+        {
+            "updatedAt": row.get("updatedAt"),
+            "styleId": row.get("styleId"),
+            "snippet": row.get("snippet"),
+            "score": row.get("score"),
+        }
+        for row in rows
+    ]
+    table_key = "outputs_search_table"
+else:
+    page = st.session_state.outputs_page
+
+    # Fetch the current page once; reruns (e.g. selecting a row) reuse it.
+    # Empty pages (nothing saved yet, or a failed fetch) are fetched again
+    if page in st.session_state.outputs_cache:
+        rows, next_token = st.session_state.outputs_cache[page]
+    else:
+        with st.spinner("Processing..."):
+            rows, next_token = utils.get_outputs(PAGE_SIZE, st.session_state.outputs_tokens[page])
+        if rows:
+            st.session_state.outputs_cache[page] = (rows, next_token)
+
+    if next_token and len(st.session_state.outputs_tokens) == page + 1:
+        st.session_state.outputs_tokens.append(next_token)
+
+    if not rows and page == 0:
+        st.info("no data found")
+        st.stop()
+
+    # Pagination controls
+    c1, c2, c3, c4 = st.columns([1, 1, 1, 5])
+    with c1:
+        if st.button("⬅️ Previous", disabled=page == 0, width='stretch'):
+            st.session_state.outputs_page -= 1
+            st.rerun()
+    with c2:
+        if st.button("Next ➡️", disabled=not next_token, width='stretch'):
+            st.session_state.outputs_page += 1
+            st.rerun()
+    with c3:
+        st.button("🔄 Refresh", on_click=_reset_pages, width='stretch')
+    with c4:
+        st.caption(f"Page {page + 1}")
+
+    # List view: lightweight fields only
+    table = [
+        {
+            "updatedAt": row.get("updatedAt"),
+            "styleId": row.get("styleId"),
+            "length": row.get("outputLength"),
+            "preview": row.get("preview"),
+        }
+        for row in rows
+    ]
+    table_key = f"outputs_table_{page}"
+
+selection = st.dataframe(
+    table,
+    on_select="rerun",
+    selection_mode="multi-row",
+    hide_index=True,
+    key=table_key,
+)
+
+selected_rows = selection.selection.rows
+
+# Bundle: several outputs rendered into one ZIP download
+if selected_rows:
+    with st.container(border=True):
+        c1, c2 = st.columns([3, 2])
+        with c1:
+            formats = st.multiselect(
+                "Formats", ["docx", "pdf"], default=["docx", "pdf"], key="outputs_bundle_formats"
+            )
+        with c2:
+            st.write("")
+            build = st.button(
+                f"📦 Build ZIP of {len(selected_rows)} output(s)", disabled=not formats, width='stretch'
+            )
+        selected_ids = [rows[i]["id"] for i in selected_rows]
+        if build:
+            bar = st.progress(0.0, text="Rendering...")
+            utils.build_output_bundle(
+                selected_ids,
+                formats,
+                progress=lambda done, total: bar.progress(done / total, text=f"Rendered {done}/{total}"),
+            )
+            bar.empty()
+        # Only offer a bundle built from the current selection
+        bundle = utils.current_output_bundle(selected_ids, formats)
+        if bundle:
+            st.caption(
+                f"{bundle['files']} file(s), {bundle['bytes'] / (1024 * 1024):.1f} MB, built in {bundle['seconds']:.1f}s"
+            )
+            for error in bundle["errors"]:
+                st.warning(f"Not included: {error}")
+            st.download_button(
+                "⬇️ Download ZIP",
+                data=utils.bundle_reader(bundle["path"]),
+                file_name=f"outputs_{datetime.now().strftime('%Y%m%d_%H%M')}.zip",
+                mime="application/zip",
+            )
+
+# Detail view: full bodies load on demand for the last selected row
+if selected_rows:
+    selected = rows[selected_rows[-1]]
+    with st.spinner("Loading output..."):
+        item = utils.get_output(selected["id"])
+    if item:
+        with st.container(border=True):
+            st.markdown(f"**{item.get('styleId') or 'Output'}** • {item.get('updatedAt')}")
+            st.text_area("Output", item.get("output") or "", height=300, key=f"output_detail_{item['id']}")
+            with st.expander("Original content"):
+                st.text_area("Content", item.get("content") or "", height=240, key=f"content_detail_{item['id']}")
@@ -2,10 +2,8 @@ import streamlit as st
 import app.pages as pages
 import app.utils as utils
 import app.prompts as prompts
-from PyPDF2 import PdfReader
-from docx import Document
-from pptx import Presentation
-from io import BytesIO
+import app.extract as extract
+import app.jobs as jobs
 
 
 # --- UI helper: centered "OR" header with lines ---
@@ -57,7 +55,7 @@ with col2:
     
     uploaded_files = st.file_uploader(
         ":blue[**Upload Files:**]",
-        type=["pdf", "docx", "pptx"],
+        type=extract.SUPPORTED_TYPES,
         accept_multiple_files=True,
         help="Upload PDF, Word, or PowerPoint files (Max 50MB per file recommended)",
         key="content_upload",
@@ -87,7 +85,6 @@ if uploaded_files:
     
     for idx, uploaded_file in enumerate(uploaded_files):
         try:
-            file_type = uploaded_file.name.split('.')[-1].lower()
             file_size_mb = uploaded_file.size / (1024 * 1024)
             
             # Update progress
@@ -103,25 +100,7 @@ if uploaded_files:
                 st.warning(f"⚠️ {uploaded_file.name} is empty or couldn't be read. Skipping.")
                 continue
             
-            if file_type == 'pdf':
-                pdf_reader = PdfReader(BytesIO(file_content))
-                for page in pdf_reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        extracted_text += text + "\n"
-                    
-            elif file_type == 'docx':
-                doc = Document(BytesIO(file_content))
-                for paragraph in doc.paragraphs:
-                    if paragraph.text.strip():
-                        extracted_text += paragraph.text + "\n"
-                        
-            elif file_type == 'pptx':
-                prs = Presentation(BytesIO(file_content))
-                for slide in prs.slides:
-                    for shape in slide.shapes:
-                        if hasattr(shape, "text") and shape.text.strip():
-                            extracted_text += shape.text + "\n"
+            extracted_text += extract.extract_text(uploaded_file.name, file_content)
             
             # Clear file content from memory
             del file_content
@@ -205,12 +184,17 @@ st.session_state.styleName = st.text_input(
 # Combine text area and extracted content
 #combined_text = st.session_state.exampleText + "\n" + extracted_text.encode("ascii", errors="ignore").decode("ascii")
 
+# A style extraction queued by this tab (or by it before a reload)
+job = utils.current_job("extract_job") if jobs.JOB_WORKERS > 0 else None
+running = job is not None and job["status"] in jobs.ACTIVE
+
 if st.button(
     ":blue[**Extract Writing Style**]",
     key="extract",
     disabled=(
         combined_text.strip() == ""
         or st.session_state.styleName == ""
+        or running
     ),
 ):
     with st.spinner("Processing..."):
@@ -218,6 +202,13 @@ if st.button(
         if utils.check_style(st.session_state.styleName):
             st.session_state["extraction_error"] = f"Style name '{st.session_state.styleName}' already exists. Please choose a different name."
             st.session_state["extraction_success"] = False
+        elif jobs.JOB_WORKERS > 0:
+            # Run by a worker process: survives reloads and dropped connections
+            utils.submit_job(
+                "extract_job", "extract_style", prompts.extract_job_params(combined_text, st.session_state.styleName)
+            )
+            st.session_state["extraction_success"] = False
+            st.session_state["extraction_error"] = None
         else:
             style = prompts.extract_style(combined_text, False)
             utils.save_style(style, combined_text)
@@ -227,6 +218,20 @@ if st.button(
             st.session_state["extraction_error"] = None
         st.rerun()
 
+if running:
+    utils.watch_job(job["id"], "Extracting the writing style")
+elif job is not None:
+    utils.clear_job("extract_job")
+    if job["status"] == jobs.DONE:
+        st.session_state.styleId = job["result"]["style_id"]
+        st.session_state["extracted_style"] = job["result"]["style"]
+        st.session_state["extracted_style_name"] = job["result"]["name"]
+        st.session_state["extraction_success"] = True
+    elif job["status"] == jobs.FAILED:
+        st.session_state["extraction_error"] = f"An error occurred while extracting the style: {job['error']}"
+    else:
+        st.session_state["extraction_error"] = "The style extraction was cancelled."
+
 # Display extraction results persistently (only once)
 if st.session_state.get("extraction_success"):
     with st.container(border=True):
@@ -1,48 +1,12 @@
+import json
 import streamlit as st
 import app.pages as pages
 import app.utils as utils
-from azure.cosmos import exceptions
-
-
-def _pk_paths(container):
-    """Read PK paths from container settings, e.g. ['/tenantId'] or ['/tenantId','/styleKey']"""
-    props = container.read()
-    return props.get("partitionKey", {}).get("paths", [])
-
-def _path_to_sql(expr_path: str) -> str:
-    """
-    Convert a PK path like '/tenantId' or '/a/b' to Cosmos SQL field expr:
-    -> c["tenantId"] or c["a"]["b"]
-    """
-    parts = [p for p in expr_path.split("/") if p]  # drop empty segments
-    sql = "c"
-    for p in parts:
-        sql += f'["{p}"]'
-    return sql
-
-def _fetch_pk_values_for_id(container, item_id):
-    """Query the document once to get PK value(s) in the right order."""
-    pk_paths = _pk_paths(container)  # e.g. ['/styleKey'] or ['/tenantId','/styleKey']
-    if not pk_paths:
-        raise RuntimeError("Container has no partition key paths configured.")
-
-    # Build SELECT with aliases pk0, pk1, ...
-    pk_selects = [f"{_path_to_sql(p)} AS pk{i}" for i, p in enumerate(pk_paths)]
-    select_clause = ", ".join(["c.id"] + pk_selects)
-
-    query = f"SELECT TOP 1 {select_clause} FROM c WHERE c.id = @id"
-    items = list(container.query_items(
-        query=query,
-        parameters=[{"name": "@id", "value": item_id}],
-        enable_cross_partition_query=True
-    ))
-    if not items:
-        raise exceptions.CosmosResourceNotFoundError("Item not found.")
-
-    row = items[0]
-    pk_values = [row[f"pk{i}"] for i in range(len(pk_paths))]
-    # If single-part PK, pass a scalar; if hierarchical, pass list
-    return pk_values[0] if len(pk_values) == 1 else pk_values
+import app.blobstore as blobstore
+import app.cache as cache
+import app.jobs as jobs
+import app.session_store as session_store
+from app.storage import NotFoundError
 
 
 # App title
@@ -82,24 +46,118 @@ if styles:
         if selected_style_data:
             if st.button(f":blue[**Delete '{selected_style}'**]"):
                 try:
-                    item_id = selected_style_data["id"]
-
-                    # Step 1: fetch actual PK value(s) from the stored document
-                    pk_value = _fetch_pk_values_for_id(utils.styles_container, item_id)
-
-                    # Optional sanity check: ensure ≤ 2048 bytes if scalar
-                    if isinstance(pk_value, str) and len(pk_value.encode("utf-8")) > 2048:
-                        raise ValueError("Stored partition key exceeds 2048 bytes.")
-
-                    # Step 2: point delete with id + correct PK
-                    utils.styles_container.delete_item(item=item_id, partition_key=pk_value)
+                    utils.delete_style(selected_style_data["id"])
 
                     st.success(f"Style '{selected_style}' has been deleted successfully!")
-                except exceptions.CosmosResourceNotFoundError:
+                except NotFoundError:
                     st.warning("Item not found or already deleted.")
                 except Exception as e:
                     st.error(f"An error occurred while deleting the style: {e}")
     else:
         st.info("No named styles found in the database.")
 else:
-    st.info("No styles found in the database.")
\ No newline at end of file
+    st.info("No styles found in the database.")
+# Bulk import / export of the user's styles
+with st.expander("Import / Export Styles"):
+    uploaded = st.file_uploader("Styles JSON (same shape as data/db_styles.json)", type=["json"])
+    on_conflict = st.radio(
+        "When a style name already exists",
+        ["skip", "replace", "rename"],
+        horizontal=True,
+    )
+    if uploaded and st.button(":blue[**Import styles**]"):
+        try:
+            docs = json.loads(uploaded.getvalue())
+        except ValueError as e:
+            st.error(f"An error occurred while reading the file: {e}")
+            docs = None
+        if docs is not None:
+            bar = st.progress(0.0, text="Importing styles...")
+            result = utils.import_styles(
+                docs,
+                on_conflict=on_conflict,
+                progress=lambda done, total: bar.progress(done / total, text=f"Imported {done}/{total}"),
+            )
+            if result:
+                bar.progress(1.0, text="Done")
+                st.success(
+                    f"Imported {result['written']} styles, skipped {result['skipped']} "
+                    f"in {result['seconds']:.2f}s ({result['styles_per_second'] or 0} styles/s)."
+                )
+                for error in result["errors"]:
+                    st.error(error)
+
+    st.download_button(
+        "Export my styles",
+        data=utils.export_styles(styles) or "[]",
+        file_name="styles.json",
+        mime="application/json",
+    )
+
+# Blob store savings (only when large bodies are offloaded)
+if blobstore.get_blob_store() is not None:
+    st.write(":blue[🗄️ **Storage**]")
+    with st.expander("Blob Store Savings"):
+        report = blobstore.savings_report()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Blobs", report["blobs"])
+        c2.metric("Stored", f"{report['stored_bytes'] / 1024 / 1024:.1f} MB")
+        c3.metric("Saved", f"{report['saved_bytes'] / 1024 / 1024:.1f} MB", help="Original size minus compressed size on disk")
+        st.caption(
+            f"Compression ratio: {report['compression_ratio'] or '-'}x • "
+            f"Deduplicated writes since start: {report['dedup_hits']} ({report['dedup_bytes'] / 1024:.0f} KB)"
+        )
+
+# Session memory (admins only)
+if utils.is_admin():
+    st.write(":blue[🧠 **Session Memory**]")
+    with st.expander("Largest Sessions"):
+        totals = session_store.stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Sessions", totals["sessions"])
+        c2.metric(
+            "Session state",
+            f"{totals['bytes'] / 1024 / 1024:.1f} MB",
+            f"of {totals['budget_bytes'] / 1024 / 1024:.0f} MB budget",
+            delta_color="off",
+        )
+        c3.metric("Spilled values", totals["spills"], help="Large texts moved to disk since start")
+        st.dataframe(
+            [
+                {
+                    "session": row["session"],
+                    "user": row["user_id"],
+                    "MB": round(row["bytes"] / 1024 / 1024, 2),
+                    "spilled KB": round(row["spilled_chars"] / 1024),
+                    "idle s": row["idle_seconds"],
+                    "largest keys": ", ".join(f"{key} ({size / 1024:.0f} KB)" for key, size in row["top_keys"]),
+                }
+                for row in session_store.largest_sessions()
+            ],
+            hide_index=True,
+        )
+
+    st.write(":blue[⚙️ **Job Queue**]")
+    with st.expander("Rewrite and Extraction Jobs"):
+        queue = jobs.get_queue().stats()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Queued", queue["depth"], f"oldest {queue['oldest_wait_seconds']:.0f}s", delta_color="off")
+        c2.metric("Running", queue["running"], f"{queue['workers']} workers", delta_color="off")
+        c3.metric("Done (1h)", queue["done_last_hour"], f"{queue['counts']['failed']} failed", delta_color="off")
+        c4.metric("Avg wait / run", f"{queue['avg_wait_seconds']:.1f}s / {queue['avg_run_seconds']:.1f}s")
+        if queue["by_user"]:
+            st.dataframe(queue["by_user"], hide_index=True)
+
+    st.write(":blue[🗄️ **Cache**]")
+    with st.expander("Hit Rates per Tier"):
+        backend = cache.get_backend()
+        if backend is None:
+            st.caption("No shared tier (CACHE_BACKEND is empty or unavailable); in-process caches only.")
+        else:
+            try:
+                usage = backend.usage()
+                st.caption(f"Shared tier: {backend.name}, {usage['keys']} keys, "
+                           f"{(usage['bytes'] or 0) / 1024 / 1024:.1f} MB")
+            except Exception as e:
+                st.error(f"An error occurred while reading the shared cache: {e}")
+        st.dataframe(cache.report(), hide_index=True)
@@ -10,5 +10,11 @@ call .\venv\Scripts\activate
 echo Installing/Updating requirements...
 python -m pip install -r requirements.txt
 
+echo Provisioning Cosmos DB containers...
+python -m app.provision
+
+echo Starting job workers...
+start "job workers" /b python -m app.jobs work
+
 echo Starting Streamlit app...
 streamlit run app.py
\ No newline at end of file
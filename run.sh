@@ -1 +1,3 @@
-python -m streamlit run app.py --server.port 8000 --server.address 0.0.0.0 --server.enableCORS false
\ No newline at end of file
+python -m app.provision
+python -m app.jobs work &
+python -m streamlit run app.py --server.port 8000 --server.address 0.0.0.0 --server.enableCORS false